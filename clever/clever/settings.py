@@ -47,8 +47,18 @@ LOGOUT_REDIRECT_URL = 'main:login'
 
 AUTH_USER_MODEL = "main.CustomUser"
 
+# Пользователь сессии загружается вместе с профилем и группой (main/auth.py).
+# ModelBackend оставлен для сессий, созданных до его появления
+AUTHENTICATION_BACKENDS = [
+    "main.auth.ProfileBackend",
+    "django.contrib.auth.backends.ModelBackend",
+]
+
 
 MIDDLEWARE = [
+    'main.middleware.RequestTimingMiddleware',
+    'main.middleware.QueryCountMiddleware',
+    'main.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,6 +80,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'main.context_processors.assets',
             ],
         },
     },
@@ -100,6 +111,83 @@ else:
         }
     }
 
+    # DB_POOL=1 — пул соединений psycopg 3 в каждом процессе (нужен psycopg_pool);
+    # размер пула × число воркеров не должен превышать max_connections Postgres.
+    # Без пула соединение живёт DB_CONN_MAX_AGE секунд (0 — новое на каждый запрос);
+    # под ASGI постоянные соединения не переиспользуются — там нужен пул.
+    # Сравнение режимов под нагрузкой: manage.py bench_db_pool
+    if os.getenv("DB_POOL", "0") == "1":
+        from psycopg_pool import ConnectionPool
+
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+                'max_size': int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+                # Сколько ждать свободного соединения, прежде чем отдать ошибку
+                'timeout': float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                # Соединения старше max_lifetime пересоздаются, простаивающие — закрываются
+                'max_lifetime': float(os.getenv("DB_POOL_MAX_LIFETIME", "1800")),
+                'max_idle': float(os.getenv("DB_POOL_MAX_IDLE", "300")),
+                # Проверка соединения перед выдачей: перезапуск db не роняет запросы
+                'check': ConnectionPool.check_connection,
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND: locmem (по умолчанию, свой на каждый процесс), file — общий
+# для воркеров одного хоста, redis — общий для всех (CACHE_URL=redis://host:6379/0,
+# штатный RedisCache Django с пакетом redis из requirements.txt)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "locmem")
+
+if CACHE_BACKEND == "redis":
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_URL", "redis://127.0.0.1:6379/0"),
+    }
+elif CACHE_BACKEND == "file":
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.getenv("CACHE_DIR", os.path.join(BASE_DIR, "cache")),
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+else:
+    _default_cache = {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "clever",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    }
+
+CACHES = {"default": {**_default_cache, "KEY_PREFIX": "clever"}}
+
+# Время жизни кэшированных фрагментов панелей; актуальность держат штампы версий.
+# Штампы должны быть общими для всех воркеров: с locmem запись в одном процессе
+# не сбросила бы фрагменты в остальных — поэтому тогда по умолчанию 0 (выключено)
+FRAGMENT_CACHE_TTL = int(
+    os.getenv("FRAGMENT_CACHE_TTL", "0" if CACHE_BACKEND == "locmem" else "600")
+)
+
+# Хранилище сессий (SESSION_BACKEND):
+# cached_db — чтение из кэша, запись и в БД; по умолчанию при общем кэше.
+#   С locmem у каждого процесса свой кэш, и выход из аккаунта в одном воркере
+#   не виден другим — поэтому тогда по умолчанию db;
+# signed_cookies — сессия целиком в подписанной cookie, без обращений к БД,
+#   но выданную cookie нельзя отозвать на сервере до истечения срока;
+# db — только БД
+SESSION_BACKEND = os.getenv(
+    "SESSION_BACKEND", "db" if CACHE_BACKEND == "locmem" else "cached_db"
+)
+SESSION_ENGINE = {
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+    "db": "django.contrib.sessions.backends.db",
+}[SESSION_BACKEND]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -120,6 +208,37 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Заголовок X-DB-Queries с числом запросов к БД (нагрузочные прогоны, manage.py exam_rush)
+QUERY_COUNT_HEADER = os.getenv("QUERY_COUNT_HEADER", "0") == "1"
+
+# Замер запросов (main.middleware.RequestTimingMiddleware): доля запросов с
+# Server-Timing и подробной строкой в логе main.timing, от 0 до 1, и порог
+# в мс, после которого запрос попадает в лог как медленный. 0 — выключено
+REQUEST_TIMING_SAMPLE_RATE = float(os.getenv("REQUEST_TIMING_SAMPLE_RATE", "0"))
+REQUEST_TIMING_SLOW_MS = float(os.getenv("REQUEST_TIMING_SLOW_MS", "1000"))
+
+# Сжатие ответов (main.middleware.CompressionMiddleware): типы и минимальный размер.
+# Меньше ~1 КБ заголовки и CPU на сжатие не окупаются
+COMPRESS_CONTENT_TYPES = ["application/json"]
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "main.timing": {"handlers": ["console"], "level": "INFO", "propagate": False},
+    },
+}
+
+
+# Async-версии JSON-эндпоинтов экзамена (main/async_views.py).
+# Включать при запуске под ASGI-сервером (uvicorn); под WSGI выгоды нет
+ASYNC_EXAM_VIEWS = os.getenv("ASYNC_EXAM_VIEWS", "0") == "1"
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -134,9 +253,36 @@ USE_TZ = True
 STATIC_URL = "/static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "static")
 
+# collectstatic добавляет хеш в имена файлов (nginx отдаёт их с immutable)
+# и кладёт рядом сжатые .gz/.br для gzip_static
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "main.storage.PrecompressedManifestStorage"},
+}
+
+# Свои CSS и htmx из build_assets вместо CDN. Включать только там, где сборка
+# прошла (образ собран с SELF_HOSTED_ASSETS=1): без неё страницы останутся без стилей
+SELF_HOSTED_ASSETS = os.getenv("SELF_HOSTED_ASSETS", "0") == "1"
+
+# Standalone-бинарник Tailwind CSS v4 для manage.py build_assets
+TAILWIND_CLI = os.getenv("TAILWIND_CLI", "tailwindcss")
+
+# Куда build_assets кладёт собранные CSS и JS: по умолчанию в статику приложения
+# main; в Docker — вне каталога с кодом, поверх которого монтируется том (см. Dockerfile)
+ASSETS_DIST_DIR = os.getenv(
+    "ASSETS_DIST_DIR", os.path.join(BASE_DIR, "main", "static", "main", "dist")
+)
+if "ASSETS_DIST_DIR" in os.environ:
+    STATICFILES_DIRS = [("main/dist", ASSETS_DIST_DIR)]
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 
+# Медиа отдаёт nginx после проверки доступа в Django (X-Accel-Redirect на internal-location).
+# MEDIA_X_ACCEL=0 — без nginx (локальная разработка): файл отдаёт сам Django
+MEDIA_X_ACCEL = os.getenv("MEDIA_X_ACCEL", "1") == "1"
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
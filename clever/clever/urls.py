@@ -1,7 +1,5 @@
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
 
 
 urlpatterns = [
@@ -9,7 +7,4 @@ urlpatterns = [
     path('', include('main.urls')),
 ]
 
-
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# /media/ обслуживается main.views.protected_media (проверка доступа + X-Accel-Redirect)
@@ -1,4 +1,7 @@
 from django.contrib import admin
+from django.db import transaction
+from .fragments import invalidate_test_fragments, invalidate_tests_fragments
+from .images import apply_question_image, release_question_images
 from .models import (
     Group, Test, Question, AnswerOption,
     StudentTestAttempt, StudentAnswer, UserProfile
@@ -33,6 +36,45 @@ class TestAdmin(admin.ModelAdmin):
         return ", ".join(g.name for g in obj.groups.all())
     get_groups.short_description = "Группы"
 
+    def delete_model(self, request, obj):
+        group_ids = list(obj.groups.values_list('id', flat=True))
+        release_question_images(obj.questions.all())
+        super().delete_model(request, obj)
+        invalidate_test_fragments(obj, group_ids)
+
+    def delete_queryset(self, request, queryset):
+        tests = list(queryset.prefetch_related('groups'))
+        # Действие «удалить выбранные» не оборачивается в транзакцию само
+        with transaction.atomic():
+            release_question_images(Question.objects.filter(test__in=queryset))
+            super().delete_queryset(request, queryset)
+        for test in tests:
+            invalidate_test_fragments(test, [g.id for g in test.groups.all()])
+
+    def save_formset(self, request, form, formset, change):
+        if formset.model is Question:
+            # Новые картинки — через обработку (поворот, метаданные, копии)
+            for inline_form in formset.forms:
+                deleted = inline_form.cleaned_data.get('DELETE')
+                if 'image' in inline_form.changed_data and not deleted:
+                    apply_question_image(inline_form.instance)
+        super().save_formset(request, form, formset, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Вопросы из QuestionInline уже сохранены — сбрасываем ключ ответов
+        form.instance.bump_content_version()
+        # Карточки и у групп, с которых тест сняли
+        old_group_ids = [getattr(g, 'pk', g) for g in form.initial.get('groups', [])]
+        new_group_ids = form.instance.groups.values_list('id', flat=True)
+        invalidate_test_fragments(form.instance, {*old_group_ids, *new_group_ids})
+
+
+def _questions_changed(test_ids):
+    """Вопросы тестов изменены в обход конструктора: кэши и карточки с числом вопросов"""
+    Test.bump_content_versions(test_ids)
+    invalidate_tests_fragments(test_ids)
+
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
@@ -45,6 +87,31 @@ class QuestionAdmin(admin.ModelAdmin):
         return obj.text[:60]
     short_text.short_description = 'Текст'
 
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            apply_question_image(obj)
+        super().save_model(request, obj, form, change)
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Варианты из AnswerOptionInline уже сохранены; вопрос мог переехать в другой тест
+        test_ids = [form.instance.test_id]
+        if change and 'test' in form.changed_data:
+            test_ids.append(form.initial['test'])
+        _questions_changed(test_ids)
+
+    def delete_model(self, request, obj):
+        release_question_images(Question.objects.filter(pk=obj.pk))
+        super().delete_model(request, obj)
+        _questions_changed([obj.test_id])
+
+    def delete_queryset(self, request, queryset):
+        test_ids = list(queryset.values_list('test_id', flat=True))
+        with transaction.atomic():
+            release_question_images(queryset)
+            super().delete_queryset(request, queryset)
+        _questions_changed(test_ids)
+
 
 @admin.register(AnswerOption)
 class AnswerOptionAdmin(admin.ModelAdmin):
@@ -52,6 +119,23 @@ class AnswerOptionAdmin(admin.ModelAdmin):
     list_filter = ('question__test', 'is_correct')
     search_fields = ('text',)
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        test_ids = [obj.question.test_id]
+        if change and 'question' in form.changed_data:
+            old_question = Question.objects.only('test_id').get(pk=form.initial['question'])
+            test_ids.append(old_question.test_id)
+        Test.bump_content_versions(test_ids)
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        Test.bump_content_versions([obj.question.test_id])
+
+    def delete_queryset(self, request, queryset):
+        test_ids = list(queryset.values_list('question__test_id', flat=True))
+        super().delete_queryset(request, queryset)
+        Test.bump_content_versions(test_ids)
+
 
 @admin.register(StudentTestAttempt)
 class StudentTestAttemptAdmin(admin.ModelAdmin):
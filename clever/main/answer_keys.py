@@ -0,0 +1,84 @@
+"""Скомпилированные ключи ответов для тестов.
+
+Ключ — список вопросов теста в порядке ``order`` с правильным вариантом
+(или нормализованным текстом для открытых вопросов) и текстами вариантов,
+нужными для разбора ответов. Ключ хранится в процессном LRU и в общем
+кэше под версией ``Test.content_version``, поэтому при проверке попыток
+таблицы вопросов не читаются вообще.
+"""
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from .caching import TwoTierCache
+from .models import AnswerOption, Question
+
+answer_key_cache = TwoTierCache(
+    "answer-key",
+    maxsize=getattr(settings, "ANSWER_KEY_LRU_SIZE", 256),
+)
+
+
+def normalize_text_answer(value):
+    """Нормализация текстового ответа: без пробелов по краям и без учёта регистра"""
+    return (value or "").strip().lower()
+
+
+def compile_answer_keys(test_ids):
+    """Собирает ключи ответов нескольких тестов из БД (2 запроса): {test_id: ключ}"""
+    questions = (
+        Question.objects.filter(test_id__in=test_ids)
+        .order_by("order", "id")
+        .prefetch_related(
+            Prefetch("answers", queryset=AnswerOption.objects.order_by("order", "id"))
+        )
+    )
+
+    compiled = {test_id: [] for test_id in test_ids}
+    for q in questions:
+        options = list(q.answers.all())
+        correct = next((a for a in options if a.is_correct), None)
+        compiled[q.test_id].append(
+            {
+                "id": q.id,
+                "text": q.text,
+                "question_type": q.question_type,
+                "correct_text": q.correct_text_answer or "",
+                "correct_normalized": normalize_text_answer(q.correct_text_answer),
+                "correct_option_id": correct.id if correct else None,
+                "correct_option_text": correct.text if correct else "",
+                "options": {
+                    a.id: {"text": a.text, "is_correct": a.is_correct} for a in options
+                },
+            }
+        )
+    return compiled
+
+
+def compile_answer_key(test_id):
+    """Собирает ключ ответов одного теста из БД (2 запроса)"""
+    return compile_answer_keys([test_id])[test_id]
+
+
+def get_answer_key(test):
+    """Ключ ответов для актуальной версии теста"""
+    return answer_key_cache.get(
+        (test.id, test.content_version), lambda: compile_answer_key(test.id)
+    )
+
+
+def get_answer_keys_many(tests):
+    """{test_id: ключ} для списка тестов; промахи кэша — двумя запросами"""
+
+    def build(missing):
+        compiled = compile_answer_keys([test_id for test_id, _ in missing])
+        return {key: compiled[key[0]] for key in missing}
+
+    keys = [(t.id, t.content_version) for t in tests]
+    by_key = answer_key_cache.get_many(keys, build)
+    return {test_id: key for (test_id, _), key in by_key.items()}
+
+
+def invalidate_answer_key(test):
+    """Сбрасывает ключ текущей версии (тест изменён или удаляется)"""
+    answer_key_cache.discard((test.id, test.content_version))
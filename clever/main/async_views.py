@@ -0,0 +1,170 @@
+"""Асинхронные версии JSON-эндпоинтов экзамена (для запуска под ASGI).
+
+Под uvicorn/daphne ожидание Postgres не держит воркер: чтение идёт через
+async ORM, попадания в процессные кэши обходятся без потоков. Запись
+результата остаётся одной синхронной транзакцией (``grade_submission``
+через ``sync_to_async``) — транзакции в async-коде Django не поддерживает.
+
+Маршруты переключаются настройкой ``ASYNC_EXAM_VIEWS`` (см. ``urls.py``);
+поведение и формат ответов совпадают с ``views.py``.
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.shortcuts import aget_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+
+from .auth import aget_principal
+from .fragments import ainvalidate_result_fragments
+from .grading import grade_submission
+from .levels import aget_level_bands
+from .models import Test, TestResult, is_passed
+from .payloads import aget_student_payload
+from .responses import FastJsonResponse
+from .results_feed import FeedParamsError, afetch_page
+
+
+async def _user_and_principal(request):
+    user = await request.auser()
+    return user, await aget_principal(user)
+
+
+async def _student_test(request, test_id):
+    """(user, test) для студента или FastJsonResponse с ошибкой"""
+    user, principal = await _user_and_principal(request)
+    if principal.role != "student":
+        return user, FastJsonResponse({"error": "Access denied"}, status=403)
+
+    test = await aget_object_or_404(Test, id=test_id, groups=principal.group_id)
+
+    if await TestResult.objects.filter(test=test, student=user).aexists():
+        return user, FastJsonResponse({"error": "Тест уже пройден"}, status=400)
+    return user, test
+
+
+@login_required
+@require_http_methods(["GET"])
+async def start_test(request, test_id):
+    user, test = await _student_test(request, test_id)
+    if isinstance(test, HttpResponse):
+        return test
+
+    payload = await aget_student_payload(test, user.pk)
+    return HttpResponse(payload, content_type="application/json")
+
+
+@login_required
+@require_http_methods(["POST"])
+async def submit_test(request, test_id):
+    user, test = await _student_test(request, test_id)
+    if isinstance(test, HttpResponse):
+        return test
+
+    data = json.loads(request.body)
+
+    try:
+        test_result, details = await sync_to_async(grade_submission)(
+            test,
+            user,
+            data.get("answers") or {},
+            time_spent=data.get("time_spent", 0),
+        )
+    except IntegrityError:
+        # Параллельная отправка того же теста успела раньше (uniq_result_test_student)
+        return FastJsonResponse({"error": "Тест уже пройден"}, status=400)
+    await ainvalidate_result_fragments(test, user.pk)
+    correct_count = test_result.score
+    total_count = test_result.total_questions
+
+    percentage = (correct_count / total_count * 100) if total_count > 0 else 0
+    level = (await aget_level_bands(test)).level_for(percentage)
+
+    return FastJsonResponse(
+        {
+            "correct": correct_count,
+            "total": total_count,
+            "details": details,
+            "level_title": level.title if level else "Завершено",
+            "level_description": level.description if level else "",
+            "level_recommendations": level.recommendations if level else "",
+        }
+    )
+
+
+@login_required
+@require_http_methods(["GET"])
+async def results_feed(request):
+    user, principal = await _user_and_principal(request)
+    if principal.role != "teacher":
+        return FastJsonResponse({"error": "Access denied"}, status=403)
+
+    try:
+        rows, next_cursor = await afetch_page(user, request.GET)
+    except FeedParamsError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+
+    return FastJsonResponse({"results": rows, "next_cursor": next_cursor})
+
+
+@login_required
+@require_http_methods(["GET"])
+async def test_detail_results(request, test_id):
+    user, principal = await _user_and_principal(request)
+    if principal.role != "teacher":
+        return FastJsonResponse({"error": "Access denied"}, status=403)
+
+    test = await aget_object_or_404(Test, id=test_id, created_by=user)
+
+    results = (
+        TestResult.objects.filter(test=test)
+        .order_by("-completed_at")
+        .values(
+            "id",
+            "student__username",
+            "student__profile__group__name",
+            "score",
+            "total_questions",
+            "time_spent",
+            "completed_at",
+        )
+    )
+    results_data = []
+    async for row in results:
+        total = row["total_questions"]
+        percentage = round(row["score"] / total * 100, 1) if total else 0
+        results_data.append(
+            {
+                "id": row["id"],
+                "student_name": row["student__username"],
+                "student_username": row["student__username"],
+                "student_group": row["student__profile__group__name"] or "Без группы",
+                "score": row["score"],
+                "total": total,
+                "percentage": percentage,
+                "time_spent": row["time_spent"],
+                "time_formatted": f"{row['time_spent'] // 60:02d}:{row['time_spent'] % 60:02d}",
+                "completed_at": timezone.localtime(row["completed_at"]).strftime(
+                    "%d.%m.%Y %H:%M"
+                ),
+                "passed": is_passed(row["score"], total),
+            }
+        )
+
+    group_names = [name async for name in test.groups.values_list("name", flat=True)]
+
+    return FastJsonResponse(
+        {
+            "test_title": test.title,
+            "test_description": test.description,
+            "group_name": ", ".join(group_names),
+            "questions_count": await test.questions.acount(),
+            "created_at": test.created_at.strftime("%d.%m.%Y"),
+            "results": results_data,
+            "total_completed": len(results_data),
+        }
+    )
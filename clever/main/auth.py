@@ -0,0 +1,48 @@
+"""Загрузка пользователя сессии вместе с профилем и группой.
+
+Почти каждая вьюха смотрит ``request.user.profile.role``; стандартный
+ModelBackend достаёт пользователя одним запросом, а профиль — вторым,
+ленивым. ``ProfileBackend`` делает это одним JOIN. Для async-вьюх, где
+ленивый доступ к профилю запрещён, роль и группа собраны в ``Principal``,
+который кэшируется на объекте пользователя.
+"""
+
+from collections import namedtuple
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .models import UserProfile
+
+# role и group_id — None, если профиля нет (например, у суперпользователя)
+Principal = namedtuple("Principal", "user_id role group_id")
+
+
+class ProfileBackend(ModelBackend):
+    def get_user(self, user_id):
+        UserModel = get_user_model()
+        user = (
+            UserModel._default_manager.select_related("profile", "profile__group")
+            .filter(pk=user_id)
+            .first()
+        )
+        return user if user and self.user_can_authenticate(user) else None
+
+
+def _principal(user, profile):
+    user._principal = Principal(
+        user.pk,
+        profile.role if profile else None,
+        profile.group_id if profile else None,
+    )
+    return user._principal
+
+
+async def aget_principal(user):
+    """Роль и группа пользователя; профиль читается не больше одного раза"""
+    if hasattr(user, "_principal"):
+        return user._principal
+    # Пользователь из ProfileBackend: профиль уже загружен вместе с ним
+    if type(user).profile.is_cached(user):
+        return _principal(user, getattr(user, "profile", None))
+    return _principal(user, await UserProfile.objects.filter(user=user).afirst())
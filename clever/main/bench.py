@@ -0,0 +1,225 @@
+"""Нагрузочный HTTP-клиент на asyncio (только stdlib) для management-команд.
+
+Каждое «соединение» — отдельная корутина с keep-alive соединением,
+которая шлёт запросы подряд до истечения времени. Задержки собираются
+по каждому запросу, итог — RPS, перцентили и число ошибок.
+"""
+
+import asyncio
+import ssl
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.utils.module_loading import import_string
+
+
+class LoadResult:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+        self.elapsed = 0.0
+        # Ответы с неожиданным статусом; errors — запросы вовсе без ответа
+        self.failed = 0
+        # Запросов к БД на HTTP-запрос — если сервер отдаёт X-DB-Queries
+        self.queries = []
+
+    def record(self, latency, status, headers=None, ok=None):
+        """Учитывает полученный ответ; ok — ожидаемый ли статус (по умолчанию < 400)"""
+        self.latencies.append(latency)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not (status < 400 if ok is None else ok):
+            self.failed += 1
+        queries = (headers or {}).get("x-db-queries")
+        if queries is not None:
+            self.queries.append(int(queries))
+
+    @property
+    def requests(self):
+        return len(self.latencies)
+
+    @property
+    def rps(self):
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, p):
+        """Перцентиль задержки в миллисекундах"""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[index] * 1000
+
+    def to_dict(self):
+        """Итог в виде, пригодном для JSON и сравнения прогонов"""
+        attempts = self.requests + self.errors
+        failures = self.errors + self.failed
+        return {
+            "requests": self.requests,
+            "rps": round(self.rps, 2),
+            "errors": self.errors,
+            "failed": self.failed,
+            "error_rate": round(failures / attempts, 4) if attempts else 0.0,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+            "latency_ms": {
+                f"p{p}": round(self.percentile(p), 2) for p in (50, 90, 95, 99)
+            },
+            "db_queries": (
+                {
+                    "avg": round(sum(self.queries) / len(self.queries), 2),
+                    "max": max(self.queries),
+                }
+                if self.queries
+                else None
+            ),
+        }
+
+    def summary(self):
+        return (
+            f"{self.requests} запр., {self.rps:.1f} RPS, "
+            f"p50 {self.percentile(50):.1f} мс, p99 {self.percentile(99):.1f} мс, "
+            f"ошибок {self.errors}, коды {dict(sorted(self.statuses.items()))}"
+        )
+
+
+class HttpConnection:
+    """Минимальный HTTP/1.1 клиент с keep-alive"""
+
+    def __init__(self, url, timeout=30):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.netloc = parts.netloc
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def connect(self):
+        context = ssl.create_default_context() if self.scheme == "https" else None
+        self.reader, self.writer = await asyncio.wait_for(
+            asyncio.open_connection(self.host, self.port, ssl=context), self.timeout
+        )
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except OSError:
+                pass
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers=None, body=b""):
+        """Отправляет запрос и читает ответ целиком: (статус, тело)"""
+        status, _, body = await self.send(method, path, headers, body)
+        return status, body
+
+    async def send(self, method, path, headers=None, body=b""):
+        """Как request, но с заголовками ответа: (статус, заголовки, тело).
+
+        Заголовки — словарь с именами в нижнем регистре; Set-Cookie — списком.
+        """
+        if self.writer is None:
+            await self.connect()
+
+        headers = {"Host": self.netloc, **(headers or {})}
+        lines = [f"{method} {path} HTTP/1.1"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        if body:
+            lines.append(f"Content-Length: {len(body)}")
+        head = ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+        self.writer.write(head + body)
+        await self.writer.drain()
+        return await asyncio.wait_for(self._read_response(), self.timeout)
+
+    async def _read_response(self):
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("соединение закрыто сервером")
+        status = int(status_line.split()[1])
+
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name, value = name.strip().lower(), value.strip()
+            if name == "set-cookie":
+                response_headers.setdefault(name, []).append(value)
+            else:
+                response_headers[name] = value
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await self.reader.readline()
+                    break
+                chunks.append(await self.reader.readexactly(size))
+                await self.reader.readline()
+            body = b"".join(chunks)
+        elif "content-length" in response_headers:
+            body = await self.reader.readexactly(
+                int(response_headers["content-length"])
+            )
+        else:
+            body = await self.reader.read()
+
+        if response_headers.get("connection", "").lower() == "close":
+            await self.close()
+        return status, response_headers, body
+
+
+async def _worker(url, path, deadline, result, method, headers, body):
+    conn = HttpConnection(url)
+    try:
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                status, response_headers, _ = await conn.send(
+                    method, path, headers, body
+                )
+            except (OSError, ConnectionError, asyncio.TimeoutError, ValueError):
+                result.errors += 1
+                await conn.close()
+                # Сервер не принимает соединения — не крутим пустой цикл
+                await asyncio.sleep(0.05)
+                continue
+            result.record(time.monotonic() - started, status, response_headers)
+    finally:
+        await conn.close()
+
+
+async def run_load(url, concurrency, duration, method="GET", headers=None, body=b""):
+    """Держит concurrency соединений к url в течение duration секунд"""
+    parts = urlsplit(url)
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    result = LoadResult()
+    started = time.monotonic()
+    deadline = started + duration
+    await asyncio.gather(
+        *(
+            _worker(url, path, deadline, result, method, headers, body)
+            for _ in range(concurrency)
+        )
+    )
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+def session_cookie(user):
+    """Cookie готовой сессии пользователя — нагрузка идёт без входа через форму"""
+    store_class = import_string(f"{settings.SESSION_ENGINE}.SessionStore")
+    session = store_class()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
@@ -0,0 +1,245 @@
+"""Описание теста в памяти и его сохранение одной транзакцией.
+
+Форма конструктора и импорт из файла сначала строят ``TestDefinition``,
+полностью его проверяют и только потом пишут в БД: тест, группы, все вопросы и все
+варианты — пакетными вставками внутри одного ``transaction.atomic()``.
+Ошибка в любом вопросе не оставляет в базе частично созданного теста.
+"""
+
+import re
+from collections import namedtuple
+
+from django.db import transaction
+
+from .images import ImageProcessingError, delete_orphaned_images, store_question_image
+from .models import AnswerOption, Group, Question, Test, TestStats
+
+OptionDef = namedtuple("OptionDef", "text is_correct")
+# image — загруженный файл (UploadedFile/ContentFile) или None
+QuestionDef = namedtuple("QuestionDef", "text question_type correct_text options image")
+# pool_size — None (все вопросы) или число вопросов в выборке студента (см. pools)
+TestDefinition = namedtuple(
+    "TestDefinition",
+    "title description questions pool_size shuffle_options",
+    defaults=(None, False),
+)
+
+TITLE_MAX_LENGTH = Test._meta.get_field("title").max_length
+OPTION_MAX_LENGTH = AnswerOption._meta.get_field("text").max_length
+MAX_QUESTIONS = 1000
+
+
+class TestDefinitionError(ValueError):
+    """Описание теста не прошло проверку; errors — список сообщений"""
+
+    def __init__(self, errors):
+        self.errors = list(errors)
+        super().__init__("; ".join(self.errors))
+
+
+def pool_options(post):
+    """pool_size и shuffle_options из формы (общие для конструктора и импорта)"""
+    raw = (post.get("pool_size") or "").strip()
+    try:
+        pool_size = int(raw) if raw else None
+    except ValueError:
+        pool_size = raw  # validate_definition сообщит об ошибке
+    return {
+        "pool_size": pool_size,
+        "shuffle_options": post.get("shuffle_options") == "on",
+    }
+
+
+def definition_from_form(post, files):
+    """TestDefinition из полей формы конструктора (question_<n>_…)"""
+    # Собираем только настоящие поля "текст вопроса": question_1_text, question_2_text ...
+    question_nums = sorted(
+        {
+            int(m.group(1))
+            for m in (re.match(r"^question_(\d+)_text$", key) for key in post.keys())
+            if m
+        }
+    )
+
+    questions = []
+    for num in question_nums:
+        question_type = post.get(f"question_{num}_type")
+        correct_text = ""
+        options = []
+
+        if question_type == "open":
+            correct_text = post.get(f"question_{num}_correct_text", "").strip()
+        elif question_type == "choice":
+            correct = post.get(f"question_{num}_correct")
+            try:
+                cnt = int(post.get(f"question_{num}_answers_count", 0))
+            except ValueError:
+                cnt = 0
+            for i in range(1, cnt + 1):
+                answer_text = (post.get(f"question_{num}_answer_{i}") or "").strip()
+                if answer_text:
+                    options.append(OptionDef(answer_text, str(i) == str(correct)))
+
+        questions.append(
+            QuestionDef(
+                text=(post.get(f"question_{num}_text") or "").strip(),
+                question_type=question_type,
+                correct_text=correct_text,
+                options=options,
+                image=files.get(f"question_{num}_image"),
+            )
+        )
+
+    return TestDefinition(
+        title=(post.get("test_title") or "").strip(),
+        description=(post.get("test_description") or "").strip(),
+        questions=questions,
+        **pool_options(post),
+    )
+
+
+def validate_definition(definition):
+    """Проверяет описание целиком и возвращает список ошибок (пустой — всё верно)"""
+    errors = []
+    if not definition.title:
+        errors.append("Не указано название теста")
+    elif len(definition.title) > TITLE_MAX_LENGTH:
+        errors.append(f"Название длиннее {TITLE_MAX_LENGTH} символов")
+
+    if not definition.questions:
+        errors.append("В тесте нет ни одного вопроса")
+    elif len(definition.questions) > MAX_QUESTIONS:
+        errors.append(f"Слишком много вопросов (больше {MAX_QUESTIONS})")
+
+    pool_size = definition.pool_size
+    if pool_size is not None:
+        if not isinstance(pool_size, int) or pool_size < 1:
+            errors.append("Размер выборки должен быть целым числом больше нуля")
+        elif definition.questions and pool_size > len(definition.questions):
+            errors.append(
+                f"В выборке {pool_size} вопросов, а в тесте всего "
+                f"{len(definition.questions)}"
+            )
+
+    for num, q in enumerate(definition.questions, start=1):
+        prefix = f"Вопрос {num}"
+        if not q.text:
+            errors.append(f"{prefix}: пустой текст")
+
+        if q.question_type == "open":
+            if not q.correct_text:
+                errors.append(f"{prefix}: не указан правильный ответ")
+        elif q.question_type == "choice":
+            if len(q.options) < 2:
+                errors.append(f"{prefix}: нужно минимум 2 варианта ответа")
+            correct = sum(1 for o in q.options if o.is_correct)
+            if correct != 1:
+                errors.append(f"{prefix}: должен быть ровно один правильный вариант")
+            for o in q.options:
+                if not o.text:
+                    errors.append(f"{prefix}: пустой вариант ответа")
+                elif len(o.text) > OPTION_MAX_LENGTH:
+                    errors.append(
+                        f"{prefix}: вариант длиннее {OPTION_MAX_LENGTH} символов"
+                    )
+        else:
+            errors.append(f"{prefix}: неизвестный тип «{q.question_type}»")
+    return errors
+
+
+def resolve_groups(teacher, group_ids):
+    """Группы учителя по списку id; чужие и несуществующие — ошибка"""
+    group_ids = set(group_ids)
+    found = set(
+        Group.objects.filter(id__in=group_ids, created_by=teacher).values_list(
+            "id", flat=True
+        )
+    )
+    if found != group_ids:
+        raise TestDefinitionError(["Выбрана несуществующая группа"])
+    return sorted(found)
+
+
+def _store_images(questions):
+    """Обрабатывает картинки вопросов: [(имя, манифест)] по порядку вопросов.
+
+    Если хоть одна картинка не читается, сохранённые файлы, не нужные другим
+    тестам, удаляются.
+    """
+    stored = []
+    errors = []
+    for num, q in enumerate(questions, start=1):
+        stored.append((None, {}))
+        if not q.image:
+            continue
+        try:
+            stored[-1] = store_question_image(q.image)
+        except ImageProcessingError as e:
+            errors.append(f"Вопрос {num}: {e}")
+
+    if errors:
+        delete_orphaned_images([image for image in stored if image[0]])
+        raise TestDefinitionError(errors)
+    return stored
+
+
+def save_test_definition(teacher, definition, group_ids):
+    """Проверяет описание и создаёт тест пакетными вставками в одной транзакции"""
+    errors = validate_definition(definition)
+    if errors:
+        raise TestDefinitionError(errors)
+    group_ids = resolve_groups(teacher, group_ids)
+
+    images = []
+    try:
+        with transaction.atomic():
+            # В той же транзакции, что и вопросы: блокировки картинок держатся
+            # до коммита ссылок на них (см. images.lock_image)
+            images = _store_images(definition.questions)
+            test = Test.objects.create(
+                created_by=teacher,
+                title=definition.title,
+                description=definition.description or "",
+                pool_size=definition.pool_size,
+                shuffle_options=definition.shuffle_options,
+            )
+            test.groups.set(group_ids)
+            TestStats.objects.create(test=test)
+
+            questions = Question.objects.bulk_create(
+                [
+                    Question(
+                        test=test,
+                        text=q.text,
+                        image=image,
+                        image_variants=variants,
+                        order=num,
+                        question_type=q.question_type,
+                        correct_text_answer=(
+                            q.correct_text if q.question_type == "open" else None
+                        ),
+                    )
+                    for num, (q, (image, variants)) in enumerate(
+                        zip(definition.questions, images), start=1
+                    )
+                ],
+                batch_size=500,
+            )
+            AnswerOption.objects.bulk_create(
+                [
+                    AnswerOption(
+                        question=question,
+                        text=o.text,
+                        order=i,
+                        is_correct=o.is_correct,
+                    )
+                    for question, q in zip(questions, definition.questions)
+                    for i, o in enumerate(q.options, start=1)
+                ],
+                batch_size=1000,
+            )
+    except Exception:
+        # После отката на записанные файлы никто не ссылается
+        delete_orphaned_images([image for image in images if image[0]])
+        raise
+    return test
@@ -0,0 +1,124 @@
+"""Двухуровневый кэш: процессный LRU поверх общего кэша Django.
+
+Ключи включают версию содержимого (например, ``Test.content_version``),
+поэтому устаревшие записи не нужно рассылать по процессам — после
+изменения теста они просто перестают запрашиваться и вытесняются.
+"""
+
+import threading
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+
+
+class TwoTierCache:
+    def __init__(self, prefix, maxsize=256, timeout=24 * 60 * 60, alias="default"):
+        self.prefix = prefix
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self.alias = alias
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def shared_key(self, key):
+        return ":".join([self.prefix, *(str(part) for part in key)])
+
+    def _get_local(self, key):
+        with self._lock:
+            try:
+                value = self._local[key]
+            except KeyError:
+                return None, False
+            self._local.move_to_end(key)
+            return value, True
+
+    def _set_local(self, key, value):
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def get(self, key, build):
+        """Возвращает значение по ключу, при промахе вызывает build().
+
+        Одновременные промахи по одному ключу внутри процесса ждут
+        единственной сборки, а не строят значение каждый сам.
+        """
+        value, found = self._get_local(key)
+        if found:
+            return value
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        with build_lock:
+            value, found = self._get_local(key)
+            if found:
+                return value
+
+            shared_key = self.shared_key(key)
+            sentinel = object()
+            value = self.shared.get(shared_key, sentinel)
+            if value is sentinel:
+                value = build()
+                self.shared.set(shared_key, value, self.timeout)
+
+            self._set_local(key, value)
+
+        with self._lock:
+            self._build_locks.pop(key, None)
+        return value
+
+    async def aget(self, key, build):
+        """get для async-кода: попадание в процессный LRU — без потоков и I/O,
+        промах (общий кэш, сборка из БД) — в синхронном потоке."""
+        value, found = self._get_local(key)
+        if found:
+            return value
+        return await sync_to_async(self.get)(key, build)
+
+    def get_many(self, keys, build_many):
+        """Пакетный вариант get: build_many(missing_keys) -> {key: value}"""
+        result = {}
+        missing = []
+        for key in keys:
+            value, found = self._get_local(key)
+            if found:
+                result[key] = value
+            else:
+                missing.append(key)
+
+        if missing:
+            shared_keys = {self.shared_key(key): key for key in missing}
+            for shared_key, value in self.shared.get_many(list(shared_keys)).items():
+                result[shared_keys[shared_key]] = value
+                self._set_local(shared_keys[shared_key], value)
+
+            missing = [key for key in missing if key not in result]
+            if missing:
+                built = build_many(missing)
+                self.shared.set_many(
+                    {self.shared_key(key): value for key, value in built.items()},
+                    self.timeout,
+                )
+                for key, value in built.items():
+                    self._set_local(key, value)
+                result.update(built)
+
+        return result
+
+    def discard(self, key):
+        with self._lock:
+            self._local.pop(key, None)
+        self.shared.delete(self.shared_key(key))
+
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core.checks import Error, register
+
+BUILT_ASSETS = ["main/dist/app.css", "main/dist/htmx.min.js"]
+
+
+@register()
+def built_assets_check(app_configs, **kwargs):
+    """С SELF_HOSTED_ASSETS страницы без сборки остались бы без стилей и htmx"""
+    if not settings.SELF_HOSTED_ASSETS:
+        return []
+    return [
+        Error(
+            f"SELF_HOSTED_ASSETS=1, но {name} не собран",
+            hint="Запустите manage.py build_assets или уберите SELF_HOSTED_ASSETS",
+            id="main.E001",
+        )
+        for name in BUILT_ASSETS
+        if finders.find(name) is None
+    ]
@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def assets(request):
+    """Откуда base.html берёт CSS и htmx: сборка build_assets или CDN"""
+    return {"self_hosted_assets": settings.SELF_HOSTED_ASSETS}
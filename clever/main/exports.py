@@ -0,0 +1,202 @@
+"""Потоковая выгрузка результатов в CSV/XLSX.
+
+Результаты читаются серверным курсором (.iterator()) пачками, ответы
+студентов подгружаются одним запросом на пачку, правильность каждого
+ответа определяется по кэшированному ключу ответов. Весь набор строк
+никогда не хранится в памяти процесса.
+"""
+
+import csv
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .answer_keys import get_answer_key, get_answer_keys_many, normalize_text_answer
+from .levels import get_level_bands_many
+from .models import Test, TestResult, UserAnswer
+from .xlsx import looks_like_formula, stream_xlsx
+
+CHUNK_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+BASE_HEADER = [
+    "Тест",
+    "Студент",
+    "Группа",
+    "Баллы",
+    "Всего",
+    "Процент",
+    "Время",
+    "Дата",
+    "Уровень",
+]
+
+RESULT_FIELDS = (
+    "id",
+    "test_id",
+    "test__title",
+    "student__username",
+    "student__profile__group__name",
+    "score",
+    "total_questions",
+    "time_spent",
+    "completed_at",
+)
+
+
+def _answers_by_result(result_ids):
+    answers = {}
+    for result_id, question_id, option_id, text in UserAnswer.objects.filter(
+        test_result_id__in=result_ids
+    ).values_list("test_result_id", "question_id", "selected_answer_id", "text_answer"):
+        answers.setdefault(result_id, {})[question_id] = (option_id, text)
+    return answers
+
+
+def _correctness(key, answers):
+    """Правильность по вопросам ключа: True/False, None — ответа нет"""
+    marks = []
+    for question in key:
+        answer = answers.get(question["id"])
+        if answer is None:
+            marks.append(None)
+        elif question["question_type"] == "open":
+            marks.append(
+                normalize_text_answer(answer[1]) == question["correct_normalized"]
+            )
+        else:
+            marks.append(
+                answer[0] is not None and answer[0] == question["correct_option_id"]
+            )
+    return marks
+
+
+class _TestContext:
+    """Ключ ответов и уровни теста — по одному разу на тест в выгрузке"""
+
+    def __init__(self):
+        self._tests = {}
+
+    def load(self, test_ids):
+        """Подгружает ещё не встречавшиеся тесты пачки (не больше 4 запросов)"""
+        new_ids = set(test_ids) - self._tests.keys()
+        if not new_ids:
+            return
+        tests = list(
+            Test.objects.filter(pk__in=new_ids).only(
+                "id", "content_version", "levels_version"
+            )
+        )
+        keys = get_answer_keys_many(tests)
+        bands = get_level_bands_many(tests)
+        for test in tests:
+            self._tests[test.id] = (keys[test.id], bands[test.id])
+
+    def get(self, test_id):
+        return self._tests[test_id]
+
+
+def iter_result_rows(results, per_question=True):
+    """Строки выгрузки. per_question — отдельная колонка на каждый вопрос,
+    иначе правильность сводится в одну строку вида «+-+»."""
+    contexts = _TestContext()
+    rows = (
+        results.order_by("completed_at", "id")
+        .values(*RESULT_FIELDS)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            break
+        answers = _answers_by_result([row["id"] for row in chunk])
+        contexts.load(row["test_id"] for row in chunk)
+
+        for row in chunk:
+            key, bands = contexts.get(row["test_id"])
+            total = row["total_questions"]
+            percentage = round(row["score"] / total * 100, 1) if total else 0
+            level = bands.level_for(percentage)
+            marks = _correctness(key, answers.get(row["id"], {}))
+
+            values = [
+                row["test__title"],
+                row["student__username"],
+                row["student__profile__group__name"] or "Без группы",
+                row["score"],
+                total,
+                percentage,
+                f"{row['time_spent'] // 60:02d}:{row['time_spent'] % 60:02d}",
+                timezone.localtime(row["completed_at"]).strftime("%d.%m.%Y %H:%M"),
+                level.title if level else "",
+            ]
+            if per_question:
+                values.extend("" if m is None else int(m) for m in marks)
+            else:
+                values.append(
+                    "".join("." if m is None else "+" if m else "-" for m in marks)
+                )
+            yield values
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    # BOM — чтобы Excel открыл кириллицу в UTF-8; «;» — разделитель для русской локали
+    yield "﻿"
+    writer = csv.writer(_Echo(), delimiter=";")
+    for values in rows:
+        yield writer.writerow([_csv_text(value) for value in values])
+
+
+def _csv_text(value):
+    # В CSV нет типа «текст»: «=…», «+…» Excel откроет как формулу
+    if isinstance(value, str) and looks_like_formula(value):
+        return "'" + value
+    return value
+
+
+def export_response(rows, export_format, filename, sheet_name="Результаты"):
+    if export_format == "xlsx":
+        content = stream_xlsx(rows, sheet_name=sheet_name)
+    else:
+        content = stream_csv(rows)
+
+    response = StreamingHttpResponse(
+        content, content_type=EXPORT_FORMATS[export_format]
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename}.{export_format}"'
+    )
+    return response
+
+
+def test_export(test, export_format):
+    key = get_answer_key(test)
+    header = BASE_HEADER + [f"В{i}" for i in range(1, len(key) + 1)]
+    results = TestResult.objects.filter(test=test)
+    rows = _with_header(header, iter_result_rows(results, per_question=True))
+    return export_response(rows, export_format, f"results_test_{test.id}", test.title)
+
+
+def group_export(teacher, group, export_format):
+    header = BASE_HEADER + ["Ответы"]
+    results = TestResult.objects.filter(
+        test__created_by=teacher, student__profile__group=group
+    )
+    rows = _with_header(header, iter_result_rows(results, per_question=False))
+    return export_response(rows, export_format, f"results_group_{group.id}", group.name)
+
+
+def _with_header(header, rows):
+    yield header
+    yield from rows
@@ -0,0 +1,126 @@
+"""Ключи кэшированных фрагментов панелей ({% cache %} в шаблонах).
+
+Ключ фрагмента собирается из штампов версий — случайных меток в общем
+кэше на преподавателя, группу или студента. Запись, меняющая то, что
+показывает фрагмент, выставляет новый штамп (``invalidate_*`` во вьюхах),
+и старые фрагменты больше не запрашиваются — удалять их не нужно.
+Потерянный штамп заменяется новым, поэтому вытеснение из кэша не вернёт
+устаревший фрагмент.
+
+В ключ входит и отпечаток CSRF-секрета: в фрагментах есть формы с
+``{% csrf_token %}``, а секрет меняется при каждом входе.
+
+Штампы работают, только если кэш общий для всех процессов; при
+FRAGMENT_CACHE_TTL = 0 (по умолчанию с locmem) фрагменты не кэшируются.
+"""
+
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+
+from .models import Test
+
+# Штамп живёт дольше фрагментов, которые на него ссылаются
+STAMP_TTL = 24 * 60 * 60
+
+
+def _stamp_key(scope, pk):
+    return f"fragment-stamp:{scope}:{pk}"
+
+
+def _new_stamp():
+    return uuid.uuid4().hex[:12]
+
+
+def get_stamps(*scopes):
+    """Штампы для пар (область, id) одним обращением к кэшу"""
+    keys = [_stamp_key(scope, pk) for scope, pk in scopes]
+    stamps = cache.get_many(keys)
+    missing = {key: _new_stamp() for key in keys if key not in stamps}
+    if missing:
+        cache.set_many(missing, STAMP_TTL)
+        stamps.update(missing)
+    return ".".join(stamps[key] for key in keys)
+
+
+def _bump_map(scopes):
+    return {_stamp_key(scope, pk): _new_stamp() for scope, pk in scopes}
+
+
+def bump_stamps(*scopes):
+    if scopes:
+        cache.set_many(_bump_map(scopes), STAMP_TTL)
+
+
+async def abump_stamps(*scopes):
+    if scopes:
+        await cache.aset_many(_bump_map(scopes), STAMP_TTL)
+
+
+def _csrf_fingerprint(request):
+    get_token(request)
+    return hashlib.sha256(request.META["CSRF_COOKIE"].encode()).hexdigest()[:12]
+
+
+def _fragment_context(request, *scopes):
+    ttl = settings.FRAGMENT_CACHE_TTL
+    if not ttl:
+        # {% cache 0 %} ничего не сохраняет — штампы не нужны
+        return {"fragment_ttl": 0, "fragment_key": ""}
+    return {
+        "fragment_ttl": ttl,
+        "fragment_key": f"{get_stamps(*scopes)}:{_csrf_fingerprint(request)}",
+    }
+
+
+def teacher_fragments(request):
+    """Контекст для фрагментов панели преподавателя"""
+    return _fragment_context(request, ("teacher", request.user.pk))
+
+
+def student_fragments(request):
+    """Контекст для карточек тестов студента: его результаты и тесты группы"""
+    return _fragment_context(
+        request,
+        ("student", request.user.pk),
+        ("group", request.user.profile.group_id),
+    )
+
+
+def _test_scopes(test, group_ids):
+    if group_ids is None:
+        group_ids = test.groups.values_list("id", flat=True)
+    return [("teacher", test.created_by_id), *(("group", pk) for pk in group_ids)]
+
+
+def invalidate_test_fragments(test, group_ids=None):
+    """Тест создан, изменён или удалён: панель автора и карточки его групп.
+
+    При удалении id групп нужно прочитать заранее и передать в ``group_ids``.
+    """
+    bump_stamps(*_test_scopes(test, group_ids))
+
+
+def invalidate_tests_fragments(test_ids):
+    """То же для тестов по id — правки отдельных вопросов в админке"""
+    scopes = []
+    tests = Test.objects.filter(pk__in=set(test_ids)).prefetch_related("groups")
+    for test in tests.only("created_by"):
+        scopes += _test_scopes(test, [g.pk for g in test.groups.all()])
+    bump_stamps(*scopes)
+
+
+def invalidate_group_fragments(teacher_id, group_id):
+    bump_stamps(("teacher", teacher_id), ("group", group_id))
+
+
+def invalidate_result_fragments(test, student_id):
+    """Новый результат: статистика у автора теста и карточка студента"""
+    bump_stamps(("teacher", test.created_by_id), ("student", student_id))
+
+
+async def ainvalidate_result_fragments(test, student_id):
+    await abump_stamps(("teacher", test.created_by_id), ("student", student_id))
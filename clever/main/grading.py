@@ -0,0 +1,111 @@
+"""Проверка ответов студента.
+
+Вопросы берутся из скомпилированного ключа ответов (см. answer_keys),
+проверка идёт в памяти, а результат и ответы пишутся одной транзакцией
+с пакетной вставкой. Число запросов не зависит от количества вопросов.
+Для теста с выборкой проверяются только вопросы, выпавшие студенту (см. pools).
+"""
+
+from django.db import transaction
+
+from .answer_keys import get_answer_key, normalize_text_answer
+from .models import TestResult, TestStats, UserAnswer
+from .pools import attempt_seed, draw_questions, is_personal
+
+
+def _parse_option_id(raw):
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        return None
+
+
+def grade_answers(questions, answers):
+    """Проверяет ответы в памяти.
+
+    Возвращает (число верных, список UserAnswer без test_result, детали).
+    """
+    correct_count = 0
+    user_answers = []
+    details = []
+
+    for question in questions:
+        # Ответ пользователя (для открытого = текст, для тестового = айди варианта)
+        user_raw_answer = answers.get(str(question["id"]))
+
+        if question["question_type"] == "open":
+            is_correct = (
+                normalize_text_answer(user_raw_answer) == question["correct_normalized"]
+            )
+            user_answers.append(
+                UserAnswer(
+                    question_id=question["id"],
+                    selected_answer=None,
+                    text_answer=user_raw_answer or "",
+                )
+            )
+            user_answer_text = user_raw_answer or "Нет ответа"
+            correct_answer_text = question["correct_text"]
+
+        elif question["question_type"] == "choice":
+            option_id = _parse_option_id(user_raw_answer) if user_raw_answer else None
+            option = question["options"].get(option_id)
+            if option is None:
+                option_id = None
+
+            is_correct = bool(option and option["is_correct"])
+            user_answers.append(
+                UserAnswer(
+                    question_id=question["id"],
+                    selected_answer_id=option_id,
+                    text_answer=None,
+                )
+            )
+            user_answer_text = option["text"] if option else "Нет ответа"
+            correct_answer_text = question["correct_option_text"]
+
+        else:
+            continue
+
+        if is_correct:
+            correct_count += 1
+
+        details.append(
+            {
+                "question_text": question["text"],
+                "user_answer": user_answer_text,
+                "correct_answer": correct_answer_text,
+                "is_correct": is_correct,
+            }
+        )
+
+    return correct_count, user_answers, details
+
+
+def grade_submission(test, student, answers, time_spent=0):
+    """Проверяет попытку и сохраняет результат.
+
+    При тёплом кэше ключа ответов — только запросы на запись внутри одной
+    транзакции: TestResult, пакетная вставка UserAnswer и обновление TestStats.
+    """
+    questions = get_answer_key(test)
+    seed = attempt_seed(test.id, student.pk) if is_personal(test) else None
+    if test.pool_size:
+        questions = draw_questions(questions, test.pool_size, seed)
+    correct_count, user_answers, details = grade_answers(questions, answers or {})
+
+    with transaction.atomic():
+        test_result = TestResult.objects.create(
+            test=test,
+            student=student,
+            score=correct_count,
+            total_questions=len(questions),
+            time_spent=time_spent,
+            pool_seed=seed,
+        )
+        for user_answer in user_answers:
+            user_answer.test_result = test_result
+        UserAnswer.objects.bulk_create(user_answers)
+        TestStats.record(test_result)
+
+    return test_result, details
@@ -0,0 +1,242 @@
+"""Обработка картинок вопросов: нормализация и уменьшенные копии.
+
+При загрузке картинка поворачивается по EXIF, теряет метаданные
+(геометку телефона, превью, цветовые профили) и перекодируется; рядом
+сохраняются копии нескольких ширин в JPEG (PNG для картинок с
+прозрачностью) и WebP. Манифест с размерами и путями копий хранится в
+``Question.image_variants``, по нему ``start_test`` отдаёт ``srcset``.
+
+Файлы называются по хешу загруженных байтов (см. ``storage``): повторная
+загрузка той же картинки не обрабатывается заново, а берёт готовые файлы
+и манифест. Файлы удаляются, только когда на них не ссылается ни один
+вопрос. Повторное использование файлов и их удаление идут под блокировкой
+по хешу (``lock_image``), иначе удаление могло бы успеть между тем, как
+загрузка нашла готовый файл, и коммитом вопроса, который на него ссылается.
+"""
+
+import io
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .models import Question
+from .storage import content_hash, hashed_name, question_image_storage
+
+VARIANT_WIDTHS = getattr(settings, "QUESTION_IMAGE_WIDTHS", (480, 960, 1600))
+# Длинная сторона нормализованного оригинала
+MAX_SIDE = getattr(settings, "QUESTION_IMAGE_MAX_SIDE", 2048)
+
+JPEG_OPTIONS = {"quality": 82, "optimize": True, "progressive": True}
+WEBP_OPTIONS = {"quality": 80, "method": 4}
+PNG_OPTIONS = {"optimize": True}
+
+
+class ImageProcessingError(ValueError):
+    pass
+
+
+def _has_alpha(img):
+    return img.mode in ("RGBA", "LA", "PA") or (
+        img.mode == "P" and "transparency" in img.info
+    )
+
+
+def _open_normalized(file):
+    """Открывает картинку, поворачивает по EXIF и приводит к RGB/RGBA"""
+    try:
+        img = Image.open(file)
+        # Для JPEG декодируем сразу в уменьшенном масштабе (DCT) — быстрее и меньше памяти
+        img.draft("RGB", (MAX_SIDE, MAX_SIDE))
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ImageProcessingError(f"не удалось прочитать изображение: {e}")
+
+    img = img.convert("RGBA" if _has_alpha(img) else "RGB")
+    if max(img.size) > MAX_SIDE:
+        img.thumbnail((MAX_SIDE, MAX_SIDE), Image.Resampling.LANCZOS)
+    return img
+
+
+def _encode(img, fmt):
+    buffer = io.BytesIO()
+    options = {"JPEG": JPEG_OPTIONS, "WEBP": WEBP_OPTIONS, "PNG": PNG_OPTIONS}[fmt]
+    # Метаданные не переносятся: exif/icc_profile в save не передаются
+    img.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def _resized(img, width):
+    if width >= img.width:
+        return img
+    height = max(1, round(img.height * width / img.width))
+    return img.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def _save(name, data):
+    return question_image_storage().save(name, ContentFile(data))
+
+
+def image_key(name):
+    """Хеш картинки по имени её файла или копии (…/<хеш>_480.webp → <хеш>)"""
+    return posixpath.basename(name).split(".")[0].split("_")[0]
+
+
+def lock_image(key):
+    """Блокирует картинку с этим хешем до конца текущей транзакции.
+
+    Сохранение вопроса с картинкой держит блокировку до коммита, поэтому
+    удаление файлов дожидается его и видит ссылку. В SQLite (разработка)
+    запись и так однопоточная — блокировка только для Postgres.
+    """
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [key])
+
+
+def _existing_upload(digest):
+    """Картинка с тем же хешем, уже сохранённая для другого вопроса"""
+    return (
+        Question.objects.filter(image__startswith=hashed_name(digest, "."))
+        .exclude(image_variants={})
+        .values_list("image", "image_variants")
+        .first()
+    )
+
+
+def store_question_image(file):
+    """Сохраняет нормализованную картинку и её копии. Возвращает (имя, манифест).
+
+    Вызывать внутри транзакции, которая сохранит ссылающийся вопрос (см. lock_image).
+    """
+    if hasattr(file, "seek"):
+        file.seek(0)
+    data = file.read()
+    digest = content_hash(data)
+    lock_image(digest)
+    existing = _existing_upload(digest)
+    if existing is not None:
+        return existing
+
+    img = _open_normalized(io.BytesIO(data))
+    fallback = "PNG" if img.mode == "RGBA" else "JPEG"
+    ext = {"PNG": "png", "JPEG": "jpg"}[fallback]
+
+    name = _save(hashed_name(digest, f".{ext}"), _encode(img, fallback))
+
+    widths = sorted({w for w in VARIANT_WIDTHS if w < img.width} | {img.width})
+    variants = {f"image/{fallback.lower()}": [], "image/webp": []}
+    for width in widths:
+        resized = _resized(img, width)
+        if width == img.width:
+            variants[f"image/{fallback.lower()}"].append([width, name])
+        else:
+            variants[f"image/{fallback.lower()}"].append(
+                [
+                    width,
+                    _save(
+                        hashed_name(digest, f"_{width}.{ext}"),
+                        _encode(resized, fallback),
+                    ),
+                ]
+            )
+        variants["image/webp"].append(
+            [
+                width,
+                _save(hashed_name(digest, f"_{width}.webp"), _encode(resized, "WEBP")),
+            ]
+        )
+
+    manifest = {"width": img.width, "height": img.height, "variants": variants}
+    return name, manifest
+
+
+def apply_question_image(question):
+    """Обрабатывает только что загруженную картинку вопроса (до сохранения модели)"""
+    image = question.image
+    if not image or getattr(image, "_committed", True):
+        return
+    name, manifest = store_question_image(image.file)
+    question.image = name
+    question.image_variants = manifest
+
+
+def reprocess_question_image(question):
+    """Строит копии для уже сохранённой картинки (для старых вопросов)"""
+    with question.image.open("rb") as f:
+        name, manifest = store_question_image(f)
+    question.image = name
+    question.image_variants = manifest
+
+
+def variant_names(manifest):
+    """Все файлы копий из манифеста (без повторов)"""
+    return {
+        name
+        for entries in (manifest or {}).get("variants", {}).values()
+        for _, name in entries
+    }
+
+
+def image_files(name, manifest):
+    """Картинка и все её копии"""
+    return {name} | variant_names(manifest)
+
+
+def delete_orphaned_images(images):
+    """Удаляет файлы картинок [(имя, манифест)], на которые не ссылается ни один вопрос.
+
+    Ссылки проверяются под блокировкой картинки, каждая — в своей короткой
+    транзакции, чтобы не держать несколько блокировок сразу.
+    """
+    storage = question_image_storage()
+    for name, manifest in dict(images).items():
+        with transaction.atomic():
+            lock_image(image_key(name))
+            if Question.objects.filter(image=name).exists():
+                continue
+            for path in image_files(name, manifest):
+                storage.delete(path)
+
+
+def release_question_images(questions):
+    """Вызывается до удаления вопросов: после коммита удаляет осиротевшие файлы.
+
+    Ссылки перепроверяются после коммита под блокировкой картинки, поэтому
+    общая картинка остаётся, пока её использует хотя бы один вопрос — в том
+    числе сохраняемый параллельно.
+    """
+    images = list(
+        questions.exclude(image="")
+        .exclude(image__isnull=True)
+        .values_list("image", "image_variants")
+    )
+    if images:
+        transaction.on_commit(lambda: delete_orphaned_images(images))
+
+
+def image_payload(question):
+    """Поля картинки для start_test: src, размеры и srcset по форматам"""
+    if not question.image:
+        return {"image": None}
+
+    storage = question_image_storage()
+    data = {"image": question.image.url}
+    manifest = question.image_variants or {}
+    if manifest.get("variants"):
+        data.update(
+            {
+                "image_width": manifest["width"],
+                "image_height": manifest["height"],
+                "image_srcset": {
+                    mime: ", ".join(
+                        f"{storage.url(name)} {width}w" for width, name in entries
+                    )
+                    for mime, entries in manifest["variants"].items()
+                },
+            }
+        )
+    return data
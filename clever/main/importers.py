@@ -0,0 +1,399 @@
+"""Импорт теста из файла: JSON, CSV или Moodle GIFT.
+
+Файл разбирается в ``TestDefinition`` (см. ``builder``), картинки
+вопросов берутся из приложенного zip-архива по имени файла. Все ошибки
+разбора, картинок и содержимого собираются сразу и возвращаются одним
+списком — в базу ничего не пишется, пока описание не станет корректным.
+
+Форматы:
+
+* JSON — ``{"title", "description", "questions": [{"text", "type",
+  "options": [{"text", "correct"}], "correct_text", "image"}]}``
+  (или просто список вопросов);
+* CSV — заголовок ``text;type;correct;image;option1;option2;...``:
+  для choice в ``correct`` номер правильного варианта, для open — сам
+  ответ; разделитель «;» или «,», кодировка UTF-8 или cp1251;
+* GIFT — выбор ``{=верно ~неверно}``, верно/неверно ``{T}``/``{F}``,
+  короткий ответ ``{=ответ}`` (становится открытым вопросом).
+"""
+
+import csv
+import io
+import json
+import os
+import posixpath
+import re
+import zipfile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from .builder import (
+    OptionDef,
+    QuestionDef,
+    TestDefinition,
+    TestDefinitionError,
+    validate_definition,
+)
+
+MAX_SOURCE_SIZE = getattr(settings, "IMPORT_MAX_SOURCE_SIZE", 5 * 1024 * 1024)
+MAX_IMAGE_SIZE = getattr(settings, "IMPORT_MAX_IMAGE_SIZE", 5 * 1024 * 1024)
+MAX_ARCHIVE_MEMBERS = 2000
+
+TRUE_FALSE_OPTIONS = ("Верно", "Неверно")
+
+
+# --- JSON -----------------------------------------------------------------
+
+
+def parse_json(text):
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise TestDefinitionError([f"Некорректный JSON: {e}"])
+
+    if isinstance(data, list):
+        data = {"questions": data}
+    if not isinstance(data, dict) or not isinstance(data.get("questions"), list):
+        raise TestDefinitionError(["В JSON нет списка questions"])
+
+    errors = []
+    questions = []
+    for num, item in enumerate(data["questions"], start=1):
+        if not isinstance(item, dict):
+            errors.append(f"Вопрос {num}: ожидается объект")
+            continue
+        options = item.get("options") or []
+        if not isinstance(options, list) or not all(
+            isinstance(o, dict) for o in options
+        ):
+            errors.append(f"Вопрос {num}: options должен быть списком объектов")
+            options = []
+        questions.append(
+            QuestionDef(
+                text=_str(item.get("text")),
+                question_type=_str(item.get("type")) or "choice",
+                correct_text=_str(item.get("correct_text")),
+                options=[
+                    OptionDef(_str(o.get("text")), bool(o.get("correct")))
+                    for o in options
+                ],
+                image=_str(item.get("image")) or None,
+            )
+        )
+    if errors:
+        raise TestDefinitionError(errors)
+    return _str(data.get("title")), _str(data.get("description")), questions
+
+
+def _str(value):
+    return str(value).strip() if value is not None else ""
+
+
+# --- CSV ------------------------------------------------------------------
+
+
+class _SemicolonDialect(csv.excel):
+    delimiter = ";"
+
+
+def parse_csv(text):
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=";,")
+    except csv.Error:
+        dialect = _SemicolonDialect
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+
+    fields = [f.strip().lower() for f in reader.fieldnames or []]
+    if "text" not in fields:
+        raise TestDefinitionError(["В CSV нет колонки text"])
+    reader.fieldnames = fields
+    option_columns = sorted(
+        (f for f in fields if re.fullmatch(r"option\d+", f)),
+        key=lambda f: int(f[len("option") :]),
+    )
+
+    errors = []
+    questions = []
+    for num, row in enumerate(reader, start=1):
+        row = {k: _str(v) for k, v in row.items() if k}
+        question_type = row.get("type") or "choice"
+        correct = row.get("correct", "")
+        options = [row[c] for c in option_columns if row.get(c)]
+
+        if question_type == "choice":
+            if not correct.isdigit() or not 1 <= int(correct) <= len(options):
+                errors.append(
+                    f"Вопрос {num}: correct — номер варианта от 1 до {len(options)}"
+                )
+            options = [
+                OptionDef(text, str(i) == correct)
+                for i, text in enumerate(options, start=1)
+            ]
+            correct = ""
+
+        questions.append(
+            QuestionDef(
+                text=row.get("text", ""),
+                question_type=question_type,
+                correct_text=correct,
+                options=options,
+                image=row.get("image") or None,
+            )
+        )
+    if errors:
+        raise TestDefinitionError(errors)
+    return "", "", questions
+
+
+# --- GIFT -----------------------------------------------------------------
+
+_GIFT_ESCAPES = re.compile(r"\\([~=#{}:n\\])")
+_GIFT_FORMAT = re.compile(r"^\[(html|moodle|plain|markdown)\]\s*")
+_GIFT_WEIGHT = re.compile(r"^%(-?\d+(?:\.\d+)?)%")
+_HTML_IMG = re.compile(r"<img[^>]*\bsrc=[\"']([^\"']+)[\"'][^>]*>", re.IGNORECASE)
+_HTML_TAG = re.compile(r"<[^>]+>")
+
+
+def _gift_unescape(value):
+    return _GIFT_ESCAPES.sub(
+        lambda m: "\n" if m.group(1) == "n" else m.group(1), value
+    ).strip()
+
+
+def _find_unescaped(value, chars, start=0):
+    i = start
+    while i < len(value):
+        if value[i] == "\\":
+            i += 2
+            continue
+        if value[i] in chars:
+            return i
+        i += 1
+    return -1
+
+
+def _split_unescaped(value, markers):
+    """Разбивает по неэкранированным маркерам: [(маркер или None, текст)]"""
+    parts = []
+    marker, start = None, 0
+    while True:
+        i = _find_unescaped(value, markers, start)
+        end = len(value) if i < 0 else i
+        parts.append((marker, value[start:end]))
+        if i < 0:
+            return parts
+        marker, start = value[i], i + 1
+
+
+def _gift_question_text(raw):
+    """Текст вопроса без форматной метки и HTML; имя картинки из <img>"""
+    text = _GIFT_FORMAT.sub("", raw.strip())
+    image = None
+    match = _HTML_IMG.search(text)
+    if match:
+        image = posixpath.basename(match.group(1))
+        text = _HTML_IMG.sub("", text)
+    return _gift_unescape(_HTML_TAG.sub("", text)), image
+
+
+def _gift_answers(body):
+    """Разбор блока {…}: (тип, правильный текст, варианты) или ValueError"""
+    head = body.strip()
+    if head.upper() in ("T", "TRUE", "F", "FALSE") or re.match(
+        r"^(T|TRUE|F|FALSE)\s*#", head, re.IGNORECASE
+    ):
+        is_true = head[0].upper() == "T"
+        return (
+            "choice",
+            "",
+            [
+                OptionDef(TRUE_FALSE_OPTIONS[0], is_true),
+                OptionDef(TRUE_FALSE_OPTIONS[1], not is_true),
+            ],
+        )
+    if not head:
+        raise ValueError("вопросы-эссе не поддерживаются")
+    if head.startswith("#"):
+        raise ValueError("числовые вопросы не поддерживаются")
+
+    parts = _split_unescaped(body, "=~")
+    if parts[0][1].strip():
+        raise ValueError("текст перед вариантами ответа")
+
+    answers = []
+    for marker, text in parts[1:]:
+        feedback = _find_unescaped(text, "#")
+        if feedback >= 0:
+            text = text[:feedback]
+        if "->" in text:
+            raise ValueError("вопросы на соответствие не поддерживаются")
+        weight = _GIFT_WEIGHT.match(text.strip())
+        if weight:
+            text = text.strip()[weight.end() :]
+        is_correct = marker == "=" or (
+            weight is not None and float(weight.group(1)) == 100
+        )
+        answers.append((marker, _gift_unescape(text), is_correct))
+
+    if all(marker == "=" for marker, _, _ in answers):
+        # Короткий ответ — открытый вопрос с единственным правильным текстом
+        if len(answers) != 1:
+            raise ValueError("у открытого вопроса может быть только один ответ")
+        return "open", answers[0][1], []
+    return "choice", "", [OptionDef(text, correct) for _, text, correct in answers]
+
+
+def parse_gift(text):
+    lines = [line for line in text.splitlines() if not line.lstrip().startswith("//")]
+    blocks = re.split(r"\n\s*\n", "\n".join(lines))
+
+    errors = []
+    questions = []
+    for block in blocks:
+        block = block.strip()
+        if not block or block.startswith("$CATEGORY:"):
+            continue
+        num = len(questions) + 1
+
+        if block.startswith("::"):
+            end = block.find("::", 2)
+            block = block[end + 2 :] if end >= 0 else block
+
+        open_brace = _find_unescaped(block, "{")
+        close_brace = _find_unescaped(block, "}", open_brace + 1)
+        if open_brace < 0 or close_brace < 0:
+            errors.append(f"Вопрос {num}: нет блока ответов {{…}}")
+            questions.append(None)
+            continue
+
+        before, after = block[:open_brace], block[close_brace + 1 :]
+        # «Пропущенное слово»: текст после ответов — продолжение вопроса
+        raw_text = f"{before} _____ {after}" if after.strip() else before
+        question_text, image = _gift_question_text(raw_text)
+        try:
+            question_type, correct_text, options = _gift_answers(
+                block[open_brace + 1 : close_brace]
+            )
+        except ValueError as e:
+            errors.append(f"Вопрос {num}: {e}")
+            questions.append(None)
+            continue
+
+        questions.append(
+            QuestionDef(question_text, question_type, correct_text, options, image)
+        )
+    if errors:
+        raise TestDefinitionError(errors)
+    return "", "", questions
+
+
+PARSERS = {
+    ".json": parse_json,
+    ".csv": parse_csv,
+    ".gift": parse_gift,
+    ".txt": parse_gift,
+}
+
+
+# --- Картинки -------------------------------------------------------------
+
+
+def _read_source(upload):
+    if upload.size > MAX_SOURCE_SIZE:
+        raise TestDefinitionError(["Файл с вопросами слишком большой"])
+    data = upload.read()
+    for encoding in ("utf-8-sig", "cp1251"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    raise TestDefinitionError(["Не удалось определить кодировку файла"])
+
+
+def _attach_images(questions, images_upload):
+    """Заменяет имена картинок файлами из архива; ошибки — списком"""
+    wanted = {q.image for q in questions if q.image}
+    if not wanted:
+        return questions, []
+    if images_upload is None:
+        return questions, [
+            f"Не приложен архив с изображениями: {', '.join(sorted(wanted))}"
+        ]
+
+    try:
+        archive = zipfile.ZipFile(images_upload)
+    except zipfile.BadZipFile:
+        return questions, ["Архив с изображениями повреждён"]
+
+    errors = []
+    files = {}
+    with archive:
+        members = [m for m in archive.infolist() if not m.is_dir()]
+        if len(members) > MAX_ARCHIVE_MEMBERS:
+            return questions, ["В архиве слишком много файлов"]
+        by_name = {posixpath.basename(m.filename): m for m in members}
+
+        for name in sorted(wanted):
+            member = by_name.get(name)
+            if member is None:
+                errors.append(f"Изображение «{name}» не найдено в архиве")
+                continue
+            # file_size из заголовка, а не фактический объём: защита от zip-бомб
+            if member.file_size > MAX_IMAGE_SIZE:
+                errors.append(f"Изображение «{name}» слишком большое")
+                continue
+            with archive.open(member) as f:
+                data = f.read(MAX_IMAGE_SIZE + 1)
+            try:
+                Image.open(io.BytesIO(data)).verify()
+            except Exception:
+                errors.append(f"Файл «{name}» не является изображением")
+                continue
+            files[name] = data
+
+    attached = [
+        (
+            q._replace(image=ContentFile(files[q.image], name=q.image))
+            if q.image in files
+            else q
+        )
+        for q in questions
+    ]
+    return attached, errors
+
+
+def parse_import(
+    upload,
+    images_upload=None,
+    title="",
+    description="",
+    pool_size=None,
+    shuffle_options=False,
+):
+    """Разбирает загруженный файл (и архив картинок) в проверенный TestDefinition.
+
+    Название и описание из формы важнее заданных в файле; если названия
+    нет нигде, используется имя файла. Параметры выборки — из формы (см.
+    builder.pool_options).
+    """
+    stem, ext = os.path.splitext(upload.name or "")
+    parser = PARSERS.get(ext.lower())
+    if parser is None:
+        raise TestDefinitionError(["Поддерживаются файлы .json, .csv и .gift (.txt)"])
+
+    file_title, file_description, questions = parser(_read_source(upload))
+    questions, errors = _attach_images(questions, images_upload)
+
+    definition = TestDefinition(
+        title=(title or file_title or stem).strip(),
+        description=(description or file_description).strip(),
+        questions=questions,
+        pool_size=pool_size,
+        shuffle_options=shuffle_options,
+    )
+    errors += validate_definition(definition)
+    if errors:
+        raise TestDefinitionError(errors)
+    return definition
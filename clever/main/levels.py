@@ -0,0 +1,159 @@
+"""Уровни (пороги оценок) теста в виде отсортированного массива диапазонов.
+
+Уровни теста компилируются в массив непересекающихся диапазонов
+[min_percent, max_percent], отсортированный по нижней границе; уровень для
+процента ищется бинарным поиском. Скомпилированные диапазоны кэшируются
+под своей версией (``Test.levels_version``): замена уровней не сбрасывает
+ключ ответов и описание теста. Разрывы и пересечения проверяются при
+компиляции, а не обнаруживаются при чтении.
+"""
+
+import logging
+from bisect import bisect_right
+from collections import defaultdict, namedtuple
+
+from django.conf import settings
+from django.db import transaction
+
+from .caching import TwoTierCache
+from .models import TestLevel
+
+logger = logging.getLogger(__name__)
+
+Level = namedtuple(
+    "Level", "order title min_percent max_percent description recommendations"
+)
+
+level_bands_cache = TwoTierCache(
+    "level-bands",
+    maxsize=getattr(settings, "LEVEL_BANDS_LRU_SIZE", 1024),
+)
+
+
+class LevelBandError(ValueError):
+    pass
+
+
+class LevelBands:
+    __slots__ = ("bands", "mins", "ordered")
+
+    def __init__(self, levels, strict=True):
+        self.ordered = sorted(levels, key=lambda lvl: lvl.order)
+        self.bands = sorted(levels, key=lambda lvl: (lvl.min_percent, lvl.order))
+        self.mins = [lvl.min_percent for lvl in self.bands]
+
+        try:
+            self.validate()
+        except LevelBandError:
+            if strict:
+                raise
+            # Старые данные, сохранённые до появления проверки: читаем как есть
+            logger.warning("Некорректные уровни теста: %s", self.bands, exc_info=True)
+
+    def __getstate__(self):
+        return self.ordered
+
+    def __setstate__(self, state):
+        self.__init__(state, strict=False)
+
+    def __bool__(self):
+        return bool(self.bands)
+
+    def validate(self):
+        """Диапазоны должны без разрывов и пересечений покрывать 0..100"""
+        if not self.bands:
+            return
+
+        for lvl in self.bands:
+            if not 0 <= lvl.min_percent <= lvl.max_percent <= 100:
+                raise LevelBandError(
+                    f"Уровень «{lvl.title}»: некорректный диапазон "
+                    f"{lvl.min_percent}–{lvl.max_percent}%"
+                )
+
+        if self.bands[0].min_percent != 0:
+            raise LevelBandError("Уровни должны начинаться с 0%")
+        if self.bands[-1].max_percent != 100:
+            raise LevelBandError("Уровни должны заканчиваться на 100%")
+
+        for prev, cur in zip(self.bands, self.bands[1:]):
+            if cur.min_percent <= prev.max_percent:
+                raise LevelBandError(
+                    f"Уровни «{prev.title}» и «{cur.title}» пересекаются"
+                )
+            if cur.min_percent > prev.max_percent + 1:
+                raise LevelBandError(
+                    f"Между уровнями «{prev.title}» и «{cur.title}» есть разрыв"
+                )
+
+    def level_for(self, score_percent):
+        """Уровень для процента правильных ответов"""
+        score_percent = round(score_percent)
+
+        i = bisect_right(self.mins, score_percent) - 1
+        if i >= 0 and score_percent <= self.bands[i].max_percent:
+            return self.bands[i]
+
+        # Вне диапазонов (например, старые данные с разрывами) — ближайший край
+        if not self.ordered:
+            return None
+        return self.ordered[0] if score_percent <= 0 else self.ordered[-1]
+
+
+def _level_from_model(level):
+    return Level(
+        order=level.order,
+        title=level.title,
+        min_percent=level.min_percent,
+        max_percent=level.max_percent,
+        description=level.description,
+        recommendations=level.recommendations,
+    )
+
+
+def load_level_bands(test_ids):
+    """Компилирует уровни для нескольких тестов одним запросом"""
+    levels = defaultdict(list)
+    for level in TestLevel.objects.filter(test_id__in=test_ids):
+        levels[level.test_id].append(_level_from_model(level))
+    return {
+        test_id: LevelBands(levels[test_id], strict=False) for test_id in test_ids
+    }
+
+
+def get_level_bands(test):
+    return level_bands_cache.get(
+        (test.id, test.levels_version),
+        lambda: load_level_bands([test.id])[test.id],
+    )
+
+
+async def aget_level_bands(test):
+    return await level_bands_cache.aget(
+        (test.id, test.levels_version),
+        lambda: load_level_bands([test.id])[test.id],
+    )
+
+
+def get_level_bands_many(tests):
+    """{test_id: LevelBands} для списка тестов; промахи кэша — одним запросом"""
+
+    def build(missing):
+        loaded = load_level_bands([test_id for test_id, _ in missing])
+        return {key: loaded[key[0]] for key in missing}
+
+    keys = [(t.id, t.levels_version) for t in tests]
+    by_key = level_bands_cache.get_many(keys, build)
+    return {test_id: bands for (test_id, _), bands in by_key.items()}
+
+
+def replace_levels(test, levels):
+    """Проверяет и атомарно заменяет уровни теста (delete + bulk_create)"""
+    LevelBands(levels)
+
+    with transaction.atomic():
+        TestLevel.objects.filter(test=test).delete()
+        TestLevel.objects.bulk_create(
+            [TestLevel(test=test, **lvl._asdict()) for lvl in levels]
+        )
+        test.bump_levels_version()
@@ -0,0 +1,326 @@
+"""Сценарий «экзаменационного часа пик» поверх клиента из bench.py.
+
+Каждый студент — отдельное keep-alive соединение со своими cookie, как
+браузер за nginx: страница входа → вход → панель → start → submit.
+Студенты приходят равномерно в течение ramp-up, между start и submit —
+время «на размышление». Пока они сдают, преподаватели обновляют панель
+и ленту результатов. Итог по каждому шагу — RPS, перцентили задержки,
+доля ошибок и запросы к БД (если сервер отдаёт X-DB-Queries).
+"""
+
+import asyncio
+import json
+import random
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from .bench import HttpConnection, LoadResult
+from .builder import OptionDef, QuestionDef, TestDefinition, save_test_definition
+from .models import Group, Test, TestResult, UserProfile
+
+
+class JourneyError(Exception):
+    """Шаг сценария не удался: сеть или неожиданный HTTP-статус"""
+
+
+class Browser:
+    """Соединение с cookie и CSRF-токеном, запросы подписаны как https за прокси"""
+
+    def __init__(self, base_url, results):
+        self.conn = HttpConnection(base_url)
+        self.origin = f"https://{urlsplit(base_url).netloc}"
+        self.cookies = {}
+        self.results = results
+
+    def _headers(self, method, path):
+        headers = {"X-Forwarded-Proto": "https"}
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        if method != "GET":
+            headers["Origin"] = self.origin
+            headers["Referer"] = self.origin + path
+            headers["X-CSRFToken"] = self.cookies.get(settings.CSRF_COOKIE_NAME, "")
+        return headers
+
+    def _store_cookies(self, response_headers):
+        for raw in response_headers.get("set-cookie", []):
+            for name, morsel in SimpleCookie(raw).items():
+                if morsel["max-age"] == "0":
+                    self.cookies.pop(name, None)
+                else:
+                    self.cookies[name] = morsel.value
+
+    async def call(self, step, method, path, form=None, json_body=None, expect=(200,)):
+        headers = self._headers(method, path)
+        body = b""
+        if form is not None:
+            body = urlencode(form).encode()
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        elif json_body is not None:
+            body = json.dumps(json_body).encode()
+            headers["Content-Type"] = "application/json"
+
+        result = self.results.setdefault(step, LoadResult())
+        started = time.monotonic()
+        try:
+            status, response_headers, content = await self.conn.send(
+                method, path, headers, body
+            )
+        except (OSError, ConnectionError, asyncio.TimeoutError, ValueError) as e:
+            result.errors += 1
+            await self.conn.close()
+            raise JourneyError(f"{step}: {e!r}") from e
+
+        result.record(
+            time.monotonic() - started, status, response_headers, status in expect
+        )
+        self._store_cookies(response_headers)
+        if status not in expect:
+            raise JourneyError(f"{step}: HTTP {status}")
+        return content
+
+    async def login(self, email, password):
+        path = reverse("main:login")
+        await self.call("login_page", "GET", path)
+        await self.call(
+            "login",
+            "POST",
+            path,
+            form={"email": email, "password": password},
+            expect=(302,),
+        )
+
+    async def close(self):
+        await self.conn.close()
+
+
+def pick_answers(payload, rng):
+    """Случайные ответы на вопросы из ответа start_test"""
+    answers = {}
+    for question in payload["questions"]:
+        if question["question_type"] == "open":
+            answers[str(question["id"])] = rng.choice(["ответ", "не знаю", ""])
+        elif question["answers"]:
+            answers[str(question["id"])] = rng.choice(question["answers"])["id"]
+    return answers
+
+
+async def student_journey(base_url, account, results, delay, think_time, rng):
+    """account — (email, пароль, id теста). True, если сдача дошла до конца"""
+    email, password, test_id = account
+    await asyncio.sleep(delay)
+    browser = Browser(base_url, results)
+    try:
+        await browser.login(email, password)
+        await browser.call("student_home", "GET", reverse("main:student_home"))
+        payload = json.loads(
+            await browser.call(
+                "start_test", "GET", reverse("main:start_test", args=[test_id])
+            )
+        )
+        spent = rng.uniform(0.5, 1.5) * think_time
+        await asyncio.sleep(spent)
+        await browser.call(
+            "submit_test",
+            "POST",
+            reverse("main:submit_test", args=[test_id]),
+            json_body={"answers": pick_answers(payload, rng), "time_spent": int(spent)},
+        )
+        return True
+    except JourneyError:
+        return False
+    finally:
+        await browser.close()
+
+
+async def teacher_refresh(base_url, account, results, stop, interval):
+    """Преподаватель держит панель открытой и обновляет её, пока идёт экзамен"""
+    email, password = account
+    browser = Browser(base_url, results)
+    try:
+        await browser.login(email, password)
+        while not stop.is_set():
+            await browser.call("teacher_home", "GET", reverse("main:teacher_home"))
+            # Вкладки подгружаются отдельно; по умолчанию открыта «Создание работы»
+            await browser.call(
+                "teacher_tab",
+                "GET",
+                reverse("main:teacher_tab", args=["create_test"]),
+            )
+            await browser.call("results_feed", "GET", reverse("main:results_feed"))
+            try:
+                await asyncio.wait_for(stop.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+    except JourneyError:
+        pass
+    finally:
+        await browser.close()
+
+
+async def run_exam_rush(
+    base_url,
+    students,
+    teachers=(),
+    ramp_up=60.0,
+    think_time=5.0,
+    teacher_interval=5.0,
+    seed=None,
+):
+    """Прогоняет сценарий и возвращает отчёт (словарь, готовый для JSON)"""
+    rng = random.Random(seed)
+    results = {}
+    stop = asyncio.Event()
+    started_at = timezone.now()
+    started = time.monotonic()
+
+    teacher_tasks = [
+        asyncio.create_task(
+            teacher_refresh(base_url, account, results, stop, teacher_interval)
+        )
+        for account in teachers
+    ]
+    step = ramp_up / len(students) if students else 0
+    outcomes = await asyncio.gather(
+        *(
+            student_journey(
+                base_url,
+                account,
+                results,
+                i * step,
+                think_time,
+                random.Random(rng.random()),
+            )
+            for i, account in enumerate(students)
+        )
+    )
+    stop.set()
+    await asyncio.gather(*teacher_tasks)
+    elapsed = time.monotonic() - started
+
+    for result in results.values():
+        result.elapsed = elapsed
+    total = sum(result.requests for result in results.values())
+    return {
+        "started_at": started_at.isoformat(),
+        "base_url": base_url,
+        "duration_s": round(elapsed, 2),
+        "students": len(students),
+        "teachers": len(teachers),
+        "ramp_up_s": ramp_up,
+        "think_time_s": think_time,
+        "completed_journeys": sum(outcomes),
+        "failed_journeys": len(outcomes) - sum(outcomes),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "steps": {name: result.to_dict() for name, result in results.items()},
+    }
+
+
+def _username(prefix, role, index):
+    # username уникален — с префиксом, чтобы прогоны с разными префиксами уживались
+    return f"{prefix}-{role}-{index}"
+
+
+def _email(prefix, role, index):
+    return f"{_username(prefix, role, index)}@example.com"
+
+
+def seed_exam_rush(prefix, students, teachers, tests, questions, password):
+    """Группа на преподавателя, студенты поровну по группам, тесты каждой группе.
+
+    Прежние данные с тем же префиксом удаляются. Хеш пароля считается один
+    раз на всех — на тысячах пользователей это минуты.
+    """
+    User = get_user_model()
+    password_hash = make_password(password)
+
+    with transaction.atomic():
+        User.objects.filter(email__startswith=f"{prefix}-").delete()
+        Group.objects.filter(name__startswith=f"{prefix}-").delete()
+
+        teacher_users = User.objects.bulk_create(
+            User(
+                email=_email(prefix, "teacher", i),
+                username=_username(prefix, "teacher", i),
+                password=password_hash,
+            )
+            for i in range(teachers)
+        )
+        groups = Group.objects.bulk_create(
+            Group(name=f"{prefix}-{i}", created_by=teacher)
+            for i, teacher in enumerate(teacher_users)
+        )
+        student_users = User.objects.bulk_create(
+            User(
+                email=_email(prefix, "student", i),
+                username=_username(prefix, "student", i),
+                password=password_hash,
+            )
+            for i in range(students)
+        )
+        UserProfile.objects.bulk_create(
+            [UserProfile(user=user, role="teacher") for user in teacher_users]
+            + [
+                UserProfile(user=user, role="student", group=groups[i % len(groups)])
+                for i, user in enumerate(student_users)
+            ]
+        )
+
+        for teacher, group in zip(teacher_users, groups):
+            for t in range(tests):
+                definition = TestDefinition(
+                    title=f"Экзамен {t + 1}",
+                    description="Нагрузочный прогон",
+                    questions=[_rush_question(q) for q in range(questions)],
+                )
+                save_test_definition(teacher, definition, [group.id])
+
+
+def _rush_question(index):
+    if index % 5 == 4:
+        return QuestionDef(f"Вопрос {index + 1}", "open", "ответ", [], None)
+    options = [OptionDef(f"Вариант {o}", o == 1) for o in range(1, 5)]
+    return QuestionDef(f"Вопрос {index + 1}", "choice", "", options, None)
+
+
+def rush_accounts(prefix, password):
+    """(студенты, преподаватели) для run_exam_rush из засеянных данных.
+
+    Студенту достаётся один из тестов его группы — по кругу.
+    """
+    profiles = (
+        UserProfile.objects.filter(user__email__startswith=f"{prefix}-")
+        .select_related("user")
+        .order_by("user_id")
+    )
+    tests_by_group = {}
+    for test_id, group_id in Test.objects.filter(
+        groups__name__startswith=f"{prefix}-"
+    ).values_list("id", "groups"):
+        tests_by_group.setdefault(group_id, []).append(test_id)
+
+    students, teachers = [], []
+    for profile in profiles:
+        if profile.role == "teacher":
+            teachers.append((profile.user.email, password))
+        elif tests_by_group.get(profile.group_id):
+            group_tests = tests_by_group[profile.group_id]
+            test_id = group_tests[len(students) % len(group_tests)]
+            students.append((profile.user.email, password, test_id))
+    return students, teachers
+
+
+def reset_rush_results(prefix):
+    """Удаляет результаты засеянных студентов, чтобы прогон можно было повторить"""
+    _, deleted = TestResult.objects.filter(
+        student__email__startswith=f"{prefix}-"
+    ).delete()
+    return deleted.get(TestResult._meta.label, 0)
@@ -0,0 +1,79 @@
+import asyncio
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from main.bench import run_load, session_cookie
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает WSGI- и ASGI-развёртывания под ростом числа одновременных "
+        "соединений. Пример: запустить рядом\n"
+        "  gunicorn clever.wsgi:application -w 4 -b :8000\n"
+        "  ASYNC_EXAM_VIEWS=1 uvicorn clever.asgi:application --workers 4 --port 8001\n"
+        "и выполнить\n"
+        "  manage.py bench_concurrency --target wsgi=http://localhost:8000 "
+        "--target asgi=http://localhost:8001 --email student@example.com "
+        "--path /student/test/1/start/"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--target",
+            action="append",
+            required=True,
+            help="имя=базовый URL, можно несколько",
+        )
+        parser.add_argument("--path", default="/student/test/1/start/")
+        parser.add_argument(
+            "--email", help="пользователь, от имени которого идут запросы"
+        )
+        parser.add_argument(
+            "--concurrency",
+            default="10,50,200,500",
+            help="уровни одновременных соединений через запятую",
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10, help="секунд на каждый уровень"
+        )
+        parser.add_argument(
+            "--header",
+            action="append",
+            default=[],
+            help="доп. заголовок «Имя: значение» (например Host: localhost)",
+        )
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options["target"]:
+            name, sep, base_url = target.partition("=")
+            if not sep:
+                raise CommandError(f"--target ожидается в виде имя=URL: {target}")
+            targets.append((name, base_url.rstrip("/")))
+
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency — числа через запятую")
+
+        # За nginx Django видит https через X-Forwarded-Proto; без него — редирект
+        headers = {"X-Forwarded-Proto": "https"}
+        for header in options["header"]:
+            name, _, value = header.partition(":")
+            headers[name.strip()] = value.strip()
+        if options["email"]:
+            user = get_user_model().objects.get(email=options["email"])
+            headers["Cookie"] = session_cookie(user)
+
+        for concurrency in levels:
+            for name, base_url in targets:
+                result = asyncio.run(
+                    run_load(
+                        base_url + options["path"],
+                        concurrency,
+                        options["duration"],
+                        headers=headers,
+                    )
+                )
+                self.stdout.write(f"{name:>8} x{concurrency:<5} {result.summary()}")
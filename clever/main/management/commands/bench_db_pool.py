@@ -0,0 +1,118 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from main.bench import run_load, session_cookie
+
+# Переменные окружения, с которыми поднимается сервер в каждом режиме
+MODES = {
+    "no-reuse": {"DB_POOL": "0", "DB_CONN_MAX_AGE": "0"},
+    "persistent": {"DB_POOL": "0", "DB_CONN_MAX_AGE": "60"},
+    "pool": {"DB_POOL": "1"},
+}
+
+
+def wait_for_port(port, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), 0.5).close()
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+class Command(BaseCommand):
+    help = (
+        "Сравнивает режимы соединений с Postgres под нагрузкой: для каждого "
+        "режима поднимает gunicorn с нужными DB_* и меряет RPS и p99. "
+        "Пример (рядом с контейнером db):\n"
+        "  manage.py bench_db_pool --email student@example.com "
+        "--path /student/test/1/start/ --concurrency 20,100"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/student/test/1/start/")
+        parser.add_argument(
+            "--email", help="пользователь, от имени которого идут запросы"
+        )
+        parser.add_argument(
+            "--modes",
+            default=",".join(MODES),
+            help=f"режимы через запятую: {', '.join(MODES)}",
+        )
+        parser.add_argument("--concurrency", default="20,100")
+        parser.add_argument(
+            "--duration", type=float, default=15, help="секунд на каждый уровень"
+        )
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--port", type=int, default=8100)
+
+    def handle(self, *args, **options):
+        modes = options["modes"].split(",")
+        unknown = set(modes) - set(MODES)
+        if unknown:
+            raise CommandError(f"Неизвестные режимы: {', '.join(sorted(unknown))}")
+        try:
+            levels = [int(level) for level in options["concurrency"].split(",")]
+        except ValueError:
+            raise CommandError("--concurrency — числа через запятую")
+        if settings.DATABASES["default"]["ENGINE"] != "django.db.backends.postgresql":
+            raise CommandError("Сравнение имеет смысл только на Postgres")
+
+        headers = {"X-Forwarded-Proto": "https", "Host": "localhost"}
+        if options["email"]:
+            user = get_user_model().objects.get(email=options["email"])
+            headers["Cookie"] = session_cookie(user)
+
+        url = f"http://127.0.0.1:{options['port']}{options['path']}"
+        for mode in modes:
+            server = self.start_server(mode, options)
+            try:
+                # Прогрев: пул заполняется, воркеры загружают код
+                asyncio.run(run_load(url, options["workers"], 2, headers=headers))
+                for concurrency in levels:
+                    result = asyncio.run(
+                        run_load(url, concurrency, options["duration"], headers=headers)
+                    )
+                    self.stdout.write(
+                        f"{mode:>10} x{concurrency:<5} {result.summary()}"
+                    )
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+    def start_server(self, mode, options):
+        env = {
+            **os.environ,
+            **MODES[mode],
+            "DJANGO_SETTINGS_MODULE": os.environ.get(
+                "DJANGO_SETTINGS_MODULE", "clever.settings"
+            ),
+        }
+        command = [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "clever.wsgi:application",
+            "--workers",
+            str(options["workers"]),
+            "--threads",
+            str(options["threads"]),
+            "--bind",
+            f"127.0.0.1:{options['port']}",
+        ]
+        server = subprocess.Popen(command, env=env, cwd=settings.BASE_DIR)
+        if not wait_for_port(options["port"], timeout=30):
+            server.terminate()
+            raise CommandError(f"gunicorn ({mode}) не поднялся на :{options['port']}")
+        return server
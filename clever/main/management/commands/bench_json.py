@@ -0,0 +1,116 @@
+import gzip
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.serializers.json import DjangoJSONEncoder
+
+from main import responses
+from main.middleware import CompressionMiddleware, brotli
+
+WORDS = (
+    "какой вариант правильно описывает процесс функции значение система "
+    "данных таблица определение алгоритм уравнение скорость энергия клетка "
+    "закон формула период реакция объём структура элемент программа сеть "
+    "переменная цикл массив условие результат задача свойство метод модель"
+).split()
+
+
+def sample_payload(questions, options, seed=1):
+    """Ответ start_test того же вида, что build_start_payload, с русскими текстами"""
+    rng = random.Random(seed)
+
+    def text(words):
+        return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+    return {
+        "id": 1,
+        "title": text(5),
+        "description": text(25),
+        "questions": [
+            {
+                "id": 1000 + q,
+                "text": text(rng.randint(12, 40)) + "?",
+                "image": (
+                    f"/media/question_images/ab/{rng.getrandbits(128):032x}.png"
+                    if q % 7 == 0
+                    else None
+                ),
+                "question_type": "open" if q % 5 == 4 else "choice",
+                "answers": (
+                    []
+                    if q % 5 == 4
+                    else [
+                        {"id": 10000 + q * 10 + a, "text": text(rng.randint(1, 8))}
+                        for a in range(options)
+                    ]
+                ),
+            }
+            for q in range(questions)
+        ],
+    }
+
+
+def per_call_ms(func, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        result = func()
+    return (time.perf_counter() - started) * 1000 / iterations, result
+
+
+class Command(BaseCommand):
+    help = (
+        "Микробенчмарк ответа start_test: время кодирования JSON (stdlib и "
+        "orjson, если установлен) и размер/время сжатия gzip и brotli с теми "
+        "же уровнями, что у CompressionMiddleware."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--questions", type=int, default=100)
+        parser.add_argument("--options", type=int, default=4)
+        parser.add_argument("--iterations", type=int, default=200)
+
+    def handle(self, *args, **options):
+        data = sample_payload(options["questions"], options["options"])
+        iterations = options["iterations"]
+
+        encoders = {
+            "json (stdlib)": lambda: json.dumps(data, cls=DjangoJSONEncoder).encode(),
+            "json (ensure_ascii=False)": lambda: json.dumps(
+                data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")
+            ).encode(),
+        }
+        if responses.orjson is not None:
+            encoders["orjson"] = lambda: responses.orjson.dumps(data)
+
+        self.stdout.write(
+            f"{options['questions']} вопросов, {options['options']} варианта, "
+            f"{iterations} повторов\n"
+        )
+        self.stdout.write("Кодирование:")
+        for name, encode in encoders.items():
+            ms, body = per_call_ms(encode, iterations)
+            self.stdout.write(f"  {name:<26} {ms:7.3f} мс  {len(body):>8} байт")
+
+        body = responses.dumps(data)
+        codecs = {
+            f"gzip -{CompressionMiddleware.gzip_level}": lambda: gzip.compress(
+                body, CompressionMiddleware.gzip_level, mtime=0
+            ),
+        }
+        if brotli is not None:
+            quality = CompressionMiddleware.brotli_quality
+            codecs[f"brotli q{quality}"] = lambda: brotli.compress(
+                body, quality=quality
+            )
+        else:
+            self.stdout.write(self.style.WARNING("Пакет Brotli не установлен"))
+
+        self.stdout.write(f"Сжатие ответа ({len(body)} байт):")
+        for name, compress in codecs.items():
+            ms, packed = per_call_ms(compress, iterations)
+            saved = 1 - len(packed) / len(body)
+            self.stdout.write(
+                f"  {name:<26} {ms:7.3f} мс  {len(packed):>8} байт  (−{saved:.0%})"
+            )
@@ -0,0 +1,154 @@
+import hashlib
+import os
+import shutil
+import subprocess
+import urllib.request
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ASSETS_DIR = os.path.join(settings.BASE_DIR, "assets")
+VENDOR_DIR = os.path.join(ASSETS_DIR, "vendor")
+# Контрольные суммы в формате sha256sum; по ним же Dockerfile проверяет Tailwind CLI
+CHECKSUMS_FILE = "SHA256SUMS"
+
+# Сторонние файлы с закреплёнными версиями: скачиваются один раз в assets/vendor
+# и коммитятся вместе с суммами
+VENDOR = {
+    "htmx.min.js": "https://unpkg.com/htmx.org@1.9.10/dist/htmx.min.js",
+    "daisyui.mjs": (
+        "https://github.com/saadeghi/daisyui/releases/download/v5.0.0/daisyui.mjs"
+    ),
+}
+# Из vendor в dist, рядом с собранным CSS
+VENDOR_JS = ["htmx.min.js"]
+
+
+def read_checksums(vendor_dir):
+    """{имя файла: sha256} из assets/vendor/SHA256SUMS"""
+    checksums = {}
+    path = os.path.join(vendor_dir, CHECKSUMS_FILE)
+    if not os.path.exists(path):
+        return checksums
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            digest, name = line.split(maxsplit=1)
+            checksums[name.lstrip("*")] = digest.lower()
+    return checksums
+
+
+def write_checksums(vendor_dir, checksums):
+    path = os.path.join(vendor_dir, CHECKSUMS_FILE)
+    header = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            header = [line for line in f if line.startswith("#")]
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(header)
+        for name in sorted(checksums):
+            f.write(f"{checksums[name]}  {name}\n")
+
+
+class Command(BaseCommand):
+    help = (
+        "Собирает статику без CDN: один минифицированный CSS из assets/app.css "
+        "(Tailwind CSS v4 + daisyUI, только используемые в шаблонах и JS классы) "
+        "и htmx в ASSETS_DIST_DIR. Нужен standalone-бинарник Tailwind "
+        "(настройка TAILWIND_CLI). Сторонние файлы проверяются по "
+        "assets/vendor/SHA256SUMS. Затем collectstatic добавит хеши в имена и "
+        "сжатые .gz/.br копии."
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--refresh-vendor",
+            action="store_true",
+            help="заново скачать файлы из assets/vendor",
+        )
+        parser.add_argument(
+            "--pin",
+            action="store_true",
+            help="записать суммы файлов, которых ещё нет в SHA256SUMS "
+            "(после смены версии в VENDOR)",
+        )
+
+    def handle(self, *args, **options):
+        self.fetch_vendor(options["refresh_vendor"], options["pin"])
+        dist_dir = settings.ASSETS_DIST_DIR
+        os.makedirs(dist_dir, exist_ok=True)
+
+        command = [
+            settings.TAILWIND_CLI,
+            "--input",
+            os.path.join(ASSETS_DIR, "app.css"),
+            "--output",
+            os.path.join(dist_dir, "app.css"),
+            "--minify",
+        ]
+        try:
+            subprocess.run(command, cwd=ASSETS_DIR, check=True)
+        except FileNotFoundError:
+            raise CommandError(
+                f"Не найден Tailwind CLI «{settings.TAILWIND_CLI}» — "
+                "укажите путь к бинарнику в TAILWIND_CLI"
+            )
+        except subprocess.CalledProcessError as e:
+            raise CommandError(f"Сборка CSS завершилась с кодом {e.returncode}")
+
+        for name in VENDOR_JS:
+            shutil.copyfile(
+                os.path.join(VENDOR_DIR, name), os.path.join(dist_dir, name)
+            )
+
+        for name in sorted(os.listdir(dist_dir)):
+            size = os.path.getsize(os.path.join(dist_dir, name))
+            self.stdout.write(f"{name}: {size / 1024:.1f} КБ")
+        self.stdout.write(self.style.SUCCESS("Статика собрана"))
+
+    def fetch_vendor(self, refresh, pin=False):
+        """Скачивает недостающие файлы и сверяет все с SHA256SUMS"""
+        os.makedirs(VENDOR_DIR, exist_ok=True)
+        checksums = read_checksums(VENDOR_DIR)
+        pinned = {}
+        for name, url in VENDOR.items():
+            path = os.path.join(VENDOR_DIR, name)
+            if os.path.exists(path) and not refresh:
+                with open(path, "rb") as f:
+                    data = f.read()
+            else:
+                data = self.download(name, url)
+
+            digest = hashlib.sha256(data).hexdigest()
+            expected = checksums.get(name)
+            if expected is None and pin:
+                pinned[name] = digest
+            elif expected is None:
+                raise CommandError(
+                    f"Для {name} нет суммы в assets/vendor/{CHECKSUMS_FILE}; "
+                    "проверьте файл и запустите build_assets --pin"
+                )
+            elif digest != expected:
+                raise CommandError(
+                    f"{name}: sha256 {digest} не совпадает с закреплённой {expected}"
+                )
+
+            if not os.path.exists(path) or refresh:
+                with open(path, "wb") as f:
+                    f.write(data)
+
+        if pinned:
+            write_checksums(VENDOR_DIR, {**checksums, **pinned})
+            for name, digest in pinned.items():
+                self.stdout.write(f"Закреплён {name}: {digest}")
+
+    def download(self, name, url):
+        self.stdout.write(f"Скачиваю {url}")
+        try:
+            with urllib.request.urlopen(url, timeout=30) as response:
+                return response.read()
+        except OSError as e:
+            raise CommandError(f"Не удалось скачать {name}: {e}")
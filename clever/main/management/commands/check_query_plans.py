@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.query_plans import find_full_scans
+
+
+class Command(BaseCommand):
+    help = (
+        "Выполняет EXPLAIN для горячих запросов (результаты, тесты преподавателя, "
+        "ответы) и завершается с ошибкой, если какой-то из них сканирует таблицу "
+        "целиком. Нужна база с данными: id берутся из первого результата."
+    )
+
+    def handle(self, *args, **options):
+        try:
+            failures = find_full_scans()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for name, plan in failures:
+            self.stderr.write(f"{name}: полный проход по таблице\n{plan}\n")
+        if failures:
+            raise CommandError(f"Запросов без индекса: {len(failures)}")
+        self.stdout.write(self.style.SUCCESS("Все горячие запросы идут по индексам"))
@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+import posixpath
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main.images import image_files, image_key, lock_image
+from main.models import Question
+from main.storage import UPLOAD_DIR, question_image_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет файлы картинок вопросов, на которые не ссылается ни один вопрос "
+        "(остатки отменённых загрузок и заменённых в админке картинок)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-age",
+            type=int,
+            default=60,
+            help="не трогать файлы моложе N минут (идущие загрузки)",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        storage = question_image_storage()
+        referenced = set()
+        for name, manifest in (
+            Question.objects.exclude(image="")
+            .exclude(image__isnull=True)
+            .values_list("image", "image_variants")
+            .iterator()
+        ):
+            referenced |= image_files(name, manifest)
+
+        cutoff = timezone.now() - timedelta(minutes=options["min_age"])
+        removed = 0
+        for path in self.walk(storage, UPLOAD_DIR):
+            if path in referenced or storage.get_modified_time(path) > cutoff:
+                continue
+            if options["dry_run"]:
+                self.stdout.write(path)
+            elif not self.delete_if_unused(storage, path):
+                continue
+            removed += 1
+
+        verb = "Будет удалено" if options["dry_run"] else "Удалено"
+        self.stdout.write(self.style.SUCCESS(f"{verb} файлов: {removed}"))
+
+    def delete_if_unused(self, storage, path):
+        """Перепроверяет ссылки под блокировкой: старый файл могла подхватить загрузка"""
+        key = image_key(path)
+        with transaction.atomic():
+            lock_image(key)
+            prefix = posixpath.join(posixpath.dirname(path), key)
+            if Question.objects.filter(image__startswith=prefix).exists():
+                return False
+            storage.delete(path)
+        return True
+
+    def walk(self, storage, path):
+        if not storage.exists(path):
+            return
+        dirs, files = storage.listdir(path)
+        for name in files:
+            yield f"{path}/{name}"
+        for name in dirs:
+            yield from self.walk(storage, f"{path}/{name}")
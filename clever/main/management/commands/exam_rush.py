@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.loadtest import reset_rush_results, run_exam_rush, rush_accounts
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный прогон «экзамен в понедельник»: студенты из seed_exam_rush "
+        "входят, открывают панель, начинают и сдают тест, преподаватели "
+        "обновляют панель. Сервер должен быть уже запущен; для числа запросов "
+        "к БД — с QUERY_COUNT_HEADER=1. Пример:\n"
+        "  manage.py exam_rush --url http://127.0.0.1:8000 --output rush.json"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8000")
+        parser.add_argument("--prefix", default="rush")
+        parser.add_argument("--password", default="rush-password")
+        parser.add_argument(
+            "--students", type=int, help="сколько засеянных студентов пустить"
+        )
+        parser.add_argument(
+            "--ramp-up", type=float, default=120, help="за сколько секунд придут все"
+        )
+        parser.add_argument(
+            "--think", type=float, default=30, help="среднее время на тест, секунд"
+        )
+        parser.add_argument("--teacher-interval", type=float, default=5)
+        parser.add_argument("--seed", type=int)
+        parser.add_argument("--output", help="куда записать отчёт в JSON")
+        parser.add_argument(
+            "--keep-results",
+            action="store_true",
+            help="не удалять результаты прошлого прогона (повторная сдача даст 400)",
+        )
+
+    def handle(self, *args, **options):
+        students, teachers = rush_accounts(options["prefix"], options["password"])
+        if options["students"] is not None:
+            students = students[: options["students"]]
+        if not students:
+            raise CommandError("Нет студентов с тестами — сначала seed_exam_rush")
+        if not options["keep_results"]:
+            reset_rush_results(options["prefix"])
+
+        report = asyncio.run(
+            run_exam_rush(
+                options["url"].rstrip("/"),
+                students,
+                teachers,
+                ramp_up=options["ramp_up"],
+                think_time=options["think"],
+                teacher_interval=options["teacher_interval"],
+                seed=options["seed"],
+            )
+        )
+
+        self.stdout.write(
+            f"Сдали {report['completed_journeys']} из {report['students']} "
+            f"за {report['duration_s']} с, {report['throughput_rps']} rps"
+        )
+        for name, step in report["steps"].items():
+            latency = step["latency_ms"]
+            queries = step["db_queries"]
+            self.stdout.write(
+                f"{name:>14}: {step['requests']:>5} req, "
+                f"p50 {latency['p50']} ms, p99 {latency['p99']} ms, "
+                f"ошибок {step['error_rate']:.1%}"
+                + (f", запросов к БД ~{queries['avg']}" if queries else "")
+            )
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Отчёт: {options['output']}")
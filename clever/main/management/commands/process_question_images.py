@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from main.images import ImageProcessingError, reprocess_question_image
+from main.models import Question, Test
+
+
+class Command(BaseCommand):
+    help = (
+        "Строит уменьшенные копии и WebP для картинок вопросов, "
+        "загруженных до появления обработки."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="обработать заново и вопросы, у которых копии уже есть",
+        )
+
+    def handle(self, *args, **options):
+        questions = Question.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["all"]:
+            questions = questions.filter(image_variants={})
+
+        processed, test_ids = 0, set()
+        for question in questions.only("id", "test_id", "image").iterator():
+            try:
+                reprocess_question_image(question)
+            except (ImageProcessingError, OSError) as e:
+                self.stderr.write(f"Вопрос {question.id}: {e}")
+                continue
+            question.save(update_fields=["image", "image_variants"])
+            processed += 1
+            test_ids.add(question.test_id)
+
+        # Ответ start_test закэширован под версией теста
+        Test.bump_content_versions(test_ids)
+        self.stdout.write(self.style.SUCCESS(f"Обработано картинок: {processed}"))
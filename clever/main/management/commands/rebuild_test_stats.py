@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from main.stats import rebuild_test_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Пересчитывает TestStats по таблице результатов. "
+        "Запускайте вне пиковой нагрузки: сдачи во время пересчёта могут не попасть в итог."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "test_ids", nargs="*", type=int, help="id тестов (по умолчанию — все)"
+        )
+
+    def handle(self, *args, **options):
+        count = rebuild_test_stats(options["test_ids"] or None)
+        self.stdout.write(self.style.SUCCESS(f"Пересчитано тестов: {count}"))
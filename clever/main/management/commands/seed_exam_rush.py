@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.loadtest import seed_exam_rush
+
+
+class Command(BaseCommand):
+    help = (
+        "Заполняет базу для exam_rush: преподаватели, по группе на каждого, "
+        "студенты и тесты. Пользователи и группы с тем же префиксом "
+        "пересоздаются. Пример:\n"
+        "  manage.py seed_exam_rush --students 300 --teachers 2"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--students", type=int, default=300)
+        parser.add_argument("--teachers", type=int, default=2)
+        parser.add_argument("--tests", type=int, default=2, help="тестов на группу")
+        parser.add_argument("--questions", type=int, default=20)
+        parser.add_argument("--password", default="rush-password")
+        parser.add_argument("--prefix", default="rush")
+
+    def handle(self, *args, **options):
+        if options["teachers"] < 1 or options["tests"] < 1:
+            raise CommandError("Нужен хотя бы один преподаватель и один тест")
+        seed_exam_rush(
+            options["prefix"],
+            options["students"],
+            options["teachers"],
+            options["tests"],
+            options["questions"],
+            options["password"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Создано: {options['students']} студентов, "
+                f"{options['teachers']} преподавателей, "
+                f"{options['teachers'] * options['tests']} тестов"
+            )
+        )
@@ -0,0 +1,79 @@
+"""Проверка доступа к файлам из MEDIA_ROOT.
+
+Картинку вопроса может получить студент группы, которой назначен тест с
+этим вопросом, и преподаватель — автор такого теста. Решение кэшируется
+на группу (для студентов) или пользователя и картинку, поэтому повторные
+запросы — одно обращение к кэшу. Сами байты отдаёт nginx (X-Accel-Redirect).
+"""
+
+import hashlib
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Question
+from .storage import UPLOAD_DIR, hashed_name
+
+ACL_TTL = getattr(settings, "MEDIA_ACL_TTL", 300)
+# Отказ кэшируется ненадолго: тест могут назначить группе в любой момент
+ACL_DENY_TTL = getattr(settings, "MEDIA_ACL_DENY_TTL", 30)
+
+# Нормализованная картинка и её копии: <digest>.jpg, <digest>_480.webp, ...
+_HASHED = re.compile(
+    rf"{UPLOAD_DIR}/([0-9a-f]{{2}})/(\1[0-9a-f]{{62}})(?:_\d+)?\.[a-z]+"
+)
+
+
+def clean_media_path(path):
+    """Путь внутри MEDIA_ROOT или None, если он выходит за его пределы"""
+    normalized = posixpath.normpath(path)
+    if normalized != path or path.startswith(("/", "..")) or "\\" in path:
+        return None
+    return path
+
+
+def is_hashed(path):
+    return _HASHED.fullmatch(path) is not None
+
+
+def _image_lookup(path):
+    """Фильтр вопросов по файлу и ключ картинки для кэша"""
+    match = _HASHED.fullmatch(path)
+    if match:
+        digest = match.group(2)
+        return {"image__startswith": hashed_name(digest, ".")}, digest
+    if path.startswith(f"{UPLOAD_DIR}/"):
+        return {"image": path}, hashlib.sha1(path.encode()).hexdigest()
+    return None, None
+
+
+def _principal(user):
+    profile = getattr(user, "profile", None)
+    if profile is None:
+        return None, {}
+    if profile.role == "teacher":
+        return f"u{user.pk}", {"test__created_by": user}
+    if profile.group_id:
+        return f"g{profile.group_id}", {"test__groups": profile.group_id}
+    return None, {}
+
+
+def can_view_media(user, path):
+    if not user.is_authenticated:
+        return False
+    if user.is_staff:
+        return True
+
+    lookup, image_key = _image_lookup(path)
+    principal, scope = _principal(user)
+    if lookup is None or principal is None:
+        return False
+
+    key = f"media-acl:{principal}:{image_key}"
+    allowed = cache.get(key)
+    if allowed is None:
+        allowed = Question.objects.filter(**lookup, **scope).exists()
+        cache.set(key, allowed, ACL_TTL if allowed else ACL_DENY_TTL)
+    return allowed
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Q, Sum
+
+
+def backfill_stats(apps, schema_editor):
+    Test = apps.get_model("main", "Test")
+    TestResult = apps.get_model("main", "TestResult")
+    TestStats = apps.get_model("main", "TestStats")
+
+    rows = (
+        TestResult.objects.alias(score_x100=F("score") * 100)
+        .values("test_id")
+        .annotate(
+            attempts=Count("id"),
+            score_sum=Sum("score"),
+            score_sq_sum=Sum(F("score") * F("score")),
+            pass_count=Count(
+                "id",
+                filter=Q(
+                    total_questions__gt=0,
+                    score_x100__gte=F("total_questions") * 60,
+                ),
+            ),
+            last_completed_at=Max("completed_at"),
+        )
+        .order_by()
+    )
+    aggregates = {row.pop("test_id"): row for row in rows}
+    TestStats.objects.bulk_create(
+        [
+            TestStats(test_id=test_id, **aggregates.get(test_id, {}))
+            for test_id in Test.objects.values_list("id", flat=True)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0008_test_content_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TestStats",
+            fields=[
+                (
+                    "test",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="main.test",
+                    ),
+                ),
+                (
+                    "attempts",
+                    models.PositiveIntegerField(default=0, verbose_name="Прохождений"),
+                ),
+                ("score_sum", models.BigIntegerField(default=0)),
+                ("score_sq_sum", models.BigIntegerField(default=0)),
+                (
+                    "pass_count",
+                    models.PositiveIntegerField(default=0, verbose_name="Сдали"),
+                ),
+                (
+                    "last_completed_at",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Последнее прохождение"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Статистика теста",
+                "verbose_name_plural": "Статистика тестов",
+            },
+        ),
+        migrations.RunPython(backfill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0009_teststats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="question",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:32
+
+import main.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0010_question_image_variants"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="question",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                storage=main.storage.question_image_storage,
+                upload_to="question_images/",
+            ),
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:44
+
+import logging
+
+from django.db import migrations
+from django.db.models import Min
+
+logger = logging.getLogger(__name__)
+
+PASS_PERCENT = 60
+
+
+# Копии удалённых дубликатов: результаты и их ответы, для разбора и отката
+RESULT_BACKUP = "main_testresult_duplicate_backup"
+ANSWER_BACKUP = "main_useranswer_duplicate_backup"
+
+
+def recount_stats(TestResult, TestStats, test_ids):
+    for test_id in test_ids:
+        stats = {
+            "attempts": 0,
+            "score_sum": 0,
+            "score_sq_sum": 0,
+            "pass_count": 0,
+            "last_completed_at": None,
+        }
+        for score, total, completed_at in TestResult.objects.filter(
+            test_id=test_id
+        ).values_list("score", "total_questions", "completed_at"):
+            stats["attempts"] += 1
+            stats["score_sum"] += score
+            stats["score_sq_sum"] += score * score
+            stats["pass_count"] += total > 0 and score * 100 >= total * PASS_PERCENT
+            if (
+                stats["last_completed_at"] is None
+                or completed_at > stats["last_completed_at"]
+            ):
+                stats["last_completed_at"] = completed_at
+        TestStats.objects.update_or_create(test_id=test_id, defaults=stats)
+
+
+def drop_duplicate_results(apps, schema_editor):
+    """Оставляет по одному результату студента на тест и пересчитывает статистику.
+
+    Остаётся первый результат (наименьший id): повторный проходит нельзя,
+    дубликаты — это параллельные отправки той же попытки, и засчитывается
+    та, что записана первой. Остальные строки вместе с ответами сначала
+    копируются в таблицы *_duplicate_backup — оценки не теряются, откат
+    миграции возвращает их на место.
+    """
+    TestResult = apps.get_model("main", "TestResult")
+    TestStats = apps.get_model("main", "TestStats")
+    UserAnswer = apps.get_model("main", "UserAnswer")
+
+    first_ids = (
+        TestResult.objects.values("test_id", "student_id")
+        .annotate(first_id=Min("id"))
+        .values("first_id")
+    )
+    duplicates = TestResult.objects.exclude(id__in=first_ids)
+    test_ids = set(duplicates.values_list("test_id", flat=True))
+    if not test_ids:
+        return
+
+    qn = schema_editor.quote_name
+    results, answers = TestResult._meta.db_table, UserAnswer._meta.db_table
+    keep = f"SELECT MIN(id) FROM {qn(results)} GROUP BY test_id, student_id"
+    schema_editor.execute(
+        f"CREATE TABLE {qn(RESULT_BACKUP)} AS "
+        f"SELECT * FROM {qn(results)} WHERE id NOT IN ({keep})"
+    )
+    schema_editor.execute(
+        f"CREATE TABLE {qn(ANSWER_BACKUP)} AS SELECT * FROM {qn(answers)} "
+        f"WHERE test_result_id IN (SELECT id FROM {qn(RESULT_BACKUP)})"
+    )
+    count = duplicates.count()
+    duplicates.delete()
+    recount_stats(TestResult, TestStats, test_ids)
+    logger.warning(
+        "Удалено дубликатов результатов: %d, копии — в %s", count, RESULT_BACKUP
+    )
+
+
+def restore_duplicate_results(apps, schema_editor):
+    """Возвращает удалённые дубликаты из резервных таблиц"""
+    if RESULT_BACKUP not in schema_editor.connection.introspection.table_names():
+        return
+    TestResult = apps.get_model("main", "TestResult")
+    TestStats = apps.get_model("main", "TestStats")
+    UserAnswer = apps.get_model("main", "UserAnswer")
+    qn = schema_editor.quote_name
+
+    for model, backup in ((TestResult, RESULT_BACKUP), (UserAnswer, ANSWER_BACKUP)):
+        columns = ", ".join(qn(f.column) for f in model._meta.concrete_fields)
+        schema_editor.execute(
+            f"INSERT INTO {qn(model._meta.db_table)} ({columns}) "
+            f"SELECT {columns} FROM {qn(backup)}"
+        )
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"SELECT DISTINCT test_id FROM {qn(RESULT_BACKUP)}")
+        test_ids = [row[0] for row in cursor.fetchall()]
+    schema_editor.execute(f"DROP TABLE {qn(ANSWER_BACKUP)}")
+    schema_editor.execute(f"DROP TABLE {qn(RESULT_BACKUP)}")
+    recount_stats(TestResult, TestStats, test_ids)
+
+
+class Migration(migrations.Migration):
+    """Отдельно от индексов: в Postgres ALTER TABLE после удаления строк с
+    отложенными проверками внешних ключей в той же транзакции падает"""
+
+    dependencies = [
+        ("main", "0011_question_image_storage"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_results, restore_duplicate_results),
+    ]
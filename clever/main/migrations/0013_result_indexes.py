@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-18 17:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0012_dedupe_test_results"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="question",
+            index=models.Index(
+                condition=models.Q(("image__gt", "")),
+                fields=["image"],
+                name="question_image_idx",
+                opclasses=["varchar_pattern_ops"],
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="test",
+            index=models.Index(
+                fields=["created_by", "-created_at"], name="test_author_created_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="testresult",
+            index=models.Index(
+                fields=["test", "-completed_at"], name="result_test_completed_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="useranswer",
+            index=models.Index(
+                fields=["test_result", "question"], name="answer_result_question_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="testresult",
+            constraint=models.UniqueConstraint(
+                fields=("test", "student"), name="uniq_result_test_student"
+            ),
+        ),
+        # Индексы внешних ключей покрыты составными — удаляем после их создания
+        migrations.AlterField(
+            model_name="test",
+            name="created_by",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="created_tests",
+                to=settings.AUTH_USER_MODEL,
+                verbose_name="Создатель",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="testresult",
+            name="test",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="results",
+                to="main.test",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="useranswer",
+            name="test_result",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="answers",
+                to="main.testresult",
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0013_result_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="test",
+            name="pool_size",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Пусто — все вопросы теста",
+                null=True,
+                verbose_name="Вопросов в выборке",
+            ),
+        ),
+        migrations.AddField(
+            model_name="test",
+            name="shuffle_options",
+            field=models.BooleanField(
+                default=False, verbose_name="Перемешивать варианты"
+            ),
+        ),
+        migrations.AddField(
+            model_name="testresult",
+            name="pool_seed",
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
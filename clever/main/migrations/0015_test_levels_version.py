@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 18:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0014_question_pools"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="test",
+            name="levels_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
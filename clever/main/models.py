@@ -1,7 +1,10 @@
 from django.db import models
+from django.db.models import F, Q
 from django.contrib.auth.models import User, AbstractUser
 from django.conf import settings
 
+from .storage import question_image_storage
+
 
 class CustomUser(AbstractUser):
     # Email будет использоваться для входа
@@ -66,7 +69,8 @@ class Test(models.Model):
         settings.AUTH_USER_MODEL, 
         on_delete=models.CASCADE, 
         related_name='created_tests',
-        verbose_name='Создатель'
+        verbose_name='Создатель',
+        db_index=False,  # покрыт индексом test_author_created_idx
     )
     groups = models.ManyToManyField(
         'Group',
@@ -75,15 +79,43 @@ class Test(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
     is_active = models.BooleanField(default=True, verbose_name='Активен')
+    # Увеличивается при любом изменении вопросов/вариантов — входит в ключи кэшей
+    content_version = models.PositiveIntegerField(default=0, editable=False)
+    # Увеличивается при замене уровней — входит только в ключ кэша уровней
+    levels_version = models.PositiveIntegerField(default=0, editable=False)
+    # Выборка: каждому студенту — pool_size случайных вопросов из теста (см. main/pools.py)
+    pool_size = models.PositiveIntegerField(
+        null=True, blank=True, verbose_name='Вопросов в выборке',
+        help_text='Пусто — все вопросы теста'
+    )
+    shuffle_options = models.BooleanField(default=False, verbose_name='Перемешивать варианты')
 
     class Meta:
         verbose_name = 'Тест'
         verbose_name_plural = 'Тесты'
         ordering = ['-created_at']
+        indexes = [
+            # Панель преподавателя: его тесты, новые сверху
+            models.Index(fields=['created_by', '-created_at'], name='test_author_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} ({self.group})"
 
+    def bump_content_version(self):
+        """Помечает содержимое теста изменённым (старые записи кэшей перестают использоваться)"""
+        Test.bump_content_versions([self.pk])
+        self.content_version += 1
+
+    @classmethod
+    def bump_content_versions(cls, test_ids):
+        cls.objects.filter(pk__in=set(test_ids)).update(content_version=F('content_version') + 1)
+
+    def bump_levels_version(self):
+        """Уровни заменены: ключ ответов и описание теста остаются в кэше"""
+        Test.objects.filter(pk=self.pk).update(levels_version=F('levels_version') + 1)
+        self.levels_version += 1
+
 
 class TestLevel(models.Model):
     test = models.ForeignKey(
@@ -121,7 +153,11 @@ class Question(models.Model):
         verbose_name='Тест'
     )
     text = models.TextField(verbose_name='Текст вопроса')
-    image = models.ImageField(upload_to='question_images/', blank=True, null=True)
+    image = models.ImageField(
+        upload_to='question_images/', storage=question_image_storage, blank=True, null=True
+    )
+    # Размеры и уменьшенные копии картинки (см. main/images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     order = models.IntegerField(default=0)
     question_type = models.CharField(
@@ -134,6 +170,18 @@ class Question(models.Model):
         verbose_name='Правильный текстовый ответ (для открытых вопросов)'
     )
 
+    class Meta:
+        indexes = [
+            # Проверка доступа к /media/ и учёт ссылок на файл; картинки есть у
+            # немногих вопросов, поэтому индекс частичный. pattern_ops — для LIKE 'x%'
+            models.Index(
+                fields=['image'],
+                name='question_image_idx',
+                opclasses=['varchar_pattern_ops'],
+                condition=Q(image__gt=''),
+            ),
+        ]
+
     def __str__(self):
         return f"Q{self.order} ({self.question_type})"
 
@@ -155,20 +203,96 @@ class AnswerOption(models.Model):
         return f"{self.text} {'✓' if self.is_correct else ''}"
     
 
+# Порог «сдано», % правильных ответов
+PASS_PERCENT = 60
+
+
+def is_passed(score, total):
+    return total > 0 and score * 100 >= total * PASS_PERCENT
+
+
 class TestResult(models.Model):
-    test = models.ForeignKey(Test, on_delete=models.CASCADE, related_name='results')
+    # Отдельный индекс по test не нужен: test — первое поле в индексах ниже
+    test = models.ForeignKey(
+        Test, on_delete=models.CASCADE, related_name='results', db_index=False
+    )
     student = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     score = models.IntegerField(default=0)
     total_questions = models.IntegerField(default=0)
     time_spent = models.IntegerField(default=0)  # в секундах
     completed_at = models.DateTimeField(auto_now_add=True)
+    # Зерно выборки вопросов и порядка вариантов; None — тест без выборки
+    pool_seed = models.BigIntegerField(null=True, blank=True, editable=False)
 
     class Meta:
         ordering = ['-completed_at']
+        constraints = [
+            # Один результат на студента: гонку двух отправок ловит БД
+            models.UniqueConstraint(fields=['test', 'student'], name='uniq_result_test_student'),
+        ]
+        indexes = [
+            # Результаты теста по дате: детали теста, выгрузки
+            models.Index(fields=['test', '-completed_at'], name='result_test_completed_idx'),
+        ]
+
+
+class TestStats(models.Model):
+    """Денормализованная статистика теста, обновляется при каждой сдаче"""
+    test = models.OneToOneField(
+        Test, on_delete=models.CASCADE, primary_key=True, related_name='stats'
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Прохождений')
+    score_sum = models.BigIntegerField(default=0)
+    score_sq_sum = models.BigIntegerField(default=0)
+    pass_count = models.PositiveIntegerField(default=0, verbose_name='Сдали')
+    last_completed_at = models.DateTimeField(null=True, blank=True, verbose_name='Последнее прохождение')
+
+    class Meta:
+        verbose_name = 'Статистика теста'
+        verbose_name_plural = 'Статистика тестов'
+
+    def __str__(self):
+        return f"{self.test.title}: {self.attempts}"
+
+    @property
+    def avg_score(self):
+        if not self.attempts:
+            return None
+        return self.score_sum / self.attempts
+
+    @property
+    def score_stddev(self):
+        if not self.attempts:
+            return None
+        mean = self.score_sum / self.attempts
+        return max(self.score_sq_sum / self.attempts - mean * mean, 0) ** 0.5
+
+    @property
+    def pass_rate(self):
+        if not self.attempts:
+            return None
+        return round(self.pass_count / self.attempts * 100, 1)
+
+    @classmethod
+    def record(cls, result):
+        """Атомарно учитывает новый результат (вызывать внутри транзакции записи)"""
+        changes = {
+            'attempts': F('attempts') + 1,
+            'score_sum': F('score_sum') + result.score,
+            'score_sq_sum': F('score_sq_sum') + result.score * result.score,
+            'pass_count': F('pass_count') + int(is_passed(result.score, result.total_questions)),
+            'last_completed_at': result.completed_at,
+        }
+        if not cls.objects.filter(test_id=result.test_id).update(**changes):
+            # Тест создан в обход create_test (например, в админке) — строки ещё нет
+            cls.objects.get_or_create(test_id=result.test_id)
+            cls.objects.filter(test_id=result.test_id).update(**changes)
 
 
 class UserAnswer(models.Model):
-    test_result = models.ForeignKey(TestResult, on_delete=models.CASCADE, related_name='answers')
+    test_result = models.ForeignKey(
+        TestResult, on_delete=models.CASCADE, related_name='answers', db_index=False
+    )
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     selected_answer = models.ForeignKey(
         AnswerOption,
@@ -178,6 +302,12 @@ class UserAnswer(models.Model):
     )
     text_answer = models.TextField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # Ответы результата (выгрузки, разбор); заменяет индекс внешнего ключа
+            models.Index(fields=['test_result', 'question'], name='answer_result_question_idx'),
+        ]
+
 
 class StudentTestAttempt(models.Model):
     """Модель попытки прохождения теста студентом"""
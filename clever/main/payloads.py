@@ -0,0 +1,97 @@
+"""Готовые JSON-ответы для start_test.
+
+Содержимое теста одинаково для всех студентов, поэтому ответ сериализуется
+один раз на версию теста (``Test.content_version``) и хранится в кэше уже
+закодированным в байты. Попадание в кэш не требует работы с ORM.
+
+Для тестов с выборкой вопросов или перемешиванием вариантов (см. pools)
+ответ у каждого студента свой: кэшируется описание теста, а выборка и
+кодирование делаются на запрос, в памяти.
+"""
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from .caching import TwoTierCache
+from .images import image_payload
+from .models import AnswerOption, Question
+from .pools import attempt_seed, is_personal, personalize
+from .responses import dumps
+
+start_payload_cache = TwoTierCache(
+    "start-payload",
+    maxsize=getattr(settings, "START_PAYLOAD_LRU_SIZE", 128),
+)
+start_data_cache = TwoTierCache(
+    "start-data",
+    maxsize=getattr(settings, "START_PAYLOAD_LRU_SIZE", 128),
+)
+
+
+def start_payload_data(test):
+    """Описание теста для студента (2 запроса)"""
+    questions = (
+        Question.objects.filter(test=test)
+        .order_by("order", "id")
+        .prefetch_related(
+            Prefetch("answers", queryset=AnswerOption.objects.order_by("order", "id"))
+        )
+    )
+
+    return {
+        "id": test.id,
+        "title": test.title,
+        "description": test.description,
+        "questions": [
+            {
+                "id": q.id,
+                "text": q.text,
+                **image_payload(q),
+                "question_type": q.question_type,
+                "answers": [{"id": a.id, "text": a.text} for a in q.answers.all()],
+            }
+            for q in questions
+        ],
+    }
+
+
+def build_start_payload(test):
+    """Сериализует тест для студента (2 запроса)"""
+    return dumps(start_payload_data(test))
+
+
+def get_start_payload(test):
+    """Байты JSON-ответа для актуальной версии теста"""
+    return start_payload_cache.get(
+        (test.id, test.content_version), lambda: build_start_payload(test)
+    )
+
+
+async def aget_start_payload(test):
+    return await start_payload_cache.aget(
+        (test.id, test.content_version), lambda: build_start_payload(test)
+    )
+
+
+def get_student_payload(test, student_id):
+    """Байты ответа start_test для конкретного студента"""
+    if not is_personal(test):
+        return get_start_payload(test)
+    data = start_data_cache.get(
+        (test.id, test.content_version), lambda: start_payload_data(test)
+    )
+    return dumps(personalize(data, test, attempt_seed(test.id, student_id)))
+
+
+async def aget_student_payload(test, student_id):
+    if not is_personal(test):
+        return await aget_start_payload(test)
+    data = await start_data_cache.aget(
+        (test.id, test.content_version), lambda: start_payload_data(test)
+    )
+    return dumps(personalize(data, test, attempt_seed(test.id, student_id)))
+
+
+def invalidate_start_payload(test):
+    start_payload_cache.discard((test.id, test.content_version))
+    start_data_cache.discard((test.id, test.content_version))
@@ -0,0 +1,59 @@
+"""Выборка вопросов и порядок вариантов для отдельного студента.
+
+Тест с ``pool_size`` — банк вопросов: каждый студент получает свои
+``pool_size`` вопросов, а с ``shuffle_options`` — ещё и свой порядок
+вариантов. Всё определяется одним зерном попытки, которое выводится из
+SECRET_KEY, id теста и id студента: повторный start_test выдаёт тот же
+набор, а submit_test проверяет ровно его, и при старте ничего не пишется
+в БД. Зерно сохраняется в ``TestResult.pool_seed``.
+
+Выборка делается в памяти по списку вопросов из кэша (описание теста или
+ключ ответов, оба в порядке ``order``), без ``ORDER BY RANDOM()``.
+"""
+
+import hashlib
+import hmac
+import random
+
+from django.conf import settings
+
+
+def is_personal(test):
+    """Разный ли у студентов набор или порядок вариантов"""
+    return bool(test.pool_size) or test.shuffle_options
+
+
+def attempt_seed(test_id, student_id):
+    """Зерно попытки: 63 бита, чтобы поместиться в BigIntegerField"""
+    digest = hmac.new(
+        settings.SECRET_KEY.encode(),
+        f"pool:{test_id}:{student_id}".encode(),
+        hashlib.sha256,
+    ).digest()
+    return int.from_bytes(digest[:8], "big") >> 1
+
+
+def draw_questions(questions, pool_size, seed):
+    """pool_size вопросов из списка, в исходном порядке теста"""
+    if not pool_size or pool_size >= len(questions):
+        return list(questions)
+    picked = random.Random(seed).sample(range(len(questions)), pool_size)
+    return [questions[i] for i in sorted(picked)]
+
+
+def shuffle_options(options, seed, question_id):
+    # Свой генератор на вопрос: порядок не зависит от того, какие вопросы выпали
+    options = list(options)
+    random.Random(f"{seed}:{question_id}").shuffle(options)
+    return options
+
+
+def personalize(data, test, seed):
+    """Описание теста для start_test (см. payloads) с выборкой и перемешиванием"""
+    questions = draw_questions(data["questions"], test.pool_size, seed)
+    if test.shuffle_options:
+        questions = [
+            {**q, "answers": shuffle_options(q["answers"], seed, q["id"])}
+            for q in questions
+        ]
+    return {**data, "questions": questions}
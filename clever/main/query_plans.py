@@ -0,0 +1,110 @@
+"""Проверка планов горячих запросов: каждый должен идти по индексу.
+
+Запросы берутся в том виде, в каком их строят вьюхи, с id из данных в
+базе. В Postgres перед EXPLAIN выключается enable_seqscan: на маленькой
+таблице полный проход дешевле и выбирается честно, а без подходящего
+индекса планировщику всё равно придётся сканировать таблицу — это и ловим.
+SQLite выбирает индекс, если он есть, и без статистики.
+"""
+
+import re
+from collections import namedtuple
+
+from django.db import connection, transaction
+from django.db.models import F
+
+from .models import Question, Test, TestResult, UserAnswer
+
+
+# build(sample) -> QuerySet; vendors — СУБД, где запрос проверяется
+HotQuery = namedtuple(
+    "HotQuery", "name table build vendors", defaults=[("postgresql", "sqlite")]
+)
+
+
+HOT_QUERIES = [
+    # start_test, submit_test: пройден ли тест
+    HotQuery(
+        "result_for_student",
+        TestResult._meta.db_table,
+        lambda s: TestResult.objects.filter(
+            test_id=s["test_id"], student_id=s["student_id"]
+        ).values("id")[:1],
+    ),
+    # student_home: результаты студента по тестам группы
+    HotQuery(
+        "student_results",
+        TestResult._meta.db_table,
+        lambda s: TestResult.objects.filter(
+            student_id=s["student_id"], test__in=[s["test_id"]]
+        ).order_by("-completed_at"),
+    ),
+    # test_detail_results, выгрузки
+    HotQuery(
+        "test_results_by_date",
+        TestResult._meta.db_table,
+        lambda s: TestResult.objects.filter(test_id=s["test_id"]).order_by(
+            "-completed_at"
+        ),
+    ),
+    # teacher_home
+    HotQuery(
+        "teacher_tests",
+        Test._meta.db_table,
+        lambda s: Test.objects.filter(created_by_id=s["teacher_id"]).order_by(
+            "-created_at"
+        ),
+    ),
+    # выгрузки: ответы пачки результатов
+    HotQuery(
+        "result_answers",
+        UserAnswer._meta.db_table,
+        lambda s: UserAnswer.objects.filter(test_result__in=[s["id"]]),
+    ),
+    # /media/: чьему вопросу принадлежит файл. В SQLite LIKE по умолчанию
+    # регистронезависим и индекс не использует — проверяем только в Postgres
+    HotQuery(
+        "question_by_image",
+        Question._meta.db_table,
+        lambda s: Question.objects.filter(image__startswith="question_images/ab/"),
+        vendors=("postgresql",),
+    ),
+]
+
+_FULL_SCAN = {
+    "postgresql": r"Seq Scan on {table}\b",
+    "sqlite": r"\bSCAN {table}\b",
+}
+
+
+def sample_ids():
+    """id из существующего результата или None, если результатов нет"""
+    return (
+        TestResult.objects.order_by("id")
+        .values("id", "test_id", "student_id", teacher_id=F("test__created_by_id"))
+        .first()
+    )
+
+
+def find_full_scans(sample=None):
+    """Горячие запросы с полным проходом по таблице: [(имя, план)]"""
+    vendor = connection.vendor
+    if vendor not in _FULL_SCAN:
+        raise ValueError(f"Проверка планов не поддерживает {vendor}")
+    sample = sample or sample_ids()
+    if sample is None:
+        raise ValueError("В базе нет результатов — нечего подставить в запросы")
+
+    failures = []
+    with transaction.atomic():
+        if vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+        for query in HOT_QUERIES:
+            if vendor not in query.vendors:
+                continue
+            plan = query.build(sample).explain()
+            pattern = _FULL_SCAN[vendor].format(table=re.escape(query.table))
+            if re.search(pattern, plan):
+                failures.append((query.name, plan))
+    return failures
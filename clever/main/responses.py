@@ -0,0 +1,38 @@
+"""JSON-ответы API экзамена.
+
+Кодирование через orjson, если он установлен, иначе через stdlib json с
+DjangoJSONEncoder. Типы, которых orjson не знает (Decimal, ленивые строки
+перевода), передаются тому же DjangoJSONEncoder. Сжатие ответов —
+main.middleware.CompressionMiddleware.
+"""
+
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+try:
+    import orjson
+except ImportError:  # без orjson — stdlib, ответы те же
+    orjson = None
+
+_django_default = DjangoJSONEncoder().default
+
+
+def dumps(data):
+    """data → байты UTF-8 (не-ASCII без \\u-экранирования)"""
+    if orjson is not None:
+        return orjson.dumps(
+            data, default=_django_default, option=orjson.OPT_NON_STR_KEYS
+        )
+    return json.dumps(
+        data, cls=DjangoJSONEncoder, ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJsonResponse(HttpResponse):
+    """Как JsonResponse, но с dumps из этого модуля; data — любой JSON-объект"""
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault("content_type", "application/json")
+        super().__init__(dumps(data), **kwargs)
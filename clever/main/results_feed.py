@@ -0,0 +1,173 @@
+"""Лента результатов для вкладки «Результаты» преподавателя.
+
+Фильтрация (тест, группа, даты, сдано/не сдано) выполняется в SQL,
+постраничная выдача — по ключу (completed_at, id) без OFFSET, а строки
+читаются через .values() без создания моделей. Страница ограничена
+MAX_PAGE_SIZE + 1 строками и читается одним списком: потоковое чтение
+(.iterator(), в Postgres — серверный курсор) для неё дороже, чем выгода.
+"""
+
+import base64
+import json
+from datetime import datetime, time, timedelta
+
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import PASS_PERCENT, TestResult, is_passed
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+FEED_FIELDS = (
+    "id",
+    "test_id",
+    "test__title",
+    "student__username",
+    "student__profile__group__name",
+    "score",
+    "total_questions",
+    "time_spent",
+    "completed_at",
+)
+
+
+class FeedParamsError(ValueError):
+    pass
+
+
+def encode_cursor(completed_at, result_id):
+    raw = json.dumps([completed_at.isoformat(), result_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        completed_at, result_id = json.loads(base64.urlsafe_b64decode(padded))
+        completed_at = parse_datetime(completed_at)
+        if completed_at is None:
+            raise ValueError
+        return completed_at, int(result_id)
+    except (ValueError, TypeError):
+        raise FeedParamsError("Некорректный курсор")
+
+
+def _parse_int(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise FeedParamsError(f"Некорректный параметр {name}")
+
+
+def _parse_day(params, name):
+    raw = params.get(name)
+    if not raw:
+        return None
+    day = parse_date(raw)
+    if day is None:
+        raise FeedParamsError(f"Некорректная дата {name}")
+    return day
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def passed_q():
+    """Условие «сдано» на стороне БД: score / total >= PASS_PERCENT %"""
+    return Q(total_questions__gt=0, score_x100__gte=F("total_questions") * PASS_PERCENT)
+
+
+def filter_results(teacher, params):
+    """Результаты по тестам преподавателя с фильтрами из GET-параметров"""
+    qs = TestResult.objects.filter(test__created_by=teacher)
+
+    test_id = _parse_int(params, "test")
+    if test_id is not None:
+        qs = qs.filter(test_id=test_id)
+
+    group_id = _parse_int(params, "group")
+    if group_id is not None:
+        qs = qs.filter(student__profile__group_id=group_id)
+
+    date_from = _parse_day(params, "date_from")
+    if date_from is not None:
+        qs = qs.filter(completed_at__gte=_day_start(date_from))
+
+    date_to = _parse_day(params, "date_to")
+    if date_to is not None:
+        qs = qs.filter(completed_at__lt=_day_start(date_to + timedelta(days=1)))
+
+    status = params.get("status") or "all"
+    if status not in ("all", "passed", "failed"):
+        raise FeedParamsError("Некорректный параметр status")
+    if status != "all":
+        qs = qs.alias(score_x100=F("score") * 100)
+        qs = qs.filter(passed_q()) if status == "passed" else qs.exclude(passed_q())
+
+    return qs
+
+
+def format_row(row):
+    total = row["total_questions"]
+    percentage = round(row["score"] / total * 100, 1) if total else 0
+    completed_at = timezone.localtime(row["completed_at"])
+    return {
+        "id": row["id"],
+        "test_title": row["test__title"],
+        "test_id": row["test_id"],
+        "student_name": row["student__username"],
+        "student_group": row["student__profile__group__name"] or "Без группы",
+        "score": row["score"],
+        "total": total,
+        "percentage": percentage,
+        "time_spent": row["time_spent"],
+        "time_formatted": f"{row['time_spent'] // 60:02d}:{row['time_spent'] % 60:02d}",
+        "completed_at": completed_at.strftime("%d.%m.%Y %H:%M"),
+        "passed": is_passed(row["score"], total),
+    }
+
+
+def page_queryset(teacher, params):
+    """Запрос страницы ленты (limit + 1 строк — признак следующей) и limit"""
+    qs = filter_results(teacher, params)
+
+    cursor = params.get("cursor")
+    if cursor:
+        completed_at, result_id = decode_cursor(cursor)
+        qs = qs.filter(
+            Q(completed_at__lt=completed_at)
+            | Q(completed_at=completed_at, id__lt=result_id)
+        )
+
+    limit = _parse_int(params, "limit") or DEFAULT_PAGE_SIZE
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    page = qs.order_by("-completed_at", "-id").values(*FEED_FIELDS)[: limit + 1]
+    return page, limit
+
+
+def paginate(raw_rows, limit):
+    rows = [format_row(row) for row in raw_rows[:limit]]
+    next_cursor = None
+    if len(raw_rows) > limit:
+        last = raw_rows[limit - 1]
+        next_cursor = encode_cursor(last["completed_at"], last["id"])
+    return rows, next_cursor
+
+
+def fetch_page(teacher, params):
+    """Страница ленты: (строки, курсор следующей страницы или None)"""
+    page, limit = page_queryset(teacher, params)
+    return paginate(list(page), limit)
+
+
+async def afetch_page(teacher, params):
+    """fetch_page для async-представлений (async ORM)"""
+    page, limit = page_queryset(teacher, params)
+    return paginate([row async for row in page], limit)
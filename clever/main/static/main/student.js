@@ -353,6 +353,37 @@ function renderQuestionNavigation() {
     });
 }
 
+
+// Картинка вопроса: WebP и запасной формат через srcset, браузер выбирает ширину сам
+function renderQuestionImage(question, index) {
+    const sizes = '(max-width: 768px) 100vw, 768px';
+    const srcset = question.image_srcset || {};
+    const sources = Object.entries(srcset)
+        .filter(([type]) => type === 'image/webp')
+        .map(([type, set]) => `<source type="${type}" srcset="${set}" sizes="${sizes}">`)
+        .join('');
+    const fallbackSet = Object.entries(srcset).find(([type]) => type !== 'image/webp');
+    const dimensions = question.image_width
+        ? `width="${question.image_width}" height="${question.image_height}"`
+        : '';
+
+    return `
+        <picture>
+            ${sources}
+            <img
+                src="${question.image}"
+                ${fallbackSet ? `srcset="${fallbackSet[1]}" sizes="${sizes}"` : ''}
+                ${dimensions}
+                alt="Изображение к вопросу ${index + 1}"
+                loading="lazy"
+                decoding="async"
+                class="max-w-full h-auto rounded-xl shadow-lg mx-auto"
+                style="max-height: 500px; object-fit: contain;"
+            />
+        </picture>
+    `;
+}
+
 function showQuestion(index) {
     if (!state.currentTest || index < 0 || index >= state.currentTest.questions.length) {
         return;
@@ -379,12 +410,7 @@ function showQuestion(index) {
     if (question.image) {
         html += `
             <figure class="my-6">
-                <img 
-                    src="${question.image}" 
-                    alt="Изображение к вопросу ${index + 1}" 
-                    class="max-w-full h-auto rounded-xl shadow-lg mx-auto"
-                    style="max-height: 500px; object-fit: contain;"
-                />
+                ${renderQuestionImage(question, index)}
             </figure>
         `;
     }
@@ -8,7 +8,17 @@ function updateEmptyState() {
 
 
 // --- универсальное переключение табов ---
+const TAB_CONTENT = {
+    createTestTab: 'createTestContent',
+    createGroupTab: 'createGroupContent',
+    myTestsTab: 'myTestsContent',
+    testLevelsTab: 'testLevelsContent',
+    resultsTab: 'resultsContent',
+};
+let currentTab = 'createTestTab';
+
 function activateTab(tabId) {
+    currentTab = tabId;
     // 1) сбрасываем состояние всем кнопкам
     document.querySelectorAll('.tab-button').forEach(btn => {
         btn.classList.remove('bg-brand-green', 'text-white');
@@ -27,6 +37,7 @@ function activateTab(tabId) {
     document.getElementById('myTestsContent')?.classList.add('hidden');
     document.getElementById('testDetailContent')?.classList.add('hidden');
     document.getElementById('testLevelsContent')?.classList.add('hidden');
+    document.getElementById('resultsContent')?.classList.add('hidden');
 
     // 4) показываем нужный
     if (tabId === 'createTestTab') {
@@ -37,6 +48,17 @@ function activateTab(tabId) {
         document.getElementById('myTestsContent')?.classList.remove('hidden');
     } else if (tabId === 'testLevelsTab') {
         document.getElementById('testLevelsContent')?.classList.remove('hidden');
+    } else if (tabId === 'resultsTab') {
+        document.getElementById('resultsContent')?.classList.remove('hidden');
+        if (!resultsFeed.loaded && document.getElementById('resultsFilters')) {
+            loadResultsFeed(true);
+        }
+    }
+
+    // 5) вкладка ещё не загружена — заглушка запрашивает её у сервера (htmx)
+    const content = document.getElementById(TAB_CONTENT[tabId]);
+    if (content?.hasAttribute('hx-get')) {
+        htmx.trigger(content, 'tab-open');
     }
 }
 
@@ -45,6 +67,21 @@ document.getElementById('createTestTab').onclick = () => activateTab('createTest
 document.getElementById('createGroupTab').onclick = () => activateTab('createGroupTab');
 document.getElementById('myTestsTab').onclick = () => activateTab('myTestsTab');
 document.getElementById('testLevelsTab').onclick = () => activateTab('testLevelsTab');
+document.getElementById('resultsTab').onclick = () => activateTab('resultsTab');
+
+// Загруженная вкладка заменила заглушку: вешаем обработчики на её элементы
+// и заново применяем текущий таб (разметка вкладки приходит скрытой)
+document.body.addEventListener('htmx:load', (event) => {
+    const id = event.detail.elt.id;
+    if (id === 'createTestContent') {
+        initCreateTest();
+    } else if (id === 'resultsContent') {
+        initResultsFeed();
+    }
+    if (Object.values(TAB_CONTENT).includes(id)) {
+        activateTab(currentTab);
+    }
+});
 
 
 // Функция для пересчета номеров вопросов
@@ -60,7 +97,7 @@ function renumberQuestions() {
 }
 
 // Добавление нового вопроса
-document.getElementById('addQuestionBtn').addEventListener('click', function () {
+function addQuestion() {
 
     questionCounter++;
     const questionHTML = `
@@ -241,7 +278,7 @@ document.getElementById('addQuestionBtn').addEventListener('click', function ()
     typeSelect.dispatchEvent(new Event('change'));
     renumberQuestions();
     updateEmptyState();
-});
+}
 
 
 // Генерация полей для вариантов ответов
@@ -393,62 +430,86 @@ function removeQuestion(questionNum) {
     }
 }
 
-// Добавляем первый вопрос автоматически
-document.getElementById('addQuestionBtn').click();
+function initCreateTest() {
+    questionCounter = 0;
+    deletedQuestions = new Set();
+    document.getElementById('addQuestionBtn').addEventListener('click', addQuestion);
+    // Добавляем первый вопрос автоматически
+    addQuestion();
+}
 
-// Функционал поиска и фильтрации
-document.addEventListener('DOMContentLoaded', function () {
-    const searchInput = document.getElementById('searchInput');
-    const filterStatus = document.getElementById('filterStatus');
-    const resultsTable = document.getElementById('resultsTableBody');
-    const noResultsMessage = document.getElementById('noResultsMessage');
-
-    if (searchInput && filterStatus) {
-        function filterResults() {
-            const searchTerm = searchInput.value.toLowerCase();
-            const statusFilter = filterStatus.value;
-            const rows = document.querySelectorAll('.result-row');
-            let visibleCount = 0;
-
-            rows.forEach(row => {
-                const testName = row.dataset.testName;
-                const studentName = row.dataset.studentName;
-                const status = row.dataset.status;
-
-                // Проверка поиска
-                const matchesSearch = testName.includes(searchTerm) || studentName.includes(searchTerm);
-
-                // Проверка фильтра статуса
-                const matchesStatus = statusFilter === 'all' || status === statusFilter;
-
-                // Показываем/скрываем строку
-                if (matchesSearch && matchesStatus) {
-                    row.classList.remove('hidden');
-                    visibleCount++;
-                } else {
-                    row.classList.add('hidden');
-                }
-            });
+// Лента результатов: фильтры и постраничная загрузка выполняются на сервере
+const resultsFeed = { loaded: false, nextCursor: null, shown: 0 };
 
-            // Показываем сообщение если ничего не найдено
-            if (visibleCount === 0 && resultsTable) {
-                resultsTable.parentElement.classList.add('hidden');
-                if (noResultsMessage) {
-                    noResultsMessage.classList.remove('hidden');
-                }
-            } else {
-                resultsTable.parentElement.classList.remove('hidden');
-                if (noResultsMessage) {
-                    noResultsMessage.classList.add('hidden');
-                }
-            }
+async function loadResultsFeed(reset) {
+    const container = document.getElementById('resultsContent');
+    const form = document.getElementById('resultsFilters');
+    const tbody = document.getElementById('resultsTableBody');
+    const table = document.getElementById('resultsTable');
+    const noResults = document.getElementById('noResultsMessage');
+    const loadMore = document.getElementById('resultsLoadMore');
+
+    const params = new URLSearchParams(new FormData(form));
+    if (!reset && resultsFeed.nextCursor) {
+        params.set('cursor', resultsFeed.nextCursor);
+    }
+
+    try {
+        const response = await fetch(`${container.dataset.feedUrl}?${params}`);
+        if (!response.ok) {
+            throw new Error('Не удалось загрузить результаты');
+        }
+        const data = await response.json();
+
+        if (reset) {
+            tbody.innerHTML = '';
+            resultsFeed.shown = 0;
         }
+        tbody.insertAdjacentHTML('beforeend', data.results.map(renderFeedRow).join(''));
+
+        resultsFeed.loaded = true;
+        resultsFeed.nextCursor = data.next_cursor;
+        resultsFeed.shown += data.results.length;
 
-        // Обработчики событий
-        searchInput.addEventListener('input', filterResults);
-        filterStatus.addEventListener('change', filterResults);
+        document.getElementById('resultsShownCount').textContent = resultsFeed.shown;
+        table.classList.toggle('hidden', resultsFeed.shown === 0);
+        noResults.classList.toggle('hidden', resultsFeed.shown !== 0);
+        loadMore.classList.toggle('hidden', !data.next_cursor);
+    } catch (error) {
+        console.error('Error loading results feed:', error);
+        alert('Не удалось загрузить результаты');
     }
-});
+}
+
+function renderFeedRow(result) {
+    return `
+        <tr class="border-b border-gray-200 hover:bg-brand-green-container transition-colors result-row">
+            <td class="p-4"><div class="font-medium text-gray-900">${escapeHtml(result.test_title)}</div></td>
+            <td class="p-4"><div class="font-medium text-gray-900">${escapeHtml(result.student_name)}</div></td>
+            <td class="p-4">
+                <span class="badge bg-brand-green-light text-white rounded-xl p-2">${escapeHtml(result.student_group)}</span>
+            </td>
+            <td class="text-center p-4">
+                <span class="font-bold text-brand-green-dark">${result.score}/${result.total}</span>
+            </td>
+            <td class="text-center p-4">
+                <span class="badge ${result.passed ? 'bg-green-500' : 'bg-red-500'} text-white text-lg p-3 rounded-xl">${result.percentage}%</span>
+            </td>
+            <td class="text-center p-4 text-gray-600">${result.time_formatted}</td>
+            <td class="text-center p-4 text-gray-600 text-sm">${result.completed_at}</td>
+        </tr>
+    `;
+}
+
+function initResultsFeed() {
+    const form = document.getElementById('resultsFilters');
+    form.addEventListener('change', () => loadResultsFeed(true));
+    form.addEventListener('submit', (event) => {
+        event.preventDefault();
+        loadResultsFeed(true);
+    });
+    document.getElementById('resultsLoadMore').addEventListener('click', () => loadResultsFeed(false));
+}
 
 let currentTestResults = [];
 
@@ -0,0 +1,63 @@
+"""Пересчёт денормализованной статистики TestStats по таблице результатов."""
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+
+from .models import PASS_PERCENT, Test, TestResult, TestStats
+
+
+def aggregate_results(test_ids=None):
+    """Агрегаты по результатам одним запросом: {test_id: поля TestStats}"""
+    results = TestResult.objects.all()
+    if test_ids is not None:
+        results = results.filter(test_id__in=test_ids)
+
+    rows = (
+        results.alias(score_x100=F("score") * 100)
+        .values("test_id")
+        .annotate(
+            attempts=Count("id"),
+            score_sum=Sum("score"),
+            score_sq_sum=Sum(F("score") * F("score")),
+            pass_count=Count(
+                "id",
+                filter=Q(
+                    total_questions__gt=0,
+                    score_x100__gte=F("total_questions") * PASS_PERCENT,
+                ),
+            ),
+            last_completed_at=Max("completed_at"),
+        )
+        .order_by()
+    )
+    return {row.pop("test_id"): row for row in rows}
+
+
+def rebuild_test_stats(test_ids=None):
+    """Пересчитывает TestStats для указанных тестов (или всех). Возвращает число строк"""
+    tests = Test.objects.all()
+    if test_ids is not None:
+        tests = tests.filter(id__in=test_ids)
+    ids = list(tests.values_list("id", flat=True))
+
+    aggregates = aggregate_results(ids)
+    empty = {
+        "attempts": 0,
+        "score_sum": 0,
+        "score_sq_sum": 0,
+        "pass_count": 0,
+        "last_completed_at": None,
+    }
+    stats = [
+        TestStats(test_id=test_id, **aggregates.get(test_id, empty)) for test_id in ids
+    ]
+
+    with transaction.atomic():
+        TestStats.objects.bulk_create(
+            stats,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=["test"],
+            update_fields=list(empty),
+        )
+    return len(stats)
@@ -0,0 +1,106 @@
+"""Хранилища с адресацией по содержимому: картинки вопросов и статика.
+
+Имя файла картинки — sha256 исходных байтов загрузки, поэтому одна и та же
+картинка, загруженная в разные тесты, хранится один раз, а файл по
+хешированному пути никогда не меняется (nginx отдаёт его с immutable).
+Статика получает хеш в имени от ManifestStaticFilesStorage и рядом —
+сжатые копии для gzip_static/brotli_static.
+"""
+
+import gzip
+import hashlib
+import os
+import posixpath
+import uuid
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+from django.utils.functional import SimpleLazyObject
+
+try:
+    import brotli
+except ImportError:  # без пакета Brotli сжимаем только gzip
+    brotli = None
+
+UPLOAD_DIR = "question_images"
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Существующий файл с тем же именем не перезаписывается и не дублируется"""
+
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        # Пишем во временный файл и атомарно публикуем: читатели не увидят недописанный
+        tmp = super()._save(f"{name}.{uuid.uuid4().hex}.tmp", content)
+        os.replace(self.path(tmp), self.path(name))
+        return name
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def hashed_name(digest, suffix):
+    """question_images/ab/abcdef…<suffix> — два уровня, чтобы каталоги не разрастались"""
+    return posixpath.join(UPLOAD_DIR, digest[:2], f"{digest}{suffix}")
+
+
+_storage = SimpleLazyObject(ContentAddressedStorage)
+
+
+def question_image_storage():
+    return _storage
+
+
+class PrecompressedManifestStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в имени и готовыми .gz/.br рядом с каждым текстовым файлом.
+
+    Пока collectstatic не запускался (тесты, разработка), манифеста нет —
+    {% static %} отдаёт исходные имена вместо ошибки. immutable nginx
+    ставит только на имена с хешем, так что это безопасно.
+    """
+
+    compressible = (".css", ".js", ".mjs", ".svg", ".json", ".map", ".txt")
+    min_size = 256
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        hashed = []
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if isinstance(hashed_name, str):
+                hashed.append(hashed_name)
+            yield name, hashed_name, processed
+        if not dry_run:
+            for name in hashed:
+                self.compress(name)
+
+    def compress(self, name):
+        if not name.endswith(self.compressible):
+            return
+        path = self.path(name)
+        with open(path, "rb") as f:
+            data = f.read()
+        if len(data) < self.min_size:
+            return
+        # mtime=0 — одинаковый файл при каждой сборке
+        variants = [(".gz", lambda: gzip.compress(data, 9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", lambda: brotli.compress(data, quality=11)))
+        for suffix, compress in variants:
+            # Имя с хешем не меняет содержимое — сжатая копия уже верна
+            if os.path.exists(path + suffix):
+                continue
+            packed = compress()
+            if len(packed) < len(data):
+                with open(path + suffix, "wb") as f:
+                    f.write(packed)
@@ -1,3 +1,2089 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
 
-# Create your tests here.
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.core.servers.basehttp import WSGIServer
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.http import HttpResponse
+from django.test import (
+    AsyncRequestFactory,
+    Client,
+    LiveServerTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.testcases import LiveServerThread, QuietWSGIRequestHandler
+from django.test.utils import CaptureQueriesContext
+from django.db.migrations.executor import MigrationExecutor
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import async_views, checks, urls
+from .management.commands import build_assets
+from .views import TEACHER_TABS
+from .answer_keys import answer_key_cache, get_answer_key
+from .bench import run_load
+from .auth import Principal, ProfileBackend, aget_principal
+from .builder import (
+    QuestionDef,
+    TestDefinition,
+    TestDefinitionError,
+    save_test_definition,
+)
+from .fragments import bump_stamps
+from .grading import grade_submission
+from .images import (
+    image_files,
+    image_key,
+    release_question_images,
+    store_question_image,
+)
+from .importers import parse_import
+from .levels import (
+    Level,
+    LevelBandError,
+    LevelBands,
+    get_level_bands,
+    level_bands_cache,
+)
+from .loadtest import reset_rush_results, run_exam_rush, rush_accounts, seed_exam_rush
+from . import responses
+from .responses import FastJsonResponse
+from .middleware import (
+    CompressionMiddleware,
+    QueryCountMiddleware,
+    RequestTimingMiddleware,
+    _QueryRecorder,
+    _accepted_encodings,
+    brotli,
+)
+from .payloads import build_start_payload, start_payload_cache
+from .pools import attempt_seed, draw_questions
+from .query_plans import HotQuery, find_full_scans
+from .storage import PrecompressedManifestStorage
+from .xlsx import DEFAULT_SHEET_NAME, stream_xlsx
+from .models import (
+    AnswerOption,
+    Group,
+    Question,
+    Test,
+    TestLevel,
+    TestResult,
+    TestStats,
+    UserAnswer,
+    UserProfile,
+)
+
+User = get_user_model()
+
+
+def make_user(email, role, group=None):
+    user = User.objects.create_user(email=email, username=email, password="pass12345")
+    UserProfile.objects.create(user=user, role=role, group=group)
+    return user
+
+
+def make_test(teacher, group, choice_count=3, open_count=1, title="Тест"):
+    """Создаёт тест: choice-вопросы (правильный — первый вариант) и открытые"""
+    test = Test.objects.create(title=title, created_by=teacher)
+    test.groups.add(group)
+    order = 0
+    for _ in range(choice_count):
+        order += 1
+        q = Question.objects.create(
+            test=test, text=f"Вопрос {order}", order=order, question_type="choice"
+        )
+        for i in range(1, 4):
+            AnswerOption.objects.create(
+                question=q, text=f"Вариант {i}", order=i, is_correct=(i == 1)
+            )
+    for _ in range(open_count):
+        order += 1
+        Question.objects.create(
+            test=test,
+            text=f"Вопрос {order}",
+            order=order,
+            question_type="open",
+            correct_text_answer="  Фотосинтез ",
+        )
+    return test
+
+
+def correct_answers(test):
+    answers = {}
+    for q in test.questions.all():
+        if q.question_type == "open":
+            answers[str(q.id)] = "фотосинтез"
+        else:
+            answers[str(q.id)] = q.answers.get(is_correct=True).id
+    return answers
+
+
+def make_result(test, student, score, total, completed_at=None):
+    result = TestResult.objects.create(
+        test=test, student=student, score=score, total_questions=total
+    )
+    if completed_at is not None:
+        TestResult.objects.filter(pk=result.pk).update(completed_at=completed_at)
+    return result
+
+
+class FixtureMixin:
+    def setUp(self):
+        # id тестов переиспользуются между тестами — кэши не должны пережить откат
+        cache.clear()
+        answer_key_cache.clear_local()
+        start_payload_cache.clear_local()
+        level_bands_cache.clear_local()
+        self.teacher = make_user("teacher@example.com", "teacher")
+        self.group = Group.objects.create(name="ИС-21", created_by=self.teacher)
+        self.student = make_user("student@example.com", "student", self.group)
+
+
+class GradingTests(FixtureMixin, TestCase):
+    def test_grades_choice_and_open_questions(self):
+        test = make_test(self.teacher, self.group, choice_count=2, open_count=1)
+        answers = correct_answers(test)
+        wrong_q = test.questions.filter(question_type="choice").first()
+        answers[str(wrong_q.id)] = wrong_q.answers.get(order=2).id
+
+        result, details = grade_submission(test, self.student, answers, time_spent=42)
+
+        self.assertEqual((result.score, result.total_questions), (2, 3))
+        self.assertEqual(result.time_spent, 42)
+        self.assertEqual(UserAnswer.objects.filter(test_result=result).count(), 3)
+        self.assertEqual([d["is_correct"] for d in details], [False, True, True])
+        self.assertEqual(details[0]["user_answer"], "Вариант 2")
+        self.assertEqual(details[0]["correct_answer"], "Вариант 1")
+
+    def test_foreign_option_is_treated_as_no_answer(self):
+        test = make_test(self.teacher, self.group, choice_count=2, open_count=0)
+        first, second = test.questions.order_by("order")
+        foreign_option = second.answers.get(is_correct=True)
+
+        result, details = grade_submission(
+            test, self.student, {str(first.id): foreign_option.id, str(second.id): "x"}
+        )
+
+        self.assertEqual(result.score, 0)
+        self.assertEqual(details[0]["user_answer"], "Нет ответа")
+        self.assertFalse(
+            UserAnswer.objects.filter(selected_answer__isnull=False).exists()
+        )
+
+    def test_query_count_does_not_depend_on_question_count(self):
+        small = make_test(self.teacher, self.group, choice_count=2, open_count=1)
+        large = make_test(self.teacher, self.group, choice_count=40, open_count=10)
+        other = make_user("other@example.com", "student", self.group)
+        small_answers, large_answers = correct_answers(small), correct_answers(large)
+
+        with CaptureQueriesContext(connection) as small_ctx:
+            grade_submission(small, self.student, small_answers)
+        with CaptureQueriesContext(connection) as large_ctx:
+            grade_submission(large, other, large_answers)
+
+        self.assertEqual(len(small_ctx), len(large_ctx))
+        self.assertEqual(TestResult.objects.get(student=other).score, 50)
+
+
+class AnswerKeyCacheTests(FixtureMixin, TestCase):
+    def test_warm_key_grades_without_reading_question_tables(self):
+        test = make_test(self.teacher, self.group)
+        answers = correct_answers(test)
+        get_answer_key(test)
+
+        with CaptureQueriesContext(connection) as ctx:
+            grade_submission(test, self.student, answers)
+
+        tables = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("main_question", tables)
+        self.assertNotIn("main_answeroption", tables)
+
+    def test_shared_tier_serves_other_processes(self):
+        test = make_test(self.teacher, self.group)
+        get_answer_key(test)
+        answer_key_cache.clear_local()
+
+        with self.assertNumQueries(0):
+            key = get_answer_key(test)
+        self.assertEqual(len(key), 4)
+
+    def test_bumped_version_recompiles_key(self):
+        test = make_test(self.teacher, self.group, choice_count=1, open_count=0)
+        question = test.questions.get()
+        self.assertEqual(get_answer_key(test)[0]["correct_option_text"], "Вариант 1")
+
+        question.answers.update(is_correct=False)
+        question.answers.filter(order=3).update(is_correct=True)
+        test.bump_content_version()
+        test.refresh_from_db()
+
+        self.assertEqual(test.content_version, 1)
+        self.assertEqual(get_answer_key(test)[0]["correct_option_text"], "Вариант 3")
+
+
+class StartTestPayloadTests(FixtureMixin, TestCase):
+    def test_payload_is_built_once_per_version(self):
+        test = make_test(self.teacher, self.group, choice_count=2, open_count=1)
+        other = make_user("other@example.com", "student", self.group)
+        url = reverse("main:start_test", args=[test.id])
+
+        self.client.force_login(self.student)
+        first = self.client.get(url)
+        self.assertEqual(first["Content-Type"], "application/json")
+        data = first.json()
+        self.assertEqual(
+            [q["question_type"] for q in data["questions"]],
+            ["choice", "choice", "open"],
+        )
+        self.assertEqual(
+            [a["text"] for a in data["questions"][0]["answers"]],
+            ["Вариант 1", "Вариант 2", "Вариант 3"],
+        )
+
+        self.client.force_login(other)
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("main_question", sql)
+        self.assertNotIn("main_answeroption", sql)
+
+    def test_payload_rebuilds_after_test_change(self):
+        test = make_test(self.teacher, self.group, choice_count=1, open_count=0)
+        url = reverse("main:start_test", args=[test.id])
+        self.client.force_login(self.student)
+        self.client.get(url)
+
+        test.questions.update(text="Изменённый вопрос")
+        test.bump_content_version()
+
+        data = self.client.get(url).json()
+        self.assertEqual(data["questions"][0]["text"], "Изменённый вопрос")
+
+
+class SubmitTestViewTests(FixtureMixin, TestCase):
+    def test_submit_returns_score_and_blocks_second_attempt(self):
+        test = make_test(self.teacher, self.group)
+        self.client.force_login(self.student)
+        url = reverse("main:submit_test", args=[test.id])
+        body = json.dumps({"answers": correct_answers(test), "time_spent": 10})
+
+        response = self.client.post(url, body, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["correct"], 4)
+        self.assertEqual(response.json()["total"], 4)
+
+        response = self.client.post(url, body, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(TestResult.objects.filter(test=test).count(), 1)
+
+
+class QuestionPoolTests(FixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test = make_test(self.teacher, self.group, choice_count=30, open_count=10)
+        Test.objects.filter(pk=self.test.pk).update(pool_size=8, shuffle_options=True)
+        self.other = make_user("other@example.com", "student", self.group)
+
+    def start(self, student):
+        self.client.force_login(student)
+        return self.client.get(reverse("main:start_test", args=[self.test.id])).json()
+
+    def test_draw_is_deterministic_and_keeps_test_order(self):
+        ids = list(range(100, 140))
+        seed = attempt_seed(self.test.id, self.student.pk)
+        drawn = draw_questions(ids, 8, seed)
+        self.assertEqual(drawn, draw_questions(ids, 8, seed))
+        self.assertEqual(drawn, sorted(drawn))
+        self.assertEqual(len(set(drawn)), 8)
+        self.assertEqual(draw_questions(ids, 50, seed), ids)
+
+    def test_each_student_gets_own_stable_subset(self):
+        with CaptureQueriesContext(connection) as ctx:
+            mine = self.start(self.student)
+        self.assertNotIn("RANDOM", " ".join(q["sql"] for q in ctx.captured_queries))
+        theirs = self.start(self.other)
+
+        mine_ids = [q["id"] for q in mine["questions"]]
+        self.assertEqual(len(mine_ids), 8)
+        self.assertNotEqual(mine_ids, [q["id"] for q in theirs["questions"]])
+        self.assertEqual(self.start(self.student), mine)
+
+        options = {
+            q.id: [a.id for a in q.answers.order_by("order")]
+            for q in self.test.questions.all()
+        }
+        shuffled = 0
+        for q in mine["questions"]:
+            got = [a["id"] for a in q["answers"]]
+            self.assertCountEqual(got, options[q["id"]])
+            shuffled += got != options[q["id"]]
+        self.assertGreater(shuffled, 0)
+
+    def test_submit_grades_only_drawn_questions(self):
+        drawn = {str(q["id"]) for q in self.start(self.student)["questions"]}
+        answers = correct_answers(self.test)
+
+        response = self.client.post(
+            reverse("main:submit_test", args=[self.test.id]),
+            json.dumps({"answers": answers, "time_spent": 10}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.json()["correct"], 8)
+        self.assertEqual(response.json()["total"], 8)
+        result = TestResult.objects.get(test=self.test, student=self.student)
+        self.assertEqual(result.pool_seed, attempt_seed(self.test.id, self.student.pk))
+        self.assertEqual({str(a.question_id) for a in result.answers.all()}, drawn)
+
+    def test_create_form_sets_pool(self):
+        self.client.force_login(self.teacher)
+        data = create_test_form(self.group, choice_count=5, open_count=1)
+        data.update(pool_size="3", shuffle_options="on")
+        self.client.post(reverse("main:create_test"), data)
+        test = Test.objects.get(title="Контрольная")
+        self.assertEqual((test.pool_size, test.shuffle_options), (3, True))
+
+        data.update(pool_size="7", test_title="Слишком большая выборка")
+        self.client.post(reverse("main:create_test"), data)
+        self.assertFalse(Test.objects.filter(title=data["test_title"]).exists())
+
+
+class ResultsFeedTests(FixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test = make_test(self.teacher, self.group, choice_count=1, open_count=0)
+        self.other_group = Group.objects.create(name="ИС-22", created_by=self.teacher)
+        self.now = timezone.now()
+        self.students = []
+        for i in range(7):
+            group = self.group if i % 2 == 0 else self.other_group
+            student = make_user(f"s{i}@example.com", "student", group)
+            self.students.append(student)
+            # одинаковое время у пар результатов — проверка тай-брейка по id
+            make_result(
+                self.test, student, i % 2, 1, self.now - timedelta(hours=i // 2)
+            )
+        self.client.force_login(self.teacher)
+        self.url = reverse("main:results_feed")
+
+    def test_cursor_pagination_returns_every_row_once(self):
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            params = {"limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            data = self.client.get(self.url, params).json()
+            seen.extend(row["id"] for row in data["results"])
+            cursor = data["next_cursor"]
+            pages += 1
+            if not cursor:
+                break
+
+        expected = list(
+            TestResult.objects.order_by("-completed_at", "-id").values_list(
+                "id", flat=True
+            )
+        )
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 3)
+
+    def test_filters_run_in_sql(self):
+        passed = self.client.get(self.url, {"status": "passed"}).json()["results"]
+        self.assertEqual(len(passed), 3)
+        self.assertTrue(all(row["passed"] for row in passed))
+
+        failed = self.client.get(
+            self.url, {"status": "failed", "group": self.group.id}
+        ).json()["results"]
+        self.assertEqual(len(failed), 4)
+        self.assertEqual({row["student_group"] for row in failed}, {"ИС-21"})
+
+        today = timezone.localdate(self.now).isoformat()
+        recent = self.client.get(
+            self.url, {"date_from": today, "date_to": today, "test": self.test.id}
+        ).json()["results"]
+        expected = TestResult.objects.filter(
+            completed_at__date=timezone.localdate(self.now)
+        ).count()
+        self.assertEqual(len(recent), expected)
+
+    def test_only_own_results_and_no_answer_rows_loaded(self):
+        stranger = make_user("t2@example.com", "teacher")
+        foreign = make_test(stranger, self.group, choice_count=1, open_count=0)
+        make_result(foreign, self.students[0], 1, 1)
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(self.url).json()
+
+        self.assertEqual(len(data["results"]), 7)
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("main_useranswer", sql)
+
+    def test_invalid_params_are_rejected(self):
+        self.assertEqual(
+            self.client.get(self.url, {"cursor": "garbage"}).status_code, 400
+        )
+        self.assertEqual(
+            self.client.get(self.url, {"status": "maybe"}).status_code, 400
+        )
+
+
+class TestStatsTests(FixtureMixin, TestCase):
+    def test_grading_updates_stats_incrementally(self):
+        test = make_test(self.teacher, self.group, choice_count=4, open_count=1)
+        other = make_user("other@example.com", "student", self.group)
+
+        grade_submission(test, self.student, correct_answers(test))
+        grade_submission(test, other, {})
+
+        stats = TestStats.objects.get(test=test)
+        self.assertEqual(stats.attempts, 2)
+        self.assertEqual((stats.score_sum, stats.score_sq_sum), (5, 25))
+        self.assertEqual(stats.pass_count, 1)
+        self.assertEqual(stats.avg_score, 2.5)
+        self.assertEqual(stats.score_stddev, 2.5)
+        self.assertEqual(
+            stats.last_completed_at, TestResult.objects.get(student=other).completed_at
+        )
+
+    def test_rebuild_command_matches_incremental_stats(self):
+        test = make_test(self.teacher, self.group, choice_count=2, open_count=0)
+        empty_test = make_test(self.teacher, self.group, choice_count=1, open_count=0)
+        grade_submission(test, self.student, correct_answers(test))
+        make_result(test, make_user("x@example.com", "student", self.group), 1, 2)
+        incremental = TestStats.objects.get(test=test)
+
+        TestStats.objects.all().delete()
+        call_command("rebuild_test_stats", stdout=open(os.devnull, "w"))
+
+        rebuilt = TestStats.objects.get(test=test)
+        self.assertEqual(rebuilt.attempts, 2)
+        self.assertEqual(rebuilt.score_sum, 3)
+        self.assertEqual(rebuilt.pass_count, 1)
+        self.assertEqual(incremental.pass_count, 1)
+        self.assertEqual(TestStats.objects.get(test=empty_test).attempts, 0)
+
+    def test_my_tests_tab_does_not_aggregate_results(self):
+        test = make_test(self.teacher, self.group)
+        grade_submission(test, self.student, correct_answers(test))
+        self.client.force_login(self.teacher)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("main:teacher_tab", args=["my_tests"]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["my_tests"][0].stats.attempts, 1)
+        sql = " ".join(q["sql"] for q in ctx.captured_queries)
+        self.assertNotIn("main_testresult", sql)
+
+
+def make_levels(test):
+    bands = [(0, 30, "Начальный"), (31, 59, "Допустимый"), (60, 100, "Продвинутый")]
+    for order, (low, high, title) in enumerate(bands, start=1):
+        TestLevel.objects.create(
+            test=test,
+            title=title,
+            min_percent=low,
+            max_percent=high,
+            description="",
+            recommendations="",
+            order=order,
+        )
+
+
+class StudentDashboardTests(FixtureMixin, TestCase):
+    def complete_tests(self, count):
+        for i in range(count):
+            test = make_test(self.teacher, self.group, choice_count=2, open_count=0)
+            make_levels(test)
+            make_result(test, self.student, i % 3, 2)
+        # и один ещё не пройденный
+        make_test(self.teacher, self.group, choice_count=1, open_count=0)
+
+    def dashboard_queries(self):
+        self.client.force_login(self.student)
+        # Меряем сборку карточек, а не попадание в кэш фрагментов
+        bump_stamps(("student", self.student.pk))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("main:student_home"))
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx)
+
+    def test_query_count_does_not_grow_with_tests(self):
+        self.complete_tests(2)
+        _, small = self.dashboard_queries()
+
+        self.complete_tests(10)
+        response, large = self.dashboard_queries()
+
+        self.assertEqual(small, large)
+        self.assertEqual(len(response.context["tests_data"]), 14)
+
+    def test_levels_and_results_are_joined_in_memory(self):
+        self.complete_tests(3)
+        response, _ = self.dashboard_queries()
+
+        completed = [t for t in response.context["tests_data"] if t["is_completed"]]
+        titles = sorted(t["level"].title for t in completed)
+        self.assertEqual(titles, ["Допустимый", "Начальный", "Продвинутый"])
+        self.assertEqual(
+            sum(1 for t in response.context["tests_data"] if not t["is_completed"]), 1
+        )
+
+
+def band(order, low, high):
+    return Level(order, f"L{order}", low, high, "", "")
+
+
+class LevelBandsTests(TestCase):
+    def test_bisect_lookup(self):
+        bands = LevelBands([band(2, 31, 59), band(1, 0, 30), band(3, 60, 100)])
+        self.assertEqual(bands.level_for(0).order, 1)
+        self.assertEqual(bands.level_for(30.4).order, 1)
+        self.assertEqual(bands.level_for(30.6).order, 2)
+        self.assertEqual(bands.level_for(100).order, 3)
+        self.assertEqual(bands.level_for(101).order, 3)
+        self.assertIsNone(LevelBands([]).level_for(50))
+
+    def test_gaps_and_overlaps_are_rejected_on_compile(self):
+        with self.assertRaisesMessage(LevelBandError, "разрыв"):
+            LevelBands([band(1, 0, 30), band(2, 40, 100)])
+        with self.assertRaisesMessage(LevelBandError, "пересекаются"):
+            LevelBands([band(1, 0, 50), band(2, 40, 100)])
+        with self.assertRaises(LevelBandError):
+            LevelBands([band(1, 0, 30), band(2, 31, 90)])
+
+    def test_legacy_gaps_fall_back_to_nearest_edge(self):
+        with self.assertLogs("main.levels", "WARNING"):
+            bands = LevelBands([band(1, 0, 30), band(2, 40, 100)], strict=False)
+        self.assertEqual(bands.level_for(35).order, 2)
+        self.assertEqual(bands.level_for(-1).order, 1)
+
+
+class TestLevelsViewTests(FixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.teacher)
+
+    def post_levels(self, test, maxes):
+        data = {"levels_count": len(maxes)}
+        for i, high in enumerate(maxes, start=1):
+            data.update(
+                {
+                    f"level_{i}_title": f"Уровень {i}",
+                    f"level_{i}_max": high,
+                    f"level_{i}_description": "описание",
+                    f"level_{i}_recommendations": "совет",
+                }
+            )
+        return self.client.post(reverse("main:test_levels", args=[test.id]), data)
+
+    def test_levels_replaced_in_bulk_and_used_for_grading(self):
+        test = make_test(self.teacher, self.group, choice_count=4, open_count=1)
+        make_levels(test)
+
+        self.post_levels(test, [40, 79, 100])
+
+        self.assertEqual(
+            list(test.levels.values_list("min_percent", "max_percent")),
+            [(0, 40), (41, 79), (80, 100)],
+        )
+        self.client.force_login(self.student)
+        response = self.client.post(
+            reverse("main:submit_test", args=[test.id]),
+            json.dumps({"answers": correct_answers(test)}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["level_title"], "Уровень 3")
+
+    def test_replacing_levels_keeps_answer_key_and_payload_version(self):
+        test = make_test(self.teacher, self.group, choice_count=2, open_count=0)
+        make_levels(test)
+        get_answer_key(test)
+        self.assertEqual(get_level_bands(test).level_for(50).order, 2)
+
+        self.post_levels(test, [60, 100])
+
+        test.refresh_from_db()
+        self.assertEqual(test.content_version, 0)
+        self.assertEqual(test.levels_version, 1)
+        self.assertIn((test.id, 0), answer_key_cache._local)
+        self.assertEqual(get_level_bands(test).level_for(50).order, 1)
+
+    def test_save_query_count_does_not_depend_on_level_count(self):
+        test = make_test(self.teacher, self.group, choice_count=1, open_count=0)
+        with CaptureQueriesContext(connection) as few:
+            self.post_levels(test, [50, 100])
+        with CaptureQueriesContext(connection) as many:
+            self.post_levels(test, [10, 20, 30, 40, 50, 60, 100])
+        self.assertEqual(len(few), len(many))
+        self.assertEqual(test.levels.count(), 7)
+
+    def test_invalid_bands_keep_existing_levels(self):
+        test = make_test(self.teacher, self.group, choice_count=1, open_count=0)
+        make_levels(test)
+
+        # второй порог ниже первого — пустой диапазон второго уровня
+        response = self.post_levels(test, [70, 50, 100])
+
+        self.assertRedirects(response, reverse("main:teacher_home"))
+        self.assertEqual(test.levels.count(), 3)
+        self.assertEqual(test.levels.get(order=1).max_percent, 30)
+
+
+class ExportTests(FixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test = make_test(self.teacher, self.group, choice_count=2, open_count=1)
+        make_levels(self.test)
+        grade_submission(self.test, self.student, correct_answers(self.test), 75)
+        loser = make_user("loser@example.com", "student", self.group)
+        grade_submission(self.test, loser, {}, 5)
+        self.client.force_login(self.teacher)
+
+    def export(self, name, obj_id, export_format):
+        url = reverse(f"main:{name}", args=[obj_id])
+        response = self.client.get(url, {"format": export_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content)
+
+    def test_csv_has_per_question_correctness(self):
+        content = self.export("export_test_results", self.test.id, "csv")
+
+        rows = list(csv.reader(io.StringIO(content.decode("utf-8-sig")), delimiter=";"))
+        self.assertEqual(rows[0][-4:], ["Уровень", "В1", "В2", "В3"])
+        by_student = {row[1]: row for row in rows[1:]}
+        best = by_student["student@example.com"]
+        self.assertEqual(best[3:7], ["3", "3", "100.0", "01:15"])
+        self.assertEqual(best[8:], ["Продвинутый", "1", "1", "1"])
+        self.assertEqual(by_student["loser@example.com"][-3:], ["0", "0", "0"])
+
+    def test_xlsx_is_a_valid_workbook(self):
+        content = self.export("export_test_results", self.test.id, "xlsx")
+
+        with zipfile.ZipFile(io.BytesIO(content)) as zf:
+            self.assertIsNone(zf.testzip())
+            sheet = zf.read("xl/worksheets/sheet1.xml").decode()
+        self.assertEqual(sheet.count("<row>"), 3)
+        self.assertIn("student@example.com", sheet)
+
+    def test_quoted_title_gives_well_formed_workbook(self):
+        self.test.title = 'Тест "Алгебра" & co'
+        self.test.save()
+
+        content = self.export("export_test_results", self.test.id, "xlsx")
+
+        with zipfile.ZipFile(io.BytesIO(content)) as zf:
+            workbook = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+            sheet = zf.read("xl/worksheets/sheet1.xml")
+        self.assertEqual(workbook[0][0].get("name"), 'Тест "Алгебра" & co')
+        ElementTree.fromstring(sheet)
+
+    def test_formula_like_text_is_neutralised(self):
+        self.student.username = "=HYPERLINK(\"http://evil\")"
+        self.student.save()
+
+        content = self.export("export_test_results", self.test.id, "csv")
+        self.assertIn("'=HYPERLINK", content.decode("utf-8-sig"))
+
+        content = self.export("export_test_results", self.test.id, "xlsx")
+        with zipfile.ZipFile(io.BytesIO(content)) as zf:
+            self.assertIn(b'quotePrefix="1"', zf.read("xl/styles.xml"))
+            sheet = zf.read("xl/worksheets/sheet1.xml").decode()
+        self.assertIn(
+            '<c t="inlineStr" s="1"><is><t xml:space="preserve">=HYPER', sheet
+        )
+        self.assertNotIn("<f>", sheet)
+
+    def test_xlsx_sheet_name_falls_back_when_sanitised_away(self):
+        for title in ["", "???", "[*]", "' '"]:
+            content = b"".join(stream_xlsx([["a"]], sheet_name=title))
+            with zipfile.ZipFile(io.BytesIO(content)) as zf:
+                workbook = zf.read("xl/workbook.xml").decode()
+            self.assertIn(f'<sheet name="{DEFAULT_SHEET_NAME}"', workbook, title)
+
+    def test_group_export_compacts_answers(self):
+        content = self.export("export_group_results", self.group.id, "csv")
+
+        rows = list(csv.reader(io.StringIO(content.decode("utf-8-sig")), delimiter=";"))
+        self.assertEqual(rows[0][-1], "Ответы")
+        # «+++» иначе Excel прочитал бы как формулу
+        self.assertEqual(sorted(row[-1] for row in rows[1:]), ["'+++", "'---"])
+
+    def test_export_is_limited_to_own_tests_and_formats(self):
+        url = reverse("main:export_test_results", args=[self.test.id])
+        self.assertEqual(self.client.get(url, {"format": "pdf"}).status_code, 400)
+
+        other = make_user("other@example.com", "teacher")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(url).status_code, 404)
+        group_url = reverse("main:export_group_results", args=[self.group.id])
+        self.assertEqual(self.client.get(group_url).status_code, 404)
+
+        self.client.force_login(self.student)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+GIFT_SOURCE = """
+// Банк вопросов
+$CATEGORY: Биология
+
+::Q1:: Процесс образования органики на свету? {=Фотосинтез}
+
+::Q2:: Сколько камер в сердце человека? {
+    ~Две
+    =Четыре#Верно
+    ~%50%Три
+}
+
+::Q3:: Земля вращается вокруг Солнца {T}
+"""
+
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (2, 2), "green").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def upload(name, content):
+    if isinstance(content, str):
+        content = content.encode()
+    return SimpleUploadedFile(name, content)
+
+
+class ImportParsingTests(TestCase):
+    def test_gift_choice_open_and_true_false(self):
+        definition = parse_import(upload("bank.gift", GIFT_SOURCE))
+
+        self.assertEqual(definition.title, "bank")
+        q1, q2, q3 = definition.questions
+        self.assertEqual((q1.question_type, q1.correct_text), ("open", "Фотосинтез"))
+        self.assertEqual(
+            [(o.text, o.is_correct) for o in q2.options],
+            [("Две", False), ("Четыре", True), ("Три", False)],
+        )
+        self.assertEqual([o.is_correct for o in q3.options], [True, False])
+
+    def test_csv_with_semicolons_and_cp1251(self):
+        source = (
+            "text;type;correct;option1;option2;option3\n"
+            "Столица России?;choice;2;Казань;Москва;Уфа\n"
+            "Как называется процесс?;open;Фотосинтез;;;\n"
+        ).encode("cp1251")
+
+        definition = parse_import(upload("bank.csv", source), title="Из CSV")
+
+        self.assertEqual(definition.title, "Из CSV")
+        choice, open_question = definition.questions
+        self.assertEqual([o.is_correct for o in choice.options], [False, True, False])
+        self.assertEqual(open_question.correct_text, "Фотосинтез")
+
+    def test_all_errors_reported_at_once(self):
+        source = json.dumps(
+            {
+                "title": "Тест",
+                "questions": [
+                    {"text": "", "options": [{"text": "a", "correct": True}]},
+                    {
+                        "text": "Два верных",
+                        "options": [
+                            {"text": "a", "correct": True},
+                            {"text": "b", "correct": True},
+                        ],
+                    },
+                    {
+                        "text": "С картинкой",
+                        "type": "open",
+                        "correct_text": "x",
+                        "image": "missing.png",
+                    },
+                ],
+            }
+        )
+
+        with self.assertRaises(TestDefinitionError) as ctx:
+            parse_import(upload("bank.json", source))
+
+        errors = "\n".join(ctx.exception.errors)
+        self.assertIn("Вопрос 1: пустой текст", errors)
+        self.assertIn("Вопрос 1: нужно минимум 2 варианта", errors)
+        self.assertIn("Вопрос 2: должен быть ровно один правильный", errors)
+        self.assertIn("missing.png", errors)
+
+
+class ImportTestViewTests(FixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.teacher)
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+
+    def post_import(self, source, images=None, **data):
+        data.setdefault("group_ids", str(self.group.id))
+        data["import_file"] = source
+        if images is not None:
+            data["import_images"] = images
+        with override_settings(MEDIA_ROOT=self.media.name):
+            return self.client.post(reverse("main:import_test"), data)
+
+    def test_import_with_images_is_bulk_and_usable(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("pics/heart.png", png_bytes())
+        source = json.dumps(
+            {
+                "title": "Анатомия",
+                "questions": [
+                    {
+                        "text": f"Вопрос {i}",
+                        "options": [{"text": "да", "correct": True}, {"text": "нет"}],
+                        "image": "heart.png" if i == 1 else None,
+                    }
+                    for i in range(1, 61)
+                ],
+            }
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_import(
+                upload("bank.json", source), upload("pics.zip", archive.getvalue())
+            )
+
+        self.assertRedirects(response, reverse("main:teacher_home"))
+        test = Test.objects.get(title="Анатомия")
+        self.assertEqual(test.questions.count(), 60)
+        self.assertEqual(AnswerOption.objects.filter(question__test=test).count(), 120)
+        self.assertEqual(list(test.groups.all()), [self.group])
+        self.assertTrue(TestStats.objects.filter(test=test).exists())
+        with_image = test.questions.get(order=1)
+        self.assertTrue(with_image.image.name.endswith(".jpg"))
+        self.assertEqual(with_image.image_variants["width"], 2)
+        inserts = [q for q in queries if q["sql"].startswith("INSERT")]
+        self.assertLess(len(inserts), 10)
+        self.assertEqual(len(get_answer_key(test)), 60)
+
+    def test_invalid_file_creates_nothing(self):
+        response = self.post_import(upload("bank.gift", "Вопрос без ответов"))
+
+        self.assertRedirects(response, reverse("main:teacher_home"))
+        self.assertFalse(Test.objects.exists())
+
+    def test_foreign_group_is_rejected(self):
+        other = make_user("other@example.com", "teacher")
+        foreign = Group.objects.create(name="Чужая", created_by=other)
+
+        self.post_import(upload("bank.gift", GIFT_SOURCE), group_ids=str(foreign.id))
+
+        self.assertFalse(Test.objects.exists())
+
+
+def create_test_form(group, choice_count, open_count=1):
+    data = {"test_title": "Контрольная", "group_ids": str(group.id)}
+    num = 0
+    for _ in range(choice_count):
+        num += 1
+        data.update(
+            {
+                f"question_{num}_text": f"Вопрос {num}",
+                f"question_{num}_type": "choice",
+                f"question_{num}_answers_count": 3,
+                f"question_{num}_answer_1": "а",
+                f"question_{num}_answer_2": "б",
+                f"question_{num}_answer_3": "",
+                f"question_{num}_correct": 2,
+            }
+        )
+    for _ in range(open_count):
+        num += 1
+        data.update(
+            {
+                f"question_{num}_text": f"Вопрос {num}",
+                f"question_{num}_type": "open",
+                f"question_{num}_correct_text": " Ответ ",
+            }
+        )
+    return data
+
+
+class CreateTestViewTests(FixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.teacher)
+
+    def form_data(self, choice_count, open_count=1):
+        return create_test_form(self.group, choice_count, open_count)
+
+    def test_creates_test_with_constant_query_count(self):
+        url = reverse("main:create_test")
+        with CaptureQueriesContext(connection) as few:
+            self.client.post(url, self.form_data(choice_count=2))
+        with CaptureQueriesContext(connection) as many:
+            self.client.post(url, self.form_data(choice_count=40))
+        self.assertEqual(len(few), len(many))
+
+        test = Test.objects.filter(title="Контрольная").latest("id")
+        key = get_answer_key(test)
+        self.assertEqual(len(key), 41)
+        self.assertEqual(key[0]["correct_option_text"], "б")
+        self.assertEqual(len(key[0]["options"]), 2)
+        self.assertEqual(key[-1]["correct_normalized"], "ответ")
+
+    def test_invalid_question_leaves_no_partial_test(self):
+        data = self.form_data(choice_count=3)
+        data["question_2_correct"] = ""
+
+        response = self.client.post(reverse("main:create_test"), data)
+
+        self.assertRedirects(response, reverse("main:teacher_home"))
+        self.assertFalse(Test.objects.exists())
+        self.assertFalse(Question.objects.exists())
+
+
+def photo_bytes(size=(1200, 800), orientation=6):
+    """JPEG «с телефона»: EXIF с поворотом и описанием камеры"""
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x0110] = "Phone X"
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "white").save(buffer, "JPEG", exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+class MediaRootMixin(FixtureMixin):
+    """Файлы пишутся во временный MEDIA_ROOT"""
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def make_test_with_image(self, data):
+        test = make_test(self.teacher, self.group, choice_count=1, open_count=0)
+        question = test.questions.get()
+        question.image, question.image_variants = store_question_image(io.BytesIO(data))
+        question.save()
+        return test, question
+
+    def stored_files(self):
+        found = []
+        for root, _, files in os.walk(
+            os.path.join(settings.MEDIA_ROOT, "question_images")
+        ):
+            found += files
+        return sorted(found)
+
+
+class ImagePipelineTests(MediaRootMixin, TestCase):
+    def test_photo_is_rotated_stripped_and_resized(self):
+        name, manifest = store_question_image(io.BytesIO(photo_bytes()))
+
+        # orientation=6 — поворот на 90°: 1200x800 становится 800x1200
+        self.assertEqual((manifest["width"], manifest["height"]), (800, 1200))
+        with Image.open(os.path.join(settings.MEDIA_ROOT, name)) as stored:
+            self.assertEqual(stored.size, (800, 1200))
+            self.assertEqual(len(stored.getexif()), 0)
+        self.assertEqual([w for w, _ in manifest["variants"]["image/webp"]], [480, 800])
+        self.assertEqual(manifest["variants"]["image/jpeg"][-1], [800, name])
+
+    def test_transparent_image_keeps_png_fallback(self):
+        buffer = io.BytesIO()
+        Image.new("RGBA", (600, 300), (0, 0, 0, 0)).save(buffer, "PNG")
+
+        name, manifest = store_question_image(buffer)
+
+        self.assertTrue(name.endswith(".png"))
+        self.assertIn("image/png", manifest["variants"])
+
+    def test_start_test_returns_srcset(self):
+        test = make_test(self.teacher, self.group, choice_count=1, open_count=0)
+        question = test.questions.get()
+        question.image, question.image_variants = store_question_image(
+            io.BytesIO(photo_bytes(orientation=1))
+        )
+        question.save()
+        self.client.force_login(self.student)
+
+        response = self.client.get(reverse("main:start_test", args=[test.id]))
+
+        data = response.json()["questions"][0]
+        self.assertEqual((data["image_width"], data["image_height"]), (1200, 800))
+        self.assertRegex(
+            data["image_srcset"]["image/webp"],
+            r"^/media/question_images/[0-9a-f]{2}/[0-9a-f]{64}_480\.webp 480w, "
+            r".+_960\.webp 960w, .+_1200\.webp 1200w$",
+        )
+
+    def test_unreadable_upload_creates_nothing(self):
+        data = {
+            "test_title": "С картинкой",
+            "group_ids": str(self.group.id),
+            "question_1_text": "Что на картинке?",
+            "question_1_type": "open",
+            "question_1_correct_text": "кот",
+            "question_1_image": upload("cat.jpg", b"not an image"),
+        }
+        self.client.force_login(self.teacher)
+
+        self.client.post(reverse("main:create_test"), data)
+
+        self.assertFalse(Test.objects.exists())
+
+
+class ImageStorageTests(MediaRootMixin, TestCase):
+    def test_same_upload_is_stored_once(self):
+        _, first = self.make_test_with_image(photo_bytes(orientation=1))
+        files = self.stored_files()
+
+        _, second = self.make_test_with_image(photo_bytes(orientation=1))
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_variants, second.image_variants)
+        self.assertEqual(self.stored_files(), files)
+
+    def test_delete_test_removes_only_orphaned_files(self):
+        shared_test, _ = self.make_test_with_image(photo_bytes(orientation=1))
+        self.make_test_with_image(photo_bytes(orientation=1))
+        own_test, own = self.make_test_with_image(photo_bytes(size=(300, 200)))
+        shared_files = set(self.stored_files()) - set(
+            os.path.basename(p) for p in image_files(own.image.name, own.image_variants)
+        )
+        self.client.force_login(self.teacher)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("main:delete_test", args=[own_test.id]))
+        self.assertEqual(set(self.stored_files()), shared_files)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("main:delete_test", args=[shared_test.id]))
+        self.assertEqual(set(self.stored_files()), shared_files)
+
+    def test_reuse_and_delete_lock_the_same_image(self):
+        with mock.patch("main.images.lock_image") as lock:
+            test, question = self.make_test_with_image(photo_bytes(orientation=1))
+            reused = store_question_image(io.BytesIO(photo_bytes(orientation=1)))
+            with self.captureOnCommitCallbacks(execute=True):
+                release_question_images(test.questions.all())
+                test.delete()
+        self.assertEqual(reused[0], question.image.name)
+        keys = {c.args[0] for c in lock.call_args_list}
+        self.assertEqual(keys, {image_key(question.image.name)})
+        self.assertEqual(lock.call_count, 3)
+
+    def test_released_image_kept_if_reused_before_cleanup(self):
+        test, question = self.make_test_with_image(photo_bytes(orientation=1))
+        files = self.stored_files()
+        with self.captureOnCommitCallbacks(execute=True):
+            release_question_images(test.questions.all())
+            test.delete()
+            # Параллельная загрузка той же картинки успела сохранить вопрос
+            self.make_test_with_image(photo_bytes(orientation=1))
+        self.assertEqual(self.stored_files(), files)
+
+    def test_failed_save_removes_stored_images(self):
+        _, kept = self.make_test_with_image(photo_bytes(orientation=1))
+        files = self.stored_files()
+        definition = TestDefinition(
+            "С картинками",
+            "",
+            [
+                QuestionDef(
+                    "Вопрос",
+                    "open",
+                    "ответ",
+                    [],
+                    io.BytesIO(photo_bytes(size=(300, 200))),
+                ),
+                QuestionDef(
+                    "Общий", "open", "ответ", [], io.BytesIO(photo_bytes(orientation=1))
+                ),
+            ],
+        )
+
+        with mock.patch(
+            "main.builder.AnswerOption.objects.bulk_create",
+            side_effect=IntegrityError("сбой"),
+        ):
+            with self.assertRaises(IntegrityError):
+                save_test_definition(self.teacher, definition, [self.group.id])
+
+        self.assertFalse(Test.objects.filter(title="С картинками").exists())
+        self.assertEqual(self.stored_files(), files)
+
+    def test_cleanup_command_removes_unreferenced_files(self):
+        _, question = self.make_test_with_image(photo_bytes(orientation=1))
+        store_question_image(io.BytesIO(photo_bytes(size=(300, 200))))
+
+        call_command("cleanup_question_images", "--min-age", "0", stdout=io.StringIO())
+
+        self.assertEqual(
+            set(self.stored_files()),
+            {
+                os.path.basename(p)
+                for p in image_files(question.image.name, question.image_variants)
+            },
+        )
+
+
+class ProtectedMediaTests(MediaRootMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test, self.question = self.make_test_with_image(photo_bytes(orientation=1))
+        self.webp = self.question.image_variants["variants"]["image/webp"][0][1]
+
+    def get(self, path):
+        return self.client.get(f"/media/{path}")
+
+    def test_group_student_gets_accel_redirect(self):
+        self.client.force_login(self.student)
+
+        response = self.get(self.webp)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{self.webp}")
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response.content, b"")
+
+    def test_decision_is_cached(self):
+        self.client.force_login(self.student)
+        with CaptureQueriesContext(connection) as first:
+            self.get(self.question.image.name)
+        with CaptureQueriesContext(connection) as second:
+            self.get(self.webp)
+        self.assertEqual(len(second), len(first) - 1)
+
+    def test_other_users_are_denied(self):
+        self.assertEqual(self.get(self.webp).status_code, 404)
+
+        other_group = Group.objects.create(name="ИС-99", created_by=self.teacher)
+        self.client.force_login(make_user("out@example.com", "student", other_group))
+        self.assertEqual(self.get(self.webp).status_code, 404)
+
+        self.client.force_login(make_user("t2@example.com", "teacher"))
+        self.assertEqual(self.get(self.webp).status_code, 404)
+
+        self.client.force_login(self.teacher)
+        self.assertEqual(self.get(self.webp).status_code, 200)
+        self.assertEqual(self.get("question_images/../../settings.py").status_code, 404)
+
+    @override_settings(MEDIA_X_ACCEL=False)
+    def test_serves_file_without_nginx(self):
+        self.client.force_login(self.student)
+
+        response = self.get(self.webp)
+
+        self.assertEqual(b"".join(response.streaming_content)[8:12], b"WEBP")
+
+
+class AsyncExamViewTests(FixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test = make_test(self.teacher, self.group)
+        self.answers = correct_answers(self.test)
+
+    async def call(self, view, user, body=None, **kwargs):
+        factory = AsyncRequestFactory()
+        if body is None:
+            request = factory.get("/", kwargs.pop("params", {}))
+        else:
+            request = factory.post(
+                "/", json.dumps(body), content_type="application/json"
+            )
+
+        async def auser():
+            return user
+
+        request.user, request.auser = user, auser
+        return await view(request, **kwargs)
+
+    async def test_start_test_matches_sync_payload(self):
+        response = await self.call(
+            async_views.start_test, self.student, test_id=self.test.id
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.content, await sync_to_async(build_start_payload)(self.test)
+        )
+
+    async def test_submit_grades_once(self):
+        body = {"answers": self.answers, "time_spent": 30}
+
+        response = await self.call(
+            async_views.submit_test, self.student, body, test_id=self.test.id
+        )
+        again = await self.call(
+            async_views.submit_test, self.student, body, test_id=self.test.id
+        )
+
+        self.assertEqual(json.loads(response.content)["correct"], 4)
+        self.assertEqual(again.status_code, 400)
+        self.assertEqual(await TestResult.objects.filter(test=self.test).acount(), 1)
+
+    async def test_teacher_endpoints(self):
+        await TestResult.objects.acreate(
+            test=self.test, student=self.student, score=3, total_questions=4
+        )
+
+        feed = await self.call(async_views.results_feed, self.teacher)
+        detail = await self.call(
+            async_views.test_detail_results, self.teacher, test_id=self.test.id
+        )
+        denied = await self.call(async_views.results_feed, self.student)
+
+        self.assertEqual(json.loads(feed.content)["results"][0]["percentage"], 75.0)
+        detail = json.loads(detail.content)
+        self.assertEqual(detail["group_name"], self.group.name)
+        self.assertEqual(detail["results"][0]["student_group"], self.group.name)
+        self.assertEqual(denied.status_code, 403)
+
+
+class BenchClientTests(TestCase):
+    def test_run_load_counts_requests_over_keep_alive(self):
+        async def scenario():
+            connections = 0
+
+            async def handle(reader, writer):
+                nonlocal connections
+                connections += 1
+                try:
+                    while await reader.readuntil(b"\r\n\r\n"):
+                        writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                        await writer.drain()
+                except asyncio.IncompleteReadError:
+                    writer.close()
+
+            server = await asyncio.start_server(handle, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            async with server:
+                result = await run_load(f"http://127.0.0.1:{port}/", 3, 0.2)
+            return result, connections
+
+        result, connections = asyncio.run(scenario())
+
+        self.assertGreater(result.requests, 3)
+        self.assertEqual(result.errors, 0)
+        self.assertEqual(result.statuses, {200: result.requests})
+        self.assertEqual(connections, 3)
+
+
+class SerialLiveServerThread(LiveServerThread):
+    # In-memory SQLite делится между потоками сервера — запросы обслуживаются
+    # по одному (без keep-alive), иначе они портят друг другу транзакции
+    def _create_server(self, connections_override=None):
+        return WSGIServer(
+            (self.host, self.port), QuietWSGIRequestHandler, allow_reuse_address=False
+        )
+
+
+@override_settings(QUERY_COUNT_HEADER=True)
+class ExamRushTests(LiveServerTestCase):
+    server_thread_class = SerialLiveServerThread
+
+    def test_student_and_teacher_journeys_complete(self):
+        seed_exam_rush("rush", 6, 1, 2, 5, "rush-pass")
+        students, teachers = rush_accounts("rush", "rush-pass")
+        self.assertEqual(len(students), 6)
+        self.assertEqual(
+            {s[2] for s in students}, set(Test.objects.values_list("id", flat=True))
+        )
+
+        report = asyncio.run(
+            run_exam_rush(
+                self.live_server_url,
+                students,
+                teachers,
+                ramp_up=0,
+                think_time=0,
+                teacher_interval=0.05,
+                seed=1,
+            )
+        )
+
+        self.assertEqual(report["completed_journeys"], 6)
+        self.assertEqual(report["failed_journeys"], 0)
+        self.assertEqual(TestResult.objects.count(), 6)
+        submit = report["steps"]["submit_test"]
+        self.assertEqual(submit["requests"], 6)
+        self.assertEqual(submit["error_rate"], 0.0)
+        self.assertGreater(submit["db_queries"]["avg"], 0)
+        self.assertIn("teacher_home", report["steps"])
+        json.dumps(report)
+
+        # Пройденный тест второй раз не начать — сценарий засчитывается как сбой
+        again = asyncio.run(
+            run_exam_rush(self.live_server_url, students[:1], ramp_up=0, think_time=0)
+        )
+        self.assertEqual(again["failed_journeys"], 1)
+        self.assertEqual(again["steps"]["start_test"]["failed"], 1)
+        self.assertEqual(reset_rush_results("rush"), 6)
+
+
+class SeedExamRushTests(TestCase):
+    def test_prefixes_do_not_collide(self):
+        seed_exam_rush("rush-a", 2, 1, 1, 1, "pass")
+        seed_exam_rush("rush-b", 2, 1, 1, 1, "pass")
+        seed_exam_rush("rush-a", 2, 1, 1, 1, "pass")
+
+        usernames = get_user_model().objects.values_list("username", flat=True)
+        self.assertEqual(len(set(usernames)), 6)
+        self.assertIn("rush-b-student-1", usernames)
+        students, _ = rush_accounts("rush-b", "pass")
+        self.assertEqual(len(students), 2)
+
+
+class QueryCountHeaderTests(FixtureMixin, TestCase):
+    @override_settings(QUERY_COUNT_HEADER=True)
+    def test_header_reports_queries(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse("main:student_home"))
+        self.assertGreater(int(response["X-DB-Queries"]), 0)
+
+    def test_header_off_by_default(self):
+        self.client.force_login(self.student)
+        response = self.client.get(reverse("main:student_home"))
+        self.assertNotIn("X-DB-Queries", response)
+
+    @override_settings(QUERY_COUNT_HEADER=True)
+    async def test_async_chain_counts_orm_queries(self):
+        async def view(request):
+            await Test.objects.acount()
+            await Group.objects.acount()
+            return HttpResponse()
+
+        middleware = QueryCountMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(AsyncRequestFactory().get("/"))
+        self.assertEqual(response["X-DB-Queries"], "2")
+
+
+class RequestTimingTests(FixtureMixin, TestCase):
+    def get_dashboard(self):
+        self.client.force_login(self.student)
+        return self.client.get(reverse("main:student_home"))
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1, REQUEST_TIMING_SLOW_MS=0)
+    def test_sampled_request_gets_server_timing_and_log(self):
+        with self.assertLogs("main.timing", "INFO") as logs:
+            response = self.get_dashboard()
+
+        self.assertRegex(
+            response["Server-Timing"],
+            r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries, \d+ duplicate", '
+            r"tpl;dur=[\d.]+$",
+        )
+        record = logs.records[-1].timing
+        self.assertEqual(record["view"], "main:student_home")
+        self.assertEqual(record["status"], 200)
+        self.assertGreater(record["queries"], 0)
+        self.assertGreater(record["template_ms"], 0)
+        self.assertFalse(record["slow"])
+        self.assertEqual(json.loads(logs.records[-1].getMessage()), record)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0, REQUEST_TIMING_SLOW_MS=0.001)
+    def test_slow_request_logged_without_sampling(self):
+        with self.assertLogs("main.timing", "WARNING") as logs:
+            response = self.get_dashboard()
+
+        self.assertNotIn("Server-Timing", response)
+        record = logs.records[-1].timing
+        self.assertTrue(record["slow"])
+        self.assertEqual(
+            set(record) - {"view", "method", "path", "status", "slow"}, {"wall_ms"}
+        )
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0, REQUEST_TIMING_SLOW_MS=0)
+    def test_disabled(self):
+        with self.assertNoLogs("main.timing"):
+            response = self.get_dashboard()
+        self.assertNotIn("Server-Timing", response)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=1, REQUEST_TIMING_SLOW_MS=0)
+    async def test_async_chain_stays_async(self):
+        async def view(request):
+            await Test.objects.acount()
+            return HttpResponse()
+
+        middleware = RequestTimingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        with self.assertLogs("main.timing", "INFO") as logs:
+            response = await middleware(AsyncRequestFactory().get("/"))
+        self.assertIn('desc="1 queries, 0 duplicate"', response["Server-Timing"])
+        self.assertEqual(logs.records[-1].timing["queries"], 1)
+
+    def test_recorder_counts_duplicates(self):
+        recorder = _QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            for _ in range(2):
+                list(Test.objects.filter(pk=1))
+            list(Test.objects.filter(pk=2))
+        self.assertEqual(recorder.count, 3)
+        self.assertEqual(recorder.duplicates, 1)
+
+
+class ProfileBackendTests(FixtureMixin, TestCase):
+    def test_user_profile_and_group_in_one_query(self):
+        with self.assertNumQueries(1):
+            user = ProfileBackend().get_user(self.student.pk)
+            self.assertEqual(user.profile.role, "student")
+            self.assertEqual(user.profile.group.name, "ИС-21")
+
+    def test_principal_without_extra_query(self):
+        user = ProfileBackend().get_user(self.student.pk)
+        with self.assertNumQueries(0):
+            principal = asyncio.run(aget_principal(user))
+        self.assertEqual(
+            principal, Principal(self.student.pk, "student", self.group.id)
+        )
+
+    def test_principal_for_user_without_profile(self):
+        admin = User.objects.create_user(
+            email="admin@example.com", username="admin", password="x"
+        )
+        user = ProfileBackend().get_user(admin.pk)
+        self.assertEqual(asyncio.run(aget_principal(user)).role, None)
+
+    @override_settings(SESSION_ENGINE="django.contrib.sessions.backends.signed_cookies")
+    def test_signed_cookie_session_skips_session_table(self):
+        self.client.force_login(self.student)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("main:student_home"))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            [q for q in queries.captured_queries if "django_session" in q["sql"]]
+        )
+
+
+class StaticAssetsTests(TestCase):
+    def setUp(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        self.storage = PrecompressedManifestStorage(location=root.name)
+
+    def collect(self, files):
+        for name, content in files.items():
+            self.storage.save(name, io.BytesIO(content))
+        paths = {name: (self.storage, name) for name in files}
+        return {name: hashed for name, hashed, _ in self.storage.post_process(paths)}
+
+    def test_hashed_files_get_gzip_copies(self):
+        css = b".btn{color:#1b7d4a}" * 100
+        hashed = self.collect({"main/dist/app.css": css, "main/tiny.js": b"1"})
+
+        self.assertRegex(hashed["main/dist/app.css"], r"app\.[0-9a-f]{12}\.css$")
+        with gzip.open(self.storage.path(hashed["main/dist/app.css"]) + ".gz") as f:
+            self.assertEqual(f.read(), css)
+        self.assertFalse(
+            os.path.exists(self.storage.path(hashed["main/tiny.js"]) + ".gz")
+        )
+        self.assertEqual(
+            self.storage.url("main/dist/app.css"),
+            "/static/" + hashed["main/dist/app.css"],
+        )
+
+    def test_unhashed_url_without_manifest(self):
+        self.assertEqual(
+            self.storage.url("main/dist/app.css"), "/static/main/dist/app.css"
+        )
+
+    def fetch_vendor(self, files, checksums="", **options):
+        vendor = tempfile.TemporaryDirectory()
+        self.addCleanup(vendor.cleanup)
+        with open(os.path.join(vendor.name, "SHA256SUMS"), "w") as f:
+            f.write("# суммы\n" + checksums)
+
+        def urlopen(url, timeout):
+            return io.BytesIO(files[url.rsplit("/", 1)[-1]])
+
+        command = "main.management.commands.build_assets"
+        with mock.patch(f"{command}.VENDOR_DIR", vendor.name), mock.patch(
+            f"{command}.urllib.request.urlopen", urlopen
+        ):
+            build_assets.Command(stdout=io.StringIO()).fetch_vendor(False, **options)
+        return vendor.name
+
+    def test_vendor_download_checked_against_pinned_sum(self):
+        files = {"htmx.min.js": b"htmx", "daisyui.mjs": b"daisy"}
+        sums = "".join(
+            f"{hashlib.sha256(data).hexdigest()}  {name}\n"
+            for name, data in files.items()
+        )
+        vendor = self.fetch_vendor(files, sums)
+        with open(os.path.join(vendor, "htmx.min.js"), "rb") as f:
+            self.assertEqual(f.read(), b"htmx")
+
+        with self.assertRaisesMessage(CommandError, "не совпадает"):
+            self.fetch_vendor({**files, "htmx.min.js": b"evil"}, sums)
+
+    def test_unpinned_vendor_file_needs_pin(self):
+        files = {"htmx.min.js": b"htmx", "daisyui.mjs": b"daisy"}
+        with self.assertRaisesMessage(CommandError, "--pin"):
+            self.fetch_vendor(files)
+
+        vendor = self.fetch_vendor(files, pin=True)
+        self.assertEqual(
+            build_assets.read_checksums(vendor)["daisyui.mjs"],
+            hashlib.sha256(b"daisy").hexdigest(),
+        )
+        with open(os.path.join(vendor, "SHA256SUMS")) as f:
+            self.assertTrue(f.readline().startswith("#"))
+
+    def test_cdn_assets_until_self_hosted_build_enabled(self):
+        html = self.client.get(reverse("main:login")).content.decode()
+        self.assertIn("https://unpkg.com/htmx.org@1.9.10", html)
+        self.assertNotIn("main/dist/", html)
+
+        with override_settings(SELF_HOSTED_ASSETS=True):
+            html = self.client.get(reverse("main:login")).content.decode()
+        self.assertIn("/static/main/dist/htmx.min.js", html)
+        self.assertNotIn("unpkg.com", html)
+
+    def test_self_hosted_assets_require_build(self):
+        with override_settings(SELF_HOSTED_ASSETS=True), mock.patch(
+            "main.checks.finders.find", return_value=None
+        ):
+            errors = checks.built_assets_check(None)
+        self.assertEqual({e.id for e in errors}, {"main.E001"})
+        self.assertEqual(checks.built_assets_check(None), [])
+
+    @override_settings(TAILWIND_CLI="/nonexistent/tailwindcss")
+    def test_build_assets_reports_missing_cli(self):
+        with mock.patch("main.management.commands.build_assets.Command.fetch_vendor"):
+            with self.assertRaisesMessage(CommandError, "TAILWIND_CLI"):
+                call_command("build_assets", stdout=io.StringIO())
+
+
+class FastJsonTests(FixtureMixin, TestCase):
+    DATA = {"text": "Вопрос № 1", "score": Decimal("4.50"), 7: [None, True]}
+
+    def test_dumps_keeps_unicode_and_django_types(self):
+        body = responses.dumps(self.DATA)
+        self.assertIn("Вопрос № 1".encode(), body)
+        self.assertEqual(
+            json.loads(body), {"text": "Вопрос № 1", "score": "4.50", "7": [None, True]}
+        )
+
+    def test_stdlib_fallback_gives_same_json(self):
+        with mock.patch("main.responses.orjson", None):
+            fallback = responses.dumps(self.DATA)
+        self.assertEqual(json.loads(fallback), json.loads(responses.dumps(self.DATA)))
+        self.assertNotIn(b"\\u", fallback)
+
+    def start_test(self, **headers):
+        test = make_test(self.teacher, self.group, choice_count=20, open_count=5)
+        self.client.force_login(self.student)
+        return self.client.get(reverse("main:start_test", args=[test.id]), **headers)
+
+    @override_settings(COMPRESS_MIN_SIZE=200)
+    def test_large_json_is_gzipped(self):
+        response = self.start_test(HTTP_ACCEPT_ENCODING="gzip, deflate")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(data["questions"]), 25)
+
+    @override_settings(COMPRESS_MIN_SIZE=200)
+    def test_refused_encoding_is_respected(self):
+        response = self.start_test(HTTP_ACCEPT_ENCODING="gzip;q=0, identity")
+        self.assertNotIn("Content-Encoding", response)
+        self.assertIn("Accept-Encoding", response["Vary"])
+
+    @override_settings(COMPRESS_MIN_SIZE=10**6)
+    def test_small_json_is_not_compressed(self):
+        response = self.start_test(HTTP_ACCEPT_ENCODING="gzip")
+        self.assertNotIn("Content-Encoding", response)
+
+    @override_settings(COMPRESS_MIN_SIZE=0)
+    def test_html_is_not_compressed(self):
+        self.client.force_login(self.student)
+        response = self.client.get(
+            reverse("main:student_home"), HTTP_ACCEPT_ENCODING="gzip"
+        )
+        self.assertNotIn("Content-Encoding", response)
+
+    @skipUnless(brotli, "пакет Brotli не установлен")
+    @override_settings(COMPRESS_MIN_SIZE=200)
+    def test_brotli_preferred(self):
+        response = self.start_test(HTTP_ACCEPT_ENCODING="gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(
+            len(json.loads(brotli.decompress(response.content))["questions"]), 25
+        )
+
+    @override_settings(COMPRESS_MIN_SIZE=10)
+    async def test_async_chain_is_compressed(self):
+        async def view(request):
+            return FastJsonResponse({"text": "Вопрос " * 50})
+
+        middleware = CompressionMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(
+            AsyncRequestFactory().get("/", headers={"Accept-Encoding": "gzip"})
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            json.loads(gzip.decompress(response.content))["text"][:6], "Вопрос"
+        )
+
+    def test_accepted_encodings(self):
+        self.assertEqual(_accepted_encodings("GZIP;q=0.5, br;q=0, *"), {"gzip", "*"})
+
+
+class TeacherTabsTests(FixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test = make_test(self.teacher, self.group)
+        self.client.force_login(self.teacher)
+
+    def test_panel_renders_without_loading_tab_data(self):
+        # Только сессия и пользователь с профилем
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("main:teacher_home"))
+
+        self.assertEqual(response.status_code, 200)
+        for tab in TEACHER_TABS:
+            self.assertContains(response, reverse("main:teacher_tab", args=[tab]))
+        self.assertNotContains(response, self.test.title)
+
+    def test_each_tab_renders_its_partial(self):
+        for tab, marker in [
+            ("my_tests", self.test.title),
+            ("test_levels", self.test.title),
+            ("results", self.test.title),
+            ("create_group", self.group.name),
+            ("create_test", self.group.name),
+        ]:
+            with self.subTest(tab=tab):
+                response = self.client.get(reverse("main:teacher_tab", args=[tab]))
+                self.assertTemplateUsed(response, f"main/partials/teach/{tab}.html")
+                self.assertContains(response, marker)
+                self.assertNotContains(response, "<html")
+
+    def test_unknown_tab_and_students_are_rejected(self):
+        self.assertEqual(
+            self.client.get(reverse("main:teacher_tab", args=["base"])).status_code,
+            404,
+        )
+        self.client.force_login(self.student)
+        response = self.client.get(reverse("main:teacher_tab", args=["my_tests"]))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(FRAGMENT_CACHE_TTL=600)
+class FragmentCacheTests(FixtureMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.test = make_test(self.teacher, self.group, choice_count=2, open_count=0)
+
+    def teacher_client(self):
+        client = Client()
+        client.force_login(self.teacher)
+        return client
+
+    def test_teacher_panel_is_served_from_cache_until_write(self):
+        client = self.teacher_client()
+        url = reverse("main:teacher_tab", args=["my_tests"])
+        with CaptureQueriesContext(connection) as cold:
+            client.get(url)
+        Test.objects.filter(pk=self.test.pk).update(title="Новое название")
+        with CaptureQueriesContext(connection) as warm:
+            response = client.get(url)
+
+        self.assertLess(len(warm), len(cold))
+        self.assertNotContains(response, "Новое название")
+
+        client.post(
+            reverse("main:test_levels", args=[self.test.id]),
+            {"levels_count": 1, "level_1_title": "Все"},
+        )
+        self.assertContains(client.get(url), "Новое название")
+
+        client.post(reverse("main:delete_test", args=[self.test.id]))
+        self.assertNotContains(client.get(url), "Новое название")
+
+    def test_student_cards_follow_submit_and_group_changes(self):
+        self.client.force_login(self.student)
+        url = reverse("main:student_home")
+        self.assertContains(self.client.get(url), "Доступен")
+
+        self.client.post(
+            reverse("main:submit_test", args=[self.test.id]),
+            json.dumps({"answers": correct_answers(self.test), "time_spent": 5}),
+            content_type="application/json",
+        )
+        response = self.client.get(url)
+        self.assertContains(response, "ПРОЙДЕН")
+        self.assertNotContains(response, "Доступен")
+
+        self.teacher_client().post(reverse("main:delete_test", args=[self.test.id]))
+        self.assertNotContains(self.client.get(url), "ПРОЙДЕН")
+
+    def test_admin_question_edit_refreshes_student_cards(self):
+        self.client.force_login(self.student)
+        url = reverse("main:student_home")
+        self.assertContains(self.client.get(url), "2 вопр.")
+
+        admin_user = User.objects.create_superuser(
+            email="root@example.com", username="root", password="x"
+        )
+        admin_client = Client()
+        admin_client.force_login(admin_user)
+        question = self.test.questions.first()
+        admin_client.post(
+            reverse("admin:main_question_delete", args=[question.pk]), {"post": "yes"}
+        )
+
+        self.assertContains(self.client.get(url), "1 вопр.")
+
+    @override_settings(FRAGMENT_CACHE_TTL=0)
+    def test_zero_ttl_disables_fragment_cache(self):
+        client = self.teacher_client()
+        url = reverse("main:teacher_tab", args=["my_tests"])
+        client.get(url)
+        Test.objects.filter(pk=self.test.pk).update(title="Новое название")
+        self.assertContains(client.get(url), "Новое название")
+
+
+class ResultIndexTests(FixtureMixin, TestCase):
+    def seed(self):
+        for t in range(5):
+            test = make_test(self.teacher, self.group, title=f"Тест {t}")
+            for s in range(8):
+                student = make_user(f"s{t}-{s}@example.com", "student", self.group)
+                grade_submission(test, student, correct_answers(test))
+
+    def test_second_result_for_same_test_is_rejected(self):
+        test = make_test(self.teacher, self.group)
+        grade_submission(test, self.student, {})
+
+        with self.assertRaises(IntegrityError):
+            grade_submission(test, self.student, {})
+        self.assertEqual(TestStats.objects.get(test=test).attempts, 1)
+
+    def test_hot_queries_use_indexes(self):
+        self.seed()
+
+        self.assertEqual(find_full_scans(), [])
+        call_command("check_query_plans", stdout=io.StringIO())
+
+    def test_unsupported_vendor_is_a_command_error(self):
+        with mock.patch.object(connection, "vendor", "oracle"):
+            with self.assertRaises(ValueError):
+                find_full_scans()
+            with self.assertRaisesMessage(CommandError, "oracle"):
+                call_command("check_query_plans", stdout=io.StringIO())
+
+    def test_full_scan_is_reported(self):
+        self.seed()
+        by_score = HotQuery(
+            "by_score",
+            TestResult._meta.db_table,
+            lambda s: TestResult.objects.filter(score=3),
+        )
+
+        with mock.patch("main.query_plans.HOT_QUERIES", [by_score]):
+            failures = find_full_scans()
+
+        self.assertEqual([name for name, _ in failures], ["by_score"])
+
+
+class DedupeResultsMigrationTests(TransactionTestCase):
+    BEFORE = [("main", "0011_question_image_storage")]
+    AFTER = [("main", "0012_dedupe_test_results")]
+
+    def migrate(self, target):
+        executor = MigrationExecutor(connection)
+        executor.migrate(target)
+        return executor.loader.project_state(target).apps
+
+    def tearDown(self):
+        # Откат вернул дубликаты — повторное удаление в журнал теста не нужно
+        with self.assertLogs("main.migrations", "WARNING"):
+            self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes("main"))
+
+    def test_duplicates_are_backed_up_and_restored_on_rollback(self):
+        apps = self.migrate(self.BEFORE)
+        User = apps.get_model("main", "CustomUser")
+        Test = apps.get_model("main", "Test")
+        TestResult = apps.get_model("main", "TestResult")
+        UserAnswer = apps.get_model("main", "UserAnswer")
+        teacher = User.objects.create(email="t@example.com", username="t")
+        student = User.objects.create(email="s@example.com", username="s")
+        test = Test.objects.create(title="Тест", created_by=teacher)
+        first = TestResult.objects.create(
+            test=test, student=student, score=1, total_questions=2
+        )
+        second = TestResult.objects.create(
+            test=test, student=student, score=2, total_questions=2
+        )
+        question = apps.get_model("main", "Question").objects.create(
+            test=test, text="Вопрос", question_type="open"
+        )
+        UserAnswer.objects.create(
+            test_result=second, question=question, text_answer="ответ"
+        )
+        TestResult.objects.create(
+            test=test, student=teacher, score=0, total_questions=2
+        )
+
+        with self.assertLogs("main.migrations", "WARNING") as logs:
+            apps = self.migrate(self.AFTER)
+        self.assertIn("Удалено дубликатов результатов: 1", logs.output[0])
+        TestResult = apps.get_model("main", "TestResult")
+        self.assertEqual(
+            list(
+                TestResult.objects.filter(student_id=student.pk).values_list(
+                    "id", flat=True
+                )
+            ),
+            [first.id],
+        )
+        self.assertEqual(TestResult.objects.count(), 2)
+        self.assertEqual(apps.get_model("main", "TestStats").objects.get().attempts, 2)
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id, score FROM main_testresult_duplicate_backup")
+            self.assertEqual(cursor.fetchall(), [(second.id, 2)])
+
+        apps = self.migrate(self.BEFORE)
+        self.assertEqual(apps.get_model("main", "TestResult").objects.count(), 3)
+        self.assertEqual(
+            apps.get_model("main", "UserAnswer").objects.get().test_result_id,
+            second.id,
+        )
+        self.assertNotIn(
+            "main_testresult_duplicate_backup", connection.introspection.table_names()
+        )
+
+
+QUERY_BASELINE = os.path.join(os.path.dirname(__file__), "query_baseline.json")
+
+
+def seed_dashboard(size):
+    """Преподаватель, студент и экзамен; size задаёт объём данных вокруг них"""
+    teacher = make_user("teacher@example.com", "teacher")
+    group = Group.objects.create(name="ИС-21", created_by=teacher)
+    student = make_user("student@example.com", "student", group)
+    exam = make_test(teacher, group, choice_count=2 * size, open_count=size)
+    make_levels(exam)
+    image = f"question_images/ab/ab{'0' * 62}.jpg"
+    Question.objects.filter(pk=exam.questions.first().pk).update(image=image)
+
+    for i in range(size):
+        Group.objects.create(name=f"Группа {i}", created_by=teacher)
+        other = make_test(teacher, group, choice_count=2, title=f"Тест {i}")
+        make_levels(other)
+        grade_submission(other, student, correct_answers(other))
+        peer = make_user(f"peer{i}@example.com", "student", group)
+        grade_submission(exam, peer, correct_answers(exam))
+
+    return SimpleNamespace(
+        teacher=teacher, student=student, group=group, exam=exam, image=image
+    )
+
+
+def route_scenarios(d):
+    """{имя маршрута: (кто, метод, url, аргументы запроса)} — по одному на маршрут.
+
+    У маршрута с параметром-разделом сценарий на каждый раздел: «маршрут:раздел».
+    """
+    exam, group = d.exam, d.group
+    return {
+        "home": ("student", "get", reverse("main:home"), {}),
+        "teacher_home": ("teacher", "get", reverse("main:teacher_home"), {}),
+        **{
+            f"teacher_tab:{tab}": (
+                "teacher",
+                "get",
+                reverse("main:teacher_tab", args=[tab]),
+                {},
+            )
+            for tab in sorted(TEACHER_TABS)
+        },
+        "create_test": (
+            "teacher",
+            "post",
+            reverse("main:create_test"),
+            {"data": create_test_form(group, choice_count=3)},
+        ),
+        "import_test": (
+            "teacher",
+            "post",
+            reverse("main:import_test"),
+            {"data": {"import_file": upload("bank.gift", GIFT_SOURCE)}},
+        ),
+        "results_feed": ("teacher", "get", reverse("main:results_feed"), {}),
+        "create_group": (
+            "teacher",
+            "post",
+            reverse("main:create_group"),
+            {"data": {"group_name": "Новая"}},
+        ),
+        "delete_test": (
+            "teacher",
+            "post",
+            reverse("main:delete_test", args=[exam.id]),
+            {},
+        ),
+        "test_detail_results": (
+            "teacher",
+            "get",
+            reverse("main:test_detail_results", args=[exam.id]),
+            {},
+        ),
+        "export_test_results": (
+            "teacher",
+            "get",
+            reverse("main:export_test_results", args=[exam.id]),
+            {"data": {"format": "csv"}},
+        ),
+        "test_levels": (
+            "teacher",
+            "post",
+            reverse("main:test_levels", args=[exam.id]),
+            {"data": {"levels_count": 1, "level_1_title": "Все"}},
+        ),
+        "delete_group": (
+            "teacher",
+            "post",
+            reverse("main:delete_group", args=[group.id]),
+            {},
+        ),
+        "export_group_results": (
+            "teacher",
+            "get",
+            reverse("main:export_group_results", args=[group.id]),
+            {"data": {"format": "xlsx"}},
+        ),
+        "student_home": ("student", "get", reverse("main:student_home"), {}),
+        "start_test": (
+            "student",
+            "get",
+            reverse("main:start_test", args=[exam.id]),
+            {},
+        ),
+        "submit_test": (
+            "student",
+            "post",
+            reverse("main:submit_test", args=[exam.id]),
+            {
+                "data": json.dumps({"answers": correct_answers(exam)}),
+                "content_type": "application/json",
+            },
+        ),
+        "register": (None, "get", reverse("main:register"), {}),
+        "login": (
+            None,
+            "post",
+            reverse("main:login"),
+            {"data": {"email": "student@example.com", "password": "pass12345"}},
+        ),
+        "logout": ("student", "get", reverse("main:logout"), {}),
+        "protected_media": (
+            "student",
+            "get",
+            reverse("main:protected_media", args=[d.image]),
+            {},
+        ),
+    }
+
+
+class QueryCountTests(TestCase):
+    """Число запросов каждого маршрута main.urls не растёт с объёмом данных.
+
+    Значения фиксируются в query_baseline.json. После осознанного изменения
+    вьюхи обновить: UPDATE_QUERY_BASELINE=1 manage.py test main.tests.QueryCountTests
+    """
+
+    SIZES = {"small": 1, "large": 12}
+
+    def measure(self, name, d, role, method, url, kwargs):
+        client = Client()
+        if role is not None:
+            client.force_login(getattr(d, role))
+        # Холодные кэши: меряем худший случай, а не удачное попадание
+        cache.clear()
+        answer_key_cache.clear_local()
+        start_payload_cache.clear_local()
+        level_bands_cache.clear_local()
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = getattr(client, method)(url, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+        self.assertLess(response.status_code, 400, name)
+        return len(ctx)
+
+    def count_queries(self, size):
+        counts = {}
+        size_point = transaction.savepoint()
+        d = seed_dashboard(size)
+        for name, scenario in route_scenarios(d).items():
+            # Каждый маршрут — на одних и тех же данных
+            point = transaction.savepoint()
+            with self.settings(MEDIA_X_ACCEL=True):
+                counts[name] = self.measure(name, d, *scenario)
+            transaction.savepoint_rollback(point)
+        transaction.savepoint_rollback(size_point)
+        return counts
+
+    def test_every_route_has_a_scenario(self):
+        names = {pattern.name for pattern in urls.urlpatterns}
+        d = SimpleNamespace(
+            exam=Test(id=1), group=Group(id=1), image="question_images/x.jpg"
+        )
+        with mock.patch(f"{__name__}.correct_answers", return_value={}):
+            scenarios = set(route_scenarios(d))
+        self.assertEqual({name.split(":")[0] for name in scenarios}, names)
+        self.assertEqual(
+            {name.split(":")[1] for name in scenarios if ":" in name}, TEACHER_TABS
+        )
+
+    def test_query_counts_do_not_grow_with_data(self):
+        small = self.count_queries(self.SIZES["small"])
+        large = self.count_queries(self.SIZES["large"])
+
+        grows = {
+            name: (small[name], large[name])
+            for name in small
+            if small[name] != large[name]
+        }
+        self.assertEqual(grows, {}, "запросов (мало данных, много данных)")
+
+        if os.environ.get("UPDATE_QUERY_BASELINE") == "1":
+            with open(QUERY_BASELINE, "w", encoding="utf-8") as f:
+                json.dump(large, f, ensure_ascii=False, indent=2, sort_keys=True)
+                f.write("\n")
+            return
+        with open(QUERY_BASELINE, encoding="utf-8") as f:
+            baseline = json.load(f)
+        self.assertEqual(large, baseline)
@@ -1,21 +1,32 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+
+from . import async_views, views
+
+# JSON-эндпоинты экзамена: async-версии при запуске под ASGI (см. async_views.py)
+exam_views = async_views if settings.ASYNC_EXAM_VIEWS else views
 
 app_name = 'main'
 
 urlpatterns = [
     path('', views.home_view, name='home'),
     path('teacher/', views.teacher_home, name='teacher_home'),
+    path('teacher/tab/<slug:tab>/', views.teacher_tab, name='teacher_tab'),
     path('teacher/create-test/', views.create_test, name='create_test'),
+    path('teacher/import-test/', views.import_test, name='import_test'),
+    path('teacher/results/', exam_views.results_feed, name='results_feed'),
     path('teacher/create-group/', views.create_group, name='create_group'),
     path('teacher/test/<int:test_id>/delete/', views.delete_test, name='delete_test'),
-    path('teacher/test/<int:test_id>/results/', views.test_detail_results, name='test_detail_results'),
+    path('teacher/test/<int:test_id>/results/', exam_views.test_detail_results, name='test_detail_results'),
+    path('teacher/test/<int:test_id>/export/', views.export_test_results, name='export_test_results'),
     path('teacher/test/<int:test_id>/levels/', views.test_levels, name='test_levels'),
     path('teacher/group/<int:group_id>/delete/', views.delete_group, name='delete_group'),
+    path('teacher/group/<int:group_id>/export/', views.export_group_results, name='export_group_results'),
     path('student/', views.student_home, name='student_home'),
-    path('student/test/<int:test_id>/start/', views.start_test, name='start_test'),
-    path('student/test/<int:test_id>/submit/', views.submit_test, name='submit_test'),
+    path('student/test/<int:test_id>/start/', exam_views.start_test, name='start_test'),
+    path('student/test/<int:test_id>/submit/', exam_views.submit_test, name='submit_test'),
     path('register/', views.register_view, name='register'),
     path('login/',  views.login_view, name='login'),
     path('logout/',  views.logout_view, name='logout'),
+    path('media/<path:path>', views.protected_media, name='protected_media'),
 ]
\ No newline at end of file
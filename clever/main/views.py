@@ -1,22 +1,53 @@
 import json
-import re
+import mimetypes
+from urllib.parse import quote
 
+from django.contrib import messages
 from django.contrib.auth import authenticate, get_user_model, login, logout
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Count
-from django.http import JsonResponse
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.utils.functional import SimpleLazyObject
 from django.views.decorators.http import require_http_methods
 
+from .answer_keys import invalidate_answer_key
+from .builder import (
+    TestDefinitionError,
+    definition_from_form,
+    pool_options,
+    save_test_definition,
+)
+from .exports import EXPORT_FORMATS, group_export, test_export
 from .forms import LoginForm, RegisterForm
+from .fragments import (
+    invalidate_group_fragments,
+    invalidate_result_fragments,
+    invalidate_test_fragments,
+    student_fragments,
+    teacher_fragments,
+)
+from .grading import grade_submission
+from .images import release_question_images
+from .importers import parse_import
+from .levels import (
+    Level,
+    LevelBandError,
+    get_level_bands,
+    get_level_bands_many,
+    replace_levels,
+)
+from .media_access import can_view_media, clean_media_path, is_hashed
+from .payloads import get_student_payload, invalidate_start_payload
+from .responses import FastJsonResponse
+from .results_feed import FeedParamsError, fetch_page
+from .storage import question_image_storage
 from .models import (
-    AnswerOption,
     Group,
-    Question,
     Test,
-    TestLevel,
     TestResult,
-    UserAnswer,
     UserProfile,
 )
 
@@ -25,20 +56,7 @@ User = get_user_model()
 
 def get_student_level(test, score_percent):
     """Вспомогательная функция для определения уровня"""
-    score_percent = round(score_percent)
-
-    # Пытаемся найти уровень в диапазоне
-    level = test.levels.filter(
-        min_percent__lte=score_percent, max_percent__gte=score_percent
-    ).first()
-
-    # Если не нашли (из-за дырок или если результат 101%), берем ближайший
-    if not level:
-        if score_percent <= 0:
-            return test.levels.order_by("order").first()
-        return test.levels.order_by("order").last()
-
-    return level
+    return get_level_bands(test).level_for(score_percent)
 
 
 @login_required
@@ -53,66 +71,68 @@ def home_view(request):
 
 @login_required
 def teacher_home(request):
+    """Каркас панели: вкладки подгружает htmx (teacher_tab) при первом открытии"""
     if request.user.profile.role != "teacher":
         return redirect("main:home")
 
-    groups = Group.objects.filter(created_by=request.user).order_by("name")
+    return render(request, "main/teach_panel.html")
+
+
+# Вкладки панели преподавателя: шаблон main/partials/teach/<имя>.html
+TEACHER_TABS = {"create_test", "create_group", "my_tests", "results", "test_levels"}
 
-    # Получаем все тесты преподавателя с аннотациями
+
+@login_required
+@require_http_methods(["GET"])
+def teacher_tab(request, tab):
+    """Одна вкладка панели; разметка кэшируется фрагментом до изменения данных"""
+    if request.user.profile.role != "teacher":
+        return HttpResponse(status=403)
+    if tab not in TEACHER_TABS:
+        raise Http404
+
+    # Querysets ленивые: вкладка читает только своё, а при попадании
+    # в кэш фрагментов запросов к ним нет вовсе
+    groups = (
+        Group.objects.filter(created_by=request.user)
+        .annotate(students_count=Count("students"))
+        .order_by("name")
+    )
+    # Статистика прохождений — из денормализованной TestStats
     my_tests = (
         Test.objects.filter(created_by=request.user)
-        .prefetch_related("questions", "results", "groups", "levels")
-        .annotate(results_count=Count("results"), avg_score=Avg("results__score"))
+        .select_related("stats")
+        .prefetch_related("groups", "levels")
+        .annotate(questions_count=Count("questions"))
         .order_by("-created_at")
     )
 
-    levels_map = {}
-    for t in my_tests:
-        levels_map[t.id] = {lvl.order: lvl for lvl in t.levels.all()}
-
-    # Получаем все результаты студентов для всех тестов преподавателя
-    all_results = (
-        TestResult.objects.filter(test__created_by=request.user)
-        .select_related("test", "student", "student__profile")
-        .prefetch_related("answers")
-        .order_by("-completed_at")
-    )
-
-    # Форматируем результаты для отображения
-    results_data = []
-    for result in all_results:
-        percentage = 0
-        if result.total_questions:
-            percentage = round((result.score / result.total_questions) * 100, 1)
-
-        results_data.append(
-            {
-                "id": result.id,
-                "test_title": result.test.title,
-                "test_id": result.test.id,
-                "student_name": result.student.username,
-                "student_group": result.student.profile.group or "Без группы",
-                "score": result.score,
-                "total": result.total_questions,
-                "percentage": percentage,
-                "time_spent": result.time_spent,
-                "time_formatted": f"{result.time_spent // 60:02d}:{result.time_spent % 60:02d}",
-                "completed_at": result.completed_at.strftime("%d.%m.%Y %H:%M"),
-                "passed": percentage >= 60,
-            }
-        )
-
     return render(
         request,
-        "main/teach_panel.html",
+        f"main/partials/teach/{tab}.html",
         {
             "groups": groups,
             "my_tests": my_tests,
-            "results_data": results_data,
-            "levels_map": levels_map,
+            **teacher_fragments(request),
         },
     )
 
+
+@login_required
+@require_http_methods(["GET"])
+def results_feed(request):
+    """Лента результатов студентов: фильтры в SQL, постранично по курсору"""
+    if request.user.profile.role != "teacher":
+        return FastJsonResponse({"error": "Access denied"}, status=403)
+
+    try:
+        rows, next_cursor = fetch_page(request.user, request.GET)
+    except FeedParamsError as e:
+        return FastJsonResponse({"error": str(e)}, status=400)
+
+    return FastJsonResponse({"results": rows, "next_cursor": next_cursor})
+
+
 @login_required
 @require_http_methods(["POST"])
 def delete_group(request, group_id):
@@ -122,6 +142,7 @@ def delete_group(request, group_id):
     # Ищем группу, созданную именно этим учителем
     group = get_object_or_404(Group, id=group_id, created_by=request.user)
     group.delete()
+    invalidate_group_fragments(request.user.pk, group_id)
     
     return redirect('main:teacher_home')
 
@@ -133,13 +154,12 @@ def test_levels(request, test_id):
     test = get_object_or_404(Test, id=test_id, created_by=request.user)
 
     if request.method == "POST":
-        TestLevel.objects.filter(test=test).delete()
-
         try:
             levels_count = int(request.POST.get("levels_count", 0))
         except (TypeError, ValueError):
             levels_count = 0
 
+        levels = []
         prev_max = -1  # чтобы первый min стал 0
 
         for i in range(1, levels_count + 1):
@@ -159,18 +179,29 @@ def test_levels(request, test_id):
             min_percent = prev_max + 1
             prev_max = max_percent
 
-            TestLevel.objects.create(
-                test=test,
-                title=(request.POST.get(f"level_{i}_title") or "").strip(),
-                min_percent=min_percent,
-                max_percent=max_percent,
-                description=(request.POST.get(f"level_{i}_description") or "").strip(),
-                recommendations=(
-                    request.POST.get(f"level_{i}_recommendations") or ""
-                ).strip(),
-                order=i,
+            levels.append(
+                Level(
+                    order=i,
+                    title=(request.POST.get(f"level_{i}_title") or "").strip(),
+                    min_percent=min_percent,
+                    max_percent=max_percent,
+                    description=(
+                        request.POST.get(f"level_{i}_description") or ""
+                    ).strip(),
+                    recommendations=(
+                        request.POST.get(f"level_{i}_recommendations") or ""
+                    ).strip(),
+                )
             )
 
+        # Диапазоны проверяются до записи; сохраняем одной заменой в транзакции
+        try:
+            replace_levels(test, levels)
+        except LevelBandError as e:
+            messages.error(request, f"Уровни не сохранены: {e}")
+        else:
+            invalidate_test_fragments(test)
+
         return redirect("main:teacher_home")
 
     return redirect("main:teacher_home")
@@ -185,102 +216,91 @@ def create_group(request):
         name = request.POST.get("group_name").strip()
 
         if Group.objects.filter(name=name).exists():
-            return render(
-                request,
-                "main/teach_panel.html",
-                {"error": "Группа с таким именем уже существует."},
-            )
+            messages.error(request, "Группа с таким именем уже существует.")
+            return redirect("main:teacher_home")
 
-        Group.objects.create(name=name, created_by=request.user)
+        group = Group.objects.create(name=name, created_by=request.user)
+        invalidate_group_fragments(request.user.pk, group.id)
         return redirect("main:teacher_home")
 
     return redirect("main:teacher_home")
 
 
+def _parse_group_ids(raw_group_ids):
+    try:
+        return [int(g_id) for g_id in (raw_group_ids or "").split(",") if g_id.strip()]
+    except ValueError:
+        raise TestDefinitionError(["Некорректный список групп"])
+
+
 @login_required
 def create_test(request):
     if request.user.profile.role != "teacher":
         return redirect("main:home")
 
     if request.method == "POST":
-        raw_group_ids = request.POST.get("group_ids", "")
-        
-        # 2. Превращаем её в настоящий список [1, 3, 5]
-        if raw_group_ids:
-            # Разбиваем по запятой и преобразуем в числа, убирая пустые значения
-            group_ids = [int(g_id) for g_id in raw_group_ids.split(",") if g_id.strip()]
+        # Сначала разбираем и проверяем всю форму, затем пишем тест одной транзакцией
+        try:
+            definition = definition_from_form(request.POST, request.FILES)
+            group_ids = _parse_group_ids(request.POST.get("group_ids"))
+            test = save_test_definition(request.user, definition, group_ids)
+        except TestDefinitionError as e:
+            for error in e.errors[:10]:
+                messages.error(request, f"Тест не создан: {error}")
         else:
-            group_ids = []
+            invalidate_test_fragments(test)
 
-        # 3. Создаем тест
-        test = Test.objects.create(
-            created_by=request.user,
-            title=request.POST.get("test_title"),
-            description=request.POST.get("test_description") or "",
-        )
-        
-        # 4. Теперь передаем чистый список ID
-        test.groups.set(group_ids)
-
-        # Собираем только настоящие поля "текст вопроса": question_1_text, question_2_text ...
-        question_nums = []
-        for key in request.POST.keys():
-            m = re.match(r"^question_(\d+)_text$", key)
-            if m:
-                question_nums.append(int(m.group(1)))
-
-        for num in sorted(set(question_nums)):
-            question_type = request.POST.get(f"question_{num}_type")
-
-            q = Question.objects.create(
-                test=test,
-                text=request.POST.get(f"question_{num}_text"),
-                image=request.FILES.get(f"question_{num}_image"),
-                order=num,
-                question_type=question_type,
-            )
+        return redirect("main:teacher_home")
 
-            if question_type == "open":
-                correct_text = request.POST.get(
-                    f"question_{num}_correct_text", ""
-                ).strip()
-                q.correct_text_answer = correct_text
-                q.save()
+    return redirect("main:teacher_home")
 
-            elif question_type == "choice":
-                correct = request.POST.get(f"question_{num}_correct")
 
-                try:
-                    cnt = int(request.POST.get(f"question_{num}_answers_count", 0))
-                except ValueError:
-                    cnt = 0
-
-                for i in range(1, cnt + 1):
-                    answer_text = request.POST.get(f"question_{num}_answer_{i}")
-                    if answer_text:
-                        AnswerOption.objects.create(
-                            question=q,
-                            text=answer_text,
-                            order=i,
-                            is_correct=(str(i) == str(correct)),
-                        )
+@login_required
+@require_http_methods(["POST"])
+def import_test(request):
+    """Создание теста из файла (JSON/CSV/GIFT) и архива с картинками"""
+    if request.user.profile.role != "teacher":
+        return redirect("main:home")
+
+    upload = request.FILES.get("import_file")
+    if upload is None:
+        messages.error(request, "Выберите файл с вопросами")
+        return redirect("main:teacher_home")
 
+    try:
+        definition = parse_import(
+            upload,
+            images_upload=request.FILES.get("import_images"),
+            title=(request.POST.get("test_title") or "").strip(),
+            description=(request.POST.get("test_description") or "").strip(),
+            **pool_options(request.POST),
+        )
+        group_ids = _parse_group_ids(request.POST.get("group_ids"))
+        test = save_test_definition(request.user, definition, group_ids)
+    except TestDefinitionError as e:
+        for error in e.errors[:10]:
+            messages.error(request, f"Импорт не выполнен: {error}")
         return redirect("main:teacher_home")
 
+    invalidate_test_fragments(test)
+    messages.success(
+        request,
+        f"Тест «{test.title}» импортирован: вопросов — {len(definition.questions)}",
+    )
     return redirect("main:teacher_home")
 
 
 @login_required
 def test_detail_results(request, test_id):
     if request.user.profile.role != "teacher":
-        return JsonResponse({"error": "Access denied"}, status=403)
+        return FastJsonResponse({"error": "Access denied"}, status=403)
 
     test = get_object_or_404(Test, id=test_id, created_by=request.user)
 
     # Получаем все результаты для этого теста
     results = (
         TestResult.objects.filter(test=test)
-        .select_related("student", "student__profile")
+        .select_related("student__profile__group")
         .order_by("-completed_at")
     )
 
@@ -310,11 +330,11 @@ def test_detail_results(request, test_id):
             }
         )
 
-    return JsonResponse(
+    return FastJsonResponse(
         {
             "test_title": test.title,
             "test_description": test.description,
-            "group_name": test.groups.name,
+            "group_name": ", ".join(test.groups.values_list("name", flat=True)),
             "questions_count": test.questions.count(),
             "created_at": test.created_at.strftime("%d.%m.%Y"),
             "results": results_data,
@@ -323,6 +343,41 @@ def test_detail_results(request, test_id):
     )
 
 
+def _export_format(request):
+    export_format = request.GET.get("format", "csv")
+    return export_format if export_format in EXPORT_FORMATS else None
+
+
+@login_required
+@require_http_methods(["GET"])
+def export_test_results(request, test_id):
+    """Выгрузка результатов теста (CSV/XLSX), потоком"""
+    if request.user.profile.role != "teacher":
+        return FastJsonResponse({"error": "Access denied"}, status=403)
+
+    test = get_object_or_404(Test, id=test_id, created_by=request.user)
+    export_format = _export_format(request)
+    if export_format is None:
+        return FastJsonResponse({"error": "Неизвестный формат выгрузки"}, status=400)
+
+    return test_export(test, export_format)
+
+
+@login_required
+@require_http_methods(["GET"])
+def export_group_results(request, group_id):
+    """Выгрузка результатов группы по тестам учителя (CSV/XLSX), потоком"""
+    if request.user.profile.role != "teacher":
+        return FastJsonResponse({"error": "Access denied"}, status=403)
+
+    group = get_object_or_404(Group, id=group_id, created_by=request.user)
+    export_format = _export_format(request)
+    if export_format is None:
+        return FastJsonResponse({"error": "Неизвестный формат выгрузки"}, status=400)
+
+    return group_export(request.user, group, export_format)
+
+
 @login_required
 @require_http_methods(["POST"])
 def delete_test(request, test_id):
@@ -330,7 +385,13 @@ def delete_test(request, test_id):
         return redirect("main:home")
 
     test = get_object_or_404(Test, id=test_id, created_by=request.user)
-    test.delete()
+    invalidate_answer_key(test)
+    invalidate_start_payload(test)
+    group_ids = list(test.groups.values_list("id", flat=True))
+    with transaction.atomic():
+        release_question_images(test.questions.all())
+        test.delete()
+    invalidate_test_fragments(test, group_ids)
 
     return redirect("main:teacher_home")
 
@@ -340,35 +401,50 @@ def student_home(request):
     if request.user.profile.role != "student":
         return redirect("main:home")
 
-    student_group = request.user.profile.group
-    tests = (
-        Test.objects.filter(groups=student_group)
-        .prefetch_related("questions")
-        .order_by("-created_at")
+    # Карточки считаются только при промахе кэша фрагментов
+    tests_data = SimpleLazyObject(lambda: _student_tests_data(request.user))
+
+    return render(
+        request,
+        "main/student_panel.html",
+        {"tests_data": tests_data, **student_fragments(request)},
     )
-    completed_tests = TestResult.objects.filter(student=request.user).values_list(
-        "test_id", flat=True
+
+
+def _student_tests_data(user):
+    # Фиксированное число запросов: тесты, результаты студента, уровни (из кэша)
+    tests = list(
+        Test.objects.filter(groups=user.profile.group_id)
+        .select_related("created_by")
+        .annotate(questions_count=Count("questions"))
+        .order_by("-created_at")
     )
 
+    results = {}
+    for r in TestResult.objects.filter(
+        student=user, test__in=[t.id for t in tests]
+    ).order_by("-completed_at"):
+        results.setdefault(r.test_id, r)
+
+    completed = [t for t in tests if t.id in results]
+    level_bands = get_level_bands_many(completed)
+
     tests_data = []
     for test in tests:
+        r = results.get(test.id)
         test_info = {
             "test": test,
-            "is_completed": test.id in completed_tests,
-            "result": None,
+            "is_completed": r is not None,
+            "result": r,
         }
 
-        if test_info["is_completed"]:
-            r = TestResult.objects.filter(test=test, student=request.user).first()
-            test_info["result"] = r
-
+        if r is not None:
             total_q = r.total_questions or 0
             score = r.score or 0
             percentage = (score / total_q * 100) if total_q > 0 else 0
 
             # --- ПОЛУЧАЕМ УРОВЕНЬ ---
-            level = get_student_level(test, percentage)
-            test_info["level"] = level
+            test_info["level"] = level_bands[test.id].level_for(percentage)
 
             test_info["pass_threshold"] = total_q * 0.6
             test_info["minutes"] = r.time_spent // 60
@@ -378,148 +454,57 @@ def student_home(request):
 
         tests_data.append(test_info)
 
-    return render(request, "main/student_panel.html", {"tests_data": tests_data})
+    return tests_data
 
 
 @login_required
 @require_http_methods(["GET"])
 def start_test(request, test_id):
     if request.user.profile.role != "student":
-        return JsonResponse({"error": "Access denied"}, status=403)
+        return FastJsonResponse({"error": "Access denied"}, status=403)
 
     test = get_object_or_404(Test, id=test_id, groups=request.user.profile.group)
 
     if TestResult.objects.filter(test=test, student=request.user).exists():
-        return JsonResponse({"error": "Тест уже пройден"}, status=400)
-
-    questions = test.questions.all().order_by("order")
+        return FastJsonResponse({"error": "Тест уже пройден"}, status=400)
 
-    data = {
-        "id": test.id,
-        "title": test.title,
-        "description": test.description,
-        "questions": [
-            {
-                "id": q.id,
-                "text": q.text,
-                "image": q.image.url if q.image else None,
-                "question_type": q.question_type,  # ✅ ВОТ ЭТО
-                "answers": [
-                    {"id": a.id, "text": a.text}
-                    for a in q.answers.all().order_by("order")
-                ],
-            }
-            for q in questions
-        ],
-    }
-    return JsonResponse(data)
+    return HttpResponse(
+        get_student_payload(test, request.user.pk), content_type="application/json"
+    )
 
 
 @login_required
 @require_http_methods(["POST"])
 def submit_test(request, test_id):
     if request.user.profile.role != "student":
-        return JsonResponse({"error": "Access denied"}, status=403)
+        return FastJsonResponse({"error": "Access denied"}, status=403)
 
     test = get_object_or_404(Test, id=test_id, groups=request.user.profile.group)
 
     # Нельзя проходить один тест дважды
     if TestResult.objects.filter(test=test, student=request.user).exists():
-        return JsonResponse({"error": "Тест уже пройден"}, status=400)
+        return FastJsonResponse({"error": "Тест уже пройден"}, status=400)
 
     data = json.loads(request.body)
 
-    # Создаем запись результата
-    test_result = TestResult.objects.create(
-        test=test, student=request.user, time_spent=data.get("time_spent", 0)
-    )
-
-    correct_count = 0
-    total_count = 0
-    details = []
-
-    # Основной цикл по вопросам
-    for question in test.questions.all().order_by("order"):
-        total_count += 1
-        q_id = str(question.id)
-
-        # Ответ пользователя (для открытого = текст, для тестового = айди варианта)
-        user_raw_answer = data["answers"].get(q_id)
-
-        # --- ОТКРЫТЫЕ ВОПРОСЫ ---
-        if question.question_type == "open":
-            user_text_answer = (user_raw_answer or "").strip().lower()
-            correct_text = (question.correct_text_answer or "").strip().lower()
-
-            # Проверяем совпадение (без учета регистра)
-            is_correct = user_text_answer == correct_text
-
-            if is_correct:
-                correct_count += 1
-
-            UserAnswer.objects.create(
-                test_result=test_result,
-                question=question,
-                selected_answer=None,
-                text_answer=user_raw_answer or "",
-            )
-
-            details.append(
-                {
-                    "question_text": question.text,
-                    "user_answer": user_raw_answer or "Нет ответа",
-                    "correct_answer": question.correct_text_answer or "",
-                    "is_correct": is_correct,
-                }
-            )
-
-            continue
-
-        # --- ТЕСТОВЫЕ ВОПРОСЫ (CHOICE) ---
-        if question.question_type == "choice":
-            if user_raw_answer:
-                try:
-                    answer_obj = AnswerOption.objects.get(
-                        id=user_raw_answer, question=question
-                    )
-                except AnswerOption.DoesNotExist:
-                    answer_obj = None
-            else:
-                answer_obj = None
-
-            # Сохраняем ответ
-            UserAnswer.objects.create(
-                test_result=test_result,
-                question=question,
-                selected_answer=answer_obj,
-                text_answer=None,
-            )
-
-            # Определяем корректность
-            correct_option = question.answers.filter(is_correct=True).first()
-            is_correct = answer_obj.is_correct if answer_obj else False
-
-            if is_correct:
-                correct_count += 1
-
-            details.append(
-                {
-                    "question_text": question.text,
-                    "user_answer": answer_obj.text if answer_obj else "Нет ответа",
-                    "correct_answer": correct_option.text if correct_option else "",
-                    "is_correct": is_correct,
-                }
-            )
-
-    # Сохраняем результат
-    test_result.score = correct_count
-    test_result.total_questions = total_count
-    test_result.save()
+    try:
+        test_result, details = grade_submission(
+            test,
+            request.user,
+            data.get("answers") or {},
+            time_spent=data.get("time_spent", 0),
+        )
+    except IntegrityError:
+        # Параллельная отправка того же теста успела раньше (uniq_result_test_student)
+        return FastJsonResponse({"error": "Тест уже пройден"}, status=400)
+    invalidate_result_fragments(test, request.user.pk)
+    correct_count = test_result.score
+    total_count = test_result.total_questions
 
     percentage = (correct_count / total_count * 100) if total_count > 0 else 0
     level = get_student_level(test, percentage)
 
-    return JsonResponse(
+    return FastJsonResponse(
         {
             "correct": correct_count,
             "total": total_count,
@@ -597,3 +582,31 @@ def login_view(request):
 def logout_view(request):
     logout(request)
     return redirect("main:login")
+
+
+@require_http_methods(["GET", "HEAD"])
+def protected_media(request, path):
+    """Файлы из MEDIA_ROOT: проверка доступа здесь, байты отдаёт nginx"""
+    path = clean_media_path(path)
+    if path is None or not can_view_media(request.user, path):
+        raise Http404
+
+    # Хешированный путь не меняет содержимое; private — доступ только по сессии
+    if is_hashed(path):
+        cache_control = "private, max-age=31536000, immutable"
+    else:
+        cache_control = "private, max-age=3600"
+
+    if settings.MEDIA_X_ACCEL:
+        response = HttpResponse()
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+        content_type = mimetypes.guess_type(path)[0]
+        response["Content-Type"] = content_type or "application/octet-stream"
+    else:
+        # Без nginx (локальная разработка) отдаём файл сами
+        storage = question_image_storage()
+        if not storage.exists(path):
+            raise Http404
+        response = FileResponse(storage.open(path, "rb"))
+    response["Cache-Control"] = cache_control
+    return response
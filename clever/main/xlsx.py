@@ -0,0 +1,169 @@
+"""Потоковая запись XLSX без сторонних библиотек.
+
+Книга из одного листа пишется в zip по мере поступления строк: строки
+сериализуются в XML, сжимаются zipfile и сразу отдаются потребителю.
+Память не зависит от числа строк. Строковые ячейки — inlineStr, поэтому
+таблица общих строк (sharedStrings) не нужна. Текст, который начинается
+как формула (=, +, -, @), получает стиль с quotePrefix: Excel и LibreOffice
+показывают его как есть и не превращают в формулу при правке ячейки.
+"""
+
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+# Символы, запрещённые в XML 1.0
+_ILLEGAL_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+# Символы, запрещённые в имени листа Excel
+_ILLEGAL_SHEET_NAME = re.compile(r"[\[\]:*?/\\]")
+# Если от названия теста ничего не осталось: пустое имя Excel не откроет
+DEFAULT_SHEET_NAME = "Результаты"
+
+# С этих символов табличные редакторы начинают формулу
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+FLUSH_SIZE = 64 * 1024
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" '
+    'ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    "</Types>"
+)
+
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    "</Relationships>"
+)
+
+WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    "</workbook>"
+)
+
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    "</Relationships>"
+)
+
+# Стиль 0 — обычный, 1 — текст с quotePrefix (см. _cell)
+STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="1"><font/></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border/></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/>'
+    "</cellStyleXfs>"
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0" quotePrefix="1"/>'
+    "</cellXfs>"
+    "</styleSheet>"
+)
+
+SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    "<sheetData>"
+)
+
+SHEET_TAIL = "</sheetData></worksheet>"
+
+
+class _Sink:
+    """Файлоподобный буфер без seek: zipfile пишет сюда, генератор забирает"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+
+def _cell(value):
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float)):
+        return f"<c><v>{value}</v></c>"
+    text = _ILLEGAL_XML.sub("", str(value))
+    style = ' s="1"' if looks_like_formula(text) else ""
+    return (
+        f'<c t="inlineStr"{style}><is><t xml:space="preserve">'
+        f"{escape(text)}</t></is></c>"
+    )
+
+
+def looks_like_formula(text):
+    return text.startswith(FORMULA_PREFIXES)
+
+
+def row_xml(values):
+    return "<row>" + "".join(_cell(v) for v in values) + "</row>"
+
+
+def sheet_name_for(title):
+    """Допустимое имя листа: до 31 символа, без []:*?/\\ и апострофов по краям"""
+    name = _ILLEGAL_SHEET_NAME.sub(" ", _ILLEGAL_XML.sub("", title or ""))
+    name = name[:31].strip().strip("'").strip()
+    return name or DEFAULT_SHEET_NAME
+
+
+def stream_xlsx(rows, sheet_name="Лист1"):
+    """Генератор байтов XLSX-файла для итерируемого набора строк"""
+    sheet_name = sheet_name_for(sheet_name)
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", CONTENT_TYPES)
+        zf.writestr("_rels/.rels", ROOT_RELS)
+        zf.writestr(
+            "xl/workbook.xml", WORKBOOK.format(name=escape(sheet_name, {'"': "&quot;"}))
+        )
+        zf.writestr("xl/_rels/workbook.xml.rels", WORKBOOK_RELS)
+        zf.writestr("xl/styles.xml", STYLES)
+
+        with zf.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(SHEET_HEAD.encode())
+            for values in rows:
+                sheet.write(row_xml(values).encode())
+                if sink.size >= FLUSH_SIZE:
+                    yield sink.drain()
+            sheet.write(SHEET_TAIL.encode())
+
+    yield sink.drain()